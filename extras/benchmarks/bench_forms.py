@@ -0,0 +1,96 @@
+"""Benchmark the form normalization of twill's result wrapper.
+
+Compares the time needed for parsing pages with many forms and stray
+input fields with the single pass over the tree that twill uses now and
+with the previous approach, which scanned the whole document for submit
+buttons once per form and serialized and parsed the stray fields again.
+
+Run this script with: python extras/benchmarks/bench_forms.py
+"""
+
+from timeit import repeat
+
+from httpx import Response
+
+from twill.utils import ResultWrapper, html_to_tree, tree_to_html
+
+NUMBER = 10  # number of pages per measurement
+REPEAT = 5  # number of measurements
+
+
+def make_html(num_forms: int, num_orphans: int) -> str:
+    """Create a page with the given number of forms and stray fields."""
+    forms = "".join(
+        f'<form name="form{i}" action="/submit/{i}">'
+        f'<input name="field{i}" value="{i}">'
+        '<button type="submit">Go</button></form>'
+        for i in range(num_forms)
+    )
+    orphans = "".join(
+        f'<p><input name="stray{i}" value="{i}"></p>'
+        for i in range(num_orphans)
+    )
+    return (
+        "<html><head><title>Benchmark</title></head>"
+        f"<body>{forms}{orphans}</body></html>"
+    )
+
+
+class OldResultWrapper(ResultWrapper):
+    """A result wrapper that fixes the forms like before."""
+
+    def _fix_forms(self) -> None:
+        """Fix forms on the page for use with twill."""
+        tree = self._tree
+        if tree is None:
+            return
+        orphans = tree.xpath("//input[not(ancestor::form)]")
+        if orphans:
+            form_parts = (
+                [b"<form>"]
+                + [tree_to_html(orphan) for orphan in orphans]
+                + [b"</form>"]
+            )
+            self._forms = html_to_tree(b"".join(form_parts)).forms
+            self._forms.extend(tree.forms)
+        else:
+            self._forms = tree.forms
+        for form in self._forms:
+            for button in form.xpath("//button[@type='submit']"):
+                button.tag = "input"
+
+
+def parse(wrapper: type, html: str) -> None:
+    """Parse the page and get its forms."""
+    assert wrapper(Response(200, html=html)).forms  # noqa: S101
+
+
+def measure(wrapper: type, html: str) -> float:
+    """Get the best time per page in milliseconds."""
+    times = repeat(lambda: parse(wrapper, html), number=NUMBER, repeat=REPEAT)
+    return min(times) / NUMBER * 1e3
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    print(f"Time per page (best of {REPEAT} x {NUMBER} pages):\n")
+    print(f"{'Forms':>6} {'Stray':>6} {'before':>12} {'now':>12} {'saved':>8}")
+    for num_forms, num_orphans in (
+        (10, 0),
+        (100, 0),
+        (500, 0),
+        (10, 100),
+        (100, 1000),
+    ):
+        html = make_html(num_forms, num_orphans)
+        before = measure(OldResultWrapper, html)
+        now = measure(ResultWrapper, html)
+        saved = 100 * (1 - now / before) if before else 0
+        print(
+            f"{num_forms:6} {num_orphans:6}"
+            f" {before:9.2f} ms {now:9.2f} ms {saved:7.1f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Benchmark the lazy page parsing of twill's result wrapper.
+
+Compares the time needed per request when a script only checks the status
+code (the page is never parsed) with the time needed when the page is
+parsed eagerly (which is what twill did for every response before).
+
+Run this script with: python extras/benchmarks/bench_parsing.py
+"""
+
+import json
+from timeit import repeat
+
+from httpx import Response
+
+from twill.utils import ResultWrapper
+
+NUMBER = 200  # number of requests per measurement
+REPEAT = 5  # number of measurements
+
+
+def make_html(num_links: int = 500, num_forms: int = 10) -> str:
+    """Create a moderately large HTML page."""
+    links = "".join(
+        f'<li><a href="/page/{i}">Page {i}</a></li>' for i in range(num_links)
+    )
+    forms = "".join(
+        f'<form name="form{i}" action="/submit/{i}">'
+        f'<input name="field{i}" value="{i}">'
+        '<button type="submit">Go</button></form>'
+        for i in range(num_forms)
+    )
+    return (
+        "<html><head><title>Benchmark</title></head>"
+        f"<body><ul>{links}</ul>{forms}</body></html>"
+    )
+
+
+def make_responses() -> dict:
+    """Create sample responses with different content types."""
+    html = make_html()
+    data = json.dumps({"items": list(range(5000))}).encode()
+    return {
+        "HTML": lambda: Response(200, html=html),
+        "JSON": lambda: Response(
+            200,
+            content=data,
+            headers={"Content-Type": "application/json"},
+        ),
+        "PNG": lambda: Response(
+            200,
+            content=b"\x89PNG\r\n\x1a\n" + bytes(50000),
+            headers={"Content-Type": "image/png"},
+        ),
+        "304": lambda: Response(304),
+    }
+
+
+class EagerResultWrapper(ResultWrapper):
+    """A result wrapper that parses all pages eagerly, like before."""
+
+    def __init__(self, response: Response) -> None:
+        """Initialize the result wrapper and parse the page."""
+        super().__init__(response)
+        self._parse()
+
+    @property
+    def is_markup(self) -> bool:
+        """Parse everything that is not empty."""
+        return bool(self.response.content)
+
+
+def check_code_only(make_response) -> None:
+    """Simulate a script step that only checks the status code."""
+    assert ResultWrapper(make_response()).http_code  # noqa: S101
+
+
+def check_code_eager(make_response) -> None:
+    """Simulate the same script step with eager parsing."""
+    assert EagerResultWrapper(make_response()).http_code  # noqa: S101
+
+
+def measure(func, make_response) -> float:
+    """Get the best time per request in microseconds."""
+    times = repeat(lambda: func(make_response), number=NUMBER, repeat=REPEAT)
+    return min(times) / NUMBER * 1e6
+
+
+def main() -> None:
+    """Run the benchmark and print the results."""
+    print(f"Time per request (best of {REPEAT} x {NUMBER} requests):\n")
+    print(f"{'Content':8} {'eager':>12} {'code only':>12} {'saved':>8}")
+    for name, make_response in make_responses().items():
+        eager = measure(check_code_eager, make_response)
+        lazy = measure(check_code_only, make_response)
+        saved = 100 * (1 - lazy / eager) if eager else 0
+        print(f"{name:8} {eager:9.1f} µs {lazy:9.1f} µs {saved:7.1f}%")
+
+
+if __name__ == "__main__":
+    main()
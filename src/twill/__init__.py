@@ -34,8 +34,11 @@ __all__ = [
     "__version__",
     "browser",
     "execute_file",
+    "execute_file_async",
     "execute_string",
+    "execute_string_async",
     "log",
+    "new_context",
     "set_err_out",
     "set_log_level",
     "set_output",
@@ -120,8 +123,16 @@ from . import namespaces  # noqa: E402
 # a convenience function:
 from .browser import browser  # noqa: E402
 
+# running twill in separate contexts, e.g. in different threads:
+from .context import new_context  # noqa: E402
+
 # the two core components of twill:
-from .parse import execute_file, execute_string  # noqa: E402
+from .parse import (  # noqa: E402
+    execute_file,
+    execute_file_async,
+    execute_string,
+    execute_string_async,
+)
 from .shell import TwillCommandLoop  # noqa: E402
 
 namespaces.init_global_dict()
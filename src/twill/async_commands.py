@@ -0,0 +1,130 @@
+"""Asynchronous versions of the twill commands that send requests.
+
+When twill scripts are executed asynchronously, these coroutines are
+awaited instead of the commands with the same names from twill.commands,
+so that other scripts can run while a script is waiting for a response.
+All other commands run unchanged, since they do not need to wait.
+"""
+
+import asyncio
+from typing import Optional
+
+from . import utils
+from .browser import AsyncTwillBrowser, get_browser
+from .commands import default_options, options
+from .errors import TwillAssertionError, TwillException
+
+__all__ = [
+    "back",
+    "follow",
+    "go",
+    "reload",
+    "reset_browser",
+    "rf",
+    "run_file",
+    "runfile",
+    "sleep",
+    "submit",
+]
+
+
+def _browser() -> AsyncTwillBrowser:
+    """Get the asynchronous browser used in the current context."""
+    browser = get_browser()
+    if not isinstance(browser, AsyncTwillBrowser):
+        raise TwillException("The current browser is not asynchronous.")
+    return browser
+
+
+async def reset_browser(
+    base_url: str = "", *, keep_connections: bool = False
+) -> None:
+    """>> reset_browser [base_url]
+
+    Reset the browser completely.
+    """
+    browser = _browser()
+    if keep_connections:
+        await browser.soft_reset(base_url)
+    else:
+        await browser.reset(base_url=base_url)
+    options.clear()
+    options.update(default_options)
+
+
+async def go(url: str) -> None:
+    """>> go <url>
+
+    Visit the URL given.
+    """
+    await _browser().go(url)
+
+
+async def reload() -> None:
+    """>> reload
+
+    Reload the current URL.
+    """
+    await _browser().reload()
+
+
+async def follow(what: str) -> str:
+    """>> follow <pattern>
+
+    Find the first link on the page matching the given regex pattern and
+    then visit it.
+    """
+    browser = _browser()
+    link = browser.find_link(what)
+    if link:
+        await browser.follow_link(link)
+        if not browser.url:
+            raise TwillAssertionError(f"Cannot follow link '{link}'")
+        return browser.url
+
+    raise TwillAssertionError(f"no links match to '{what}'")
+
+
+async def back() -> None:
+    """>> back
+
+    Return to the previous page.
+    """
+    await _browser().back()
+
+
+async def submit(
+    submit_button: Optional[str] = None, form_name: Optional[str] = None
+) -> None:
+    """>> submit [<submit_button> [<form_name>]]
+
+    Submit the current form (the one last clicked on) by clicking on the
+    given submission button.
+    """
+    await _browser().submit(submit_button, form_name)
+
+
+async def sleep(interval: str = "1") -> None:
+    """>> sleep [<interval>]
+
+    Sleep for the specified amount of time.
+    If no interval is given, sleep for 1 second.
+    """
+    await asyncio.sleep(float(interval))
+
+
+async def run_file(*args: str) -> None:
+    """>> run_file <file1> [<file2> ...]
+
+    Execute the given twill scripts or directories of twill scripts.
+    """
+    from . import parse  # noqa: PLC0415
+
+    filenames = utils.gather_filenames(args)
+    for filename in filenames:
+        await parse._execute_file_async(  # noqa: SLF001
+            filename, no_reset=True
+        )
+
+
+rf = runfile = run_file  # backward compatibility and convenience
@@ -2,54 +2,153 @@
 
 import pickle
 import re
-from contextlib import suppress
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar, Token
 from http import HTTPStatus
+from inspect import iscoroutinefunction
 from typing import (
     IO,
     Any,
     Callable,
     Dict,
+    Iterator,
     List,
+    NamedTuple,
     Optional,
     Sequence,
+    Set,
     Tuple,
     Union,
     cast,
 )
-from urllib.parse import urljoin
+from urllib.parse import unquote, urljoin
 
 from httpx import (
+    ASGITransport,
+    AsyncBaseTransport,
+    AsyncClient,
     BasicAuth,
     Client,
     ConnectError,
     Cookies,
     Headers,
     InvalidURL,
+    Request,
     Timeout,
     WSGITransport,
 )
 
 from . import __version__, log
+from .cache import AsyncCacheTransport, CacheTransport, HttpCache
+from .cassette import AsyncCassetteTransport, Cassette, CassetteTransport
 from .errors import TwillException
+from .proxy import async_http_transport, http_transport
+from .stats import RequestTimer, RequestTiming
+from .stub import AsyncStubTransport, Stubs, StubTransport
 from .utils import (
-    CheckboxGroup,
     FieldElement,
     FormElement,
+    FormIndex,
     HtmlElement,
     InputElement,
     Link,
-    RadioGroup,
     Response,
     ResultWrapper,
     UrlWithRealm,
+    check_budgets,
     get_equiv_refresh_interval,
-    html_to_tree,
+    get_history_limit,
+    is_asgi_app,
     print_form,
     trunc,
     unique_match,
 )
 
-__all__ = ["browser"]
+__all__ = [
+    "AsyncTwillBrowser",
+    "TwillBrowser",
+    "browser",
+    "get_browser",
+    "set_browser",
+]
+
+
+_TIMER = "twill.timer"  # the request extension holding the request timer
+
+# the number of most recent pages in the history that are not compacted
+_FULL_HISTORY = 1
+
+UNIX_SCHEME = "http+unix"  # the scheme of URLs targeting Unix domain sockets
+
+
+def _start_timer(request: Request) -> None:
+    """Start a timer for the given request and trace its phases."""
+    timer = RequestTimer()
+    # the extensions are shared with redirect requests and must be copied
+    request.extensions = {
+        **request.extensions,
+        "trace": timer.trace,
+        _TIMER: timer,
+    }
+
+
+def _headers_received(response: Response) -> None:
+    """Record the time when the headers of the response were received."""
+    timer = response.request.extensions.get(_TIMER)
+    if timer:
+        timer.received()
+
+
+async def _start_timer_async(request: Request) -> None:
+    """Start a timer for the given asynchronous request."""
+    timer = RequestTimer()
+    request.extensions = {
+        **request.extensions,
+        "trace": timer.atrace,
+        _TIMER: timer,
+    }
+
+
+async def _headers_received_async(response: Response) -> None:
+    """Record the time when the headers of the response were received."""
+    _headers_received(response)
+
+
+def _unix_socket(base_url: str) -> Tuple[str, Optional[str]]:
+    """Get the base URL and the path of the socket it targets, if any.
+
+    Base URLs with the scheme 'http+unix' target a Unix domain socket
+    with the percent-encoded path given as host, for instance, the URL
+    'http+unix://%2Frun%2Fapp.sock/api' targets the socket '/run/app.sock'.
+    These URLs are replaced with 'http://localhost' and the given path.
+    """
+    scheme, sep, rest = base_url.partition("://")
+    if not sep or scheme.lower() != UNIX_SCHEME:
+        return base_url, None
+    host, slash, path = rest.partition("/")
+    return f"http://localhost{slash}{path}", unquote(host)
+
+
+class _ClientSettings(NamedTuple):
+    """The settings with which the HTTP client of a browser was created."""
+
+    app: Optional[Callable[..., Any]]
+    transport: Optional[AsyncBaseTransport]
+    follow_redirects: bool
+    verify: Union[bool, str]
+    timeout: Union[None, float, Timeout]
+    uds: Optional[str]
+    socket: Optional[str]  # the socket targeted by the base URL
+
+    @property
+    def pooled(self) -> bool:
+        """Check whether the client uses its own pooled HTTP transport."""
+        return self.app is None and self.transport is None
+
+    @property
+    def target(self) -> Optional[str]:
+        """Get the path of the Unix domain socket that is targeted."""
+        return self.uds or self.socket
 
 
 def _set_http_connection_debuglevel(level: int) -> None:
@@ -59,36 +158,24 @@ def _set_http_connection_debuglevel(level: int) -> None:
     HTTPConnection.debuglevel = level
 
 
-class TwillBrowser:
-    """A simple, stateful browser."""
+class BaseTwillBrowser:
+    """The parts of the twill browser that do not send requests.
 
-    user_agent = f"TwillBrowser/{__version__}"
+    The stateful browser is implemented on top of this base class
+    using either a blocking or an asynchronous HTTP client.
+    """
 
-    def __init__(
-        self,
-        base_url: str = "",
-        app: Optional[Callable[..., Any]] = None,
-        follow_redirects: bool = True,  # noqa: FBT001, FBT002
-        verify: Union[bool, str] = False,  # noqa: FBT001, FBT002
-        timeout: Union[None, float, Timeout] = 10,
-    ) -> None:
-        """Initialize the twill browser.
+    user_agent = f"TwillBrowser/{__version__}"
 
-        Optionally, you can send requests to a WSGI app instead over the
-        network, and you can specify a base URL for all requests.
-        The "follow_redirects" parameter has the default value True so that
-        the browser by default automatically follows all redirects.
-        The "verify" argument can be used to specify whether or how server
-        certificates shall be verified; this can also be a CA bundle path.
-        In the "timeout" argument you can specify the timeout in seconds.
-        """
-        self.reset(
-            app=app,
-            base_url=base_url,
-            follow_redirects=follow_redirects,
-            verify=verify,
-            timeout=timeout,
-        )
+    _client: Union[Client, AsyncClient]
+    _cache: Optional[HttpCache]
+    _cache_transport: Union[CacheTransport, AsyncCacheTransport]
+    _cassette: Optional[Cassette]
+    _cassette_transport: Union[CassetteTransport, AsyncCassetteTransport]
+    _stubs: Optional[Stubs]
+    _stub_transport: Union[StubTransport, AsyncStubTransport]
+    _settings: _ClientSettings
+    response_hooks: List[Callable[[Response], None]]
 
     def _assert_result_for(self, what: str) -> ResultWrapper:
         if not self.result:
@@ -104,43 +191,21 @@ class TwillBrowser:
         _set_http_connection_debuglevel(level)
         self._debug_level = level
 
-    def close(self) -> None:
-        try:
-            client = self._client
-        except AttributeError:
-            pass
-        else:
-            client.close()
-            del self.result
-            del self.last_submit_button
-            del self.first_error
-            del self._client
-            del self._form
-            del self._form_files
-            del self._auth
-            del self._post_load_hooks
-            del self._history
-
-    def reset(
-        self,
-        base_url: str = "",
-        app: Optional[Callable[..., Any]] = None,
-        follow_redirects: bool = True,  # noqa: FBT001, FBT002
-        verify: Union[bool, str] = False,  # noqa: FBT001,FBT002
-        timeout: Union[None, float, Timeout] = 10,
-    ) -> None:
-        """Reset the browser.
-
-        Optionally, you can send requests to a WSGI app instead over the
-        network, and you can specify a base URL for all requests.
-        The "follow_redirects" parameter has the default value True so that
-        the browser by default automatically follows all redirects.
-        The "verify" argument can be used to specify whether or how server
-        certificates shall be verified; this can also be a CA bundle path.
-        In the "timeout" argument you can specify the timeout in seconds.
-        """
-        self.close()
-
+    def _clear(self) -> None:
+        """Clear the state of the browser."""
+        del self.result
+        del self.last_submit_button
+        del self.first_error
+        del self._client
+        del self._form
+        del self._form_files
+        del self._auth
+        del self._post_load_hooks
+        del self._history
+        del self._timings
+
+    def _setup(self, client: Union[Client, AsyncClient]) -> None:
+        """Set up the state of the browser using the given client."""
         self.result: Optional[ResultWrapper] = None
         self.last_submit_button: Optional[InputElement] = None
         self.first_error: Optional[str] = None
@@ -152,13 +217,11 @@ class TwillBrowser:
         self._debug_level = 0
 
         # Client stores cookies
-        self._client = Client(
-            base_url=base_url,
-            follow_redirects=follow_redirects,
-            verify=verify,
-            timeout=timeout,
-            transport=WSGITransport(app=app) if app else None,
-        )
+        self._client = client
+
+        # measure the timings of all requests sent by the client
+        client.event_hooks = self._timing_hooks()
+        self._timings: List[RequestTiming] = []
 
         # A lxml FormElement, None until a form is selected
         # replaces self._browser.form from mechanize
@@ -176,6 +239,87 @@ class TwillBrowser:
         # set default headers
         self.reset_headers()
 
+    @staticmethod
+    def _timing_hooks() -> Dict[str, List[Callable]]:
+        """Get the event hooks for measuring the timings of requests."""
+        return {"request": [_start_timer], "response": [_headers_received]}
+
+    def _can_reuse_client(self, base_url: str) -> bool:
+        """Check whether the client can be kept when resetting.
+
+        Only clients with a pooled HTTP transport can be kept, and only
+        if the new base URL does not target a different Unix socket.
+        Clients for apps or with other transports must be recreated.
+        """
+        if not hasattr(self, "_client"):
+            return False  # the browser has been closed
+        settings = self._settings
+        if not settings.pooled:
+            return False
+        socket = _unix_socket(base_url)[1]
+        return settings.target == (settings.uds or socket)
+
+    def _reuse_client(self, base_url: str) -> None:
+        """Reset the state of the browser, but keep its HTTP client.
+
+        The client gets back the settings it has been created with,
+        but it keeps its transport with the open connections.
+        """
+        settings = self._settings
+        base_url, socket = _unix_socket(base_url)
+        self._settings = settings._replace(socket=socket)
+        client = self._client
+        client.cookies.clear()
+        client.base_url = base_url
+        client.follow_redirects = settings.follow_redirects
+        client.timeout = settings.timeout
+        self._setup(client)
+
+    @property
+    def cache(self) -> Optional[HttpCache]:
+        """Get the HTTP cache used by the browser, or None if there is none.
+
+        The cache is kept when the browser is reset.
+        """
+        return self._cache
+
+    @cache.setter
+    def cache(self, cache: Optional[HttpCache]) -> None:
+        """Set the HTTP cache used by the browser, or None to disable it."""
+        self._cache = cache
+        with suppress(AttributeError):  # no transport has been created
+            self._cache_transport.cache = cache
+
+    @property
+    def cassette(self) -> Optional[Cassette]:
+        """Get the cassette used for recording or replaying requests.
+
+        The cassette is kept when the browser is reset.
+        """
+        return self._cassette
+
+    @cassette.setter
+    def cassette(self, cassette: Optional[Cassette]) -> None:
+        """Set the cassette for recording or replaying, or None to stop."""
+        self._cassette = cassette
+        with suppress(AttributeError):  # no transport has been created
+            self._cassette_transport.cassette = cassette
+
+    @property
+    def stubs(self) -> Optional[Stubs]:
+        """Get the stubs answering requests in-process, or None.
+
+        The stubs are kept when the browser is reset.
+        """
+        return self._stubs
+
+    @stubs.setter
+    def stubs(self, stubs: Optional[Stubs]) -> None:
+        """Set the stubs answering requests, or None to remove them."""
+        self._stubs = stubs
+        with suppress(AttributeError):  # no transport has been created
+            self._stub_transport.stubs = stubs
+
     @property
     def creds(self) -> Dict[UrlWithRealm, BasicAuth]:
         """Get the credentials for basic authentication."""
@@ -185,15 +329,15 @@ class TwillBrowser:
         """Set the credentials for basic authentication."""
         self._auth[url] = BasicAuth(user, password)
 
-    def go(self, url: str) -> None:
-        """Visit given URL."""
+    def _go_urls(self, url: str) -> List[str]:
+        """Get the URLs that shall be tried when visiting the given URL."""
         try_urls: List[str] = []
         if "://" in url:
             try_urls.append(url)
         else:  # URL does not have a schema
             # if this is a relative URL, then assume that we want to tack it
-            # onto the end of the current URL
-            current_url = self.url
+            # onto the end of the current URL or the base URL of the client
+            current_url = self.url or str(self._client.base_url)
             if current_url:
                 try_urls.append(urljoin(current_url, url))
             # if this is an absolute URL, it may be just missing the 'http://'
@@ -201,34 +345,7 @@ class TwillBrowser:
             if not url.startswith((".", "/", "?")):
                 try_urls.append(f"http://{url}")
                 try_urls.append(f"https://{url}")
-        for try_url in try_urls:
-            try:
-                self._journey("open", try_url)
-            except (
-                OSError,
-                ConnectError,
-                InvalidURL,
-                UnicodeError,
-            ) as error:
-                log.info("cannot go to '%s': %s", try_url, error)
-            else:
-                break
-        else:
-            raise TwillException(f"cannot go to '{url}'")
-        log.info("==> at %s", self.url)
-
-    def reload(self) -> None:
-        """Tell the browser to reload the current page."""
-        self._journey("reload")
-        log.info("==> reloaded")
-
-    def back(self) -> None:
-        """Return to previous page, if possible."""
-        try:
-            self._journey("back")
-            log.info("==> back to %s", self.url)
-        except TwillException:
-            log.warning("==> back at empty page")
+        return try_urls
 
     @property
     def code(self) -> int:
@@ -273,11 +390,6 @@ class TwillBrowser:
         """
         return self._assert_result_for("links").find_links(pattern)
 
-    def follow_link(self, link: Union[str, Link]) -> None:
-        """Follow the given link."""
-        self._journey("follow_link", link)
-        log.info("==> at %s", self.url)
-
     @property
     def headers(self) -> Headers:
         """Return the request headers currently used by the browser."""
@@ -376,6 +488,14 @@ class TwillBrowser:
         """Return the first form that matches the given form name."""
         return self._assert_result_for("form").form(name)
 
+    def form_index(self, form: FormElement) -> FormIndex:
+        """Return the index of the fields of the given form.
+
+        The index is remembered with the current page.
+        """
+        result = self.result
+        return FormIndex(form) if result is None else result.form_index(form)
+
     def form_field(
         self,
         form: Optional[FormElement] = None,
@@ -392,33 +512,20 @@ class TwillBrowser:
             form = self._form
             if form is None:
                 raise TwillException("Must specify a form for the field")
-        inputs = form.inputs
+        index = self.form_index(form)
         found_multiple = False
 
         name = name_or_num if isinstance(name_or_num, str) else None
 
         if name:
-            if name in form.fields:
-                match_name = [c for c in inputs if c.name == name]
-                if len(match_name) > 1:
-                    if all(
-                        getattr(c, "type", None) == "checkbox"
-                        for c in match_name
-                    ):
-                        return CheckboxGroup(
-                            cast("List[InputElement]", match_name)
-                        )
-                    if all(
-                        getattr(c, "type", None) == "radio" for c in match_name
-                    ):
-                        return RadioGroup(
-                            cast("List[InputElement]", match_name)
-                        )
-            else:
-                match_name = None
+            match_name = index.by_name.get(name)
+            if match_name and len(match_name) > 1:
+                group = index.group(name)
+                if group is not None:
+                    return group
 
             # test exact match to id
-            match_id = [c for c in inputs if c.get("id") == name]
+            match_id = index.by_id.get(name)
             if match_id:
                 if unique_match(match_id):
                     return match_id[0]
@@ -438,19 +545,18 @@ class TwillBrowser:
         # test field index
         if num is not None:
             with suppress(IndexError):
-                return list(inputs)[num - 1]
+                return index.fields[num - 1]
 
         if name:
             # test regex match
-            regex = re.compile(name)
-            match_name = [c for c in inputs if c.name and regex.search(c.name)]
+            match_name = index.search(name)
             if match_name:
                 if unique_match(match_name):
                     return match_name[0]
                 found_multiple = True
 
             # test field values
-            match_value = [c for c in inputs if c.value == name]
+            match_value = index.with_value(name)
             if match_value:
                 if len(match_value) == 1:
                     return match_value[0]
@@ -475,12 +581,16 @@ class TwillBrowser:
         if getattr(control, "type", None) in ("submit", "image"):
             self.last_submit_button = cast("InputElement", control)
 
-    def submit(
+    def _prepare_submit(
         self,
         field_name: Optional[Union[str, int]] = None,
         form_name: Optional[Union[str, int]] = None,
-    ) -> None:
-        """Submit the last or specified form using the given field."""
+    ) -> Tuple[str, str, Dict[str, Any]]:
+        """Prepare the submission of the last or specified form.
+
+        Returns the method, the URL and further arguments for the request.
+        """
+        self._timings = []
         forms = self.forms
         if not forms:
             raise TwillException("There are no forms on this page.")
@@ -505,13 +615,16 @@ class TwillBrowser:
         if field_name is None:
             if form is not self._form or self.last_submit_button is None:
                 # get first submit button in form.
-                submits = [
-                    c
-                    for c in form.inputs
-                    if getattr(c, "type", None) in ("submit", "image")
-                ]
-                if submits:
-                    ctl = cast("InputElement", submits[0])
+                submit = next(
+                    (
+                        c
+                        for c in self.form_index(form).fields
+                        if getattr(c, "type", None) in ("submit", "image")
+                    ),
+                    None,
+                )
+                if submit is not None:
+                    ctl = cast("InputElement", submit)
             else:
                 ctl = self.last_submit_button
         else:
@@ -544,31 +657,65 @@ class TwillBrowser:
                 payload.append((name, ctl.value or ""))
         payload_dict = self._make_payload_dict(payload)
 
-        # now actually GO
+        # now build the request that will actually be sent
         if form.method == "POST":
+            kwargs: Dict[str, Any] = {"data": payload_dict, "headers": headers}
             if self._form_files:
                 log.debug("Submitting files: %r", self._form_files)
-                result = self._client.post(
-                    form.action,
-                    data=payload_dict,
-                    headers=headers,
-                    files=self._form_files,
-                )
-            else:
-                result = self._client.post(
-                    form.action, data=payload_dict, headers=headers
-                )
-        else:
-            result = self._client.get(
-                form.action, params=payload_dict, headers=headers
-            )
+                kwargs["files"] = self._form_files
+            return "POST", form.action, kwargs
+        return "GET", form.action, {"params": payload_dict, "headers": headers}
+
+    def _received(self, response: Response) -> Response:
+        """Pass a response that has been received to the response hooks.
 
+        Responses to redirects are also passed to the hooks. The timings
+        of the requests are recorded for the page that will be stored.
+        """
+        responses = (*response.history, response)
+        timings = self._timings
+        for received in responses:
+            timer = received.request.extensions.get(_TIMER)
+            if timer:
+                timings.append(timer.timing(received))
+        hooks = self.response_hooks
+        if hooks:
+            for received in responses:
+                for hook in hooks:
+                    hook(received)
+        return response
+
+    def _store_timings(self, result: ResultWrapper) -> None:
+        """Store the timings of the requests with the result page."""
+        result.timings = self._timings
+        self._timings = []
+
+    def _add_to_history(self, result: ResultWrapper) -> None:
+        """Add the given page to the history.
+
+        If the history is limited, the oldest pages are dropped when the
+        history would become longer than the configured limit, and older
+        pages are compacted. Otherwise, the pages are kept unchanged.
+        """
+        history = self._history
+        history.append(result)
+        limit = get_history_limit()
+        if limit > 0:
+            if len(history) > limit:
+                del history[:-limit]
+            if len(history) > _FULL_HISTORY:
+                history[-_FULL_HISTORY - 1].compact()
+
+    def _submitted(self, response: Response) -> None:
+        """Store the response to a form submission as the current page."""
         self._form = None
         self._form_files.clear()
         self.last_submit_button = None
         if self.result is not None:
-            self._history.append(self.result)
-        self.result = ResultWrapper(result)
+            self._add_to_history(self.result)
+        result = self.result = ResultWrapper(response)
+        self._store_timings(result)
+        check_budgets(result)
 
     def cookies(self) -> Cookies:
         """Get all cookies from the current client session."""
@@ -609,6 +756,30 @@ class TwillBrowser:
         else:
             log.info("\nThere are no cookies in the cookie jar.\n")
 
+    @property
+    def timings(self) -> List[RequestTiming]:
+        """Get the timings of the requests needed for the current page.
+
+        This includes the requests for redirects and meta refreshes.
+        """
+        result = self.result
+        return result.timings if result else []
+
+    def show_timings(self) -> None:
+        """Pretty-print the timings of the requests for the current page."""
+        info = log.info
+        result = self.result
+        timings = result.timings if result else []
+        if timings:
+            info("\nTimings of the request(s) for the current page:\n")
+            for n, timing in enumerate(timings, 1):
+                info("\t%d. %s", n, timing)
+            if result and result.parse_time is not None:
+                info("\tParsing the page: %.2f ms", result.parse_time * 1000)
+            info("")
+        else:
+            info("\nThere are no timings for the current page.\n")
+
     def decode(self, value: Union[bytes, str]) -> str:
         """Decode a value using the current encoding."""
         if isinstance(value, bytes):
@@ -641,18 +812,22 @@ class TwillBrowser:
                     data[key] = [existing_value, new_value]
         return data
 
-    @staticmethod
+    _re_http_equiv = re.compile(b"http-equiv", re.I)
+
+    @classmethod
     def _get_meta_refresh(
-        response: Response,
+        cls,
+        result: ResultWrapper,
     ) -> Tuple[Optional[int], Optional[str]]:
-        """Get meta refresh interval and url from a response."""
-        try:
-            tree = html_to_tree(response.text)
-        except ValueError:
-            # may happen when there is an XML encoding declaration
-            tree = html_to_tree(response.content)
+        """Get meta refresh interval and url from a result page.
+
+        The page is only parsed if it can contain a meta refresh at all,
+        and the parsed page is kept in the result so it is parsed only once.
+        """
+        if not cls._re_http_equiv.search(result.content):
+            return None, None
         try:
-            content = tree.xpath(  # "refresh" is case-insensitive
+            content = result.xpath(  # "refresh" is case-insensitive
                 "//meta[translate(@http-equiv,'REFSH','refsh')="
                 "'refresh'][1]/@content"
             )[0]
@@ -669,21 +844,19 @@ class TwillBrowser:
             interval = url = None
         else:
             if "://" not in url:  # relative URL, adapt
-                url = str(response.url.join(url))
+                url = str(result.response.url.join(url))
         return interval, url
 
     _re_basic_auth = re.compile('Basic realm="(.*)"', re.I)
 
-    def _journey(self, func_name: str, *args, **_kwargs) -> None:
-        """Execute the function with the given name and arguments.
+    def _start_journey(self, func_name: str, *args) -> Optional[str]:
+        """Start a journey with the given function name and arguments.
 
         The name should be one of 'open', 'reload', 'back', or 'follow_link'.
-        This method then runs that function with the given arguments and turns
-        the results into a nice friendly standard ResultWrapper object, which
-        is stored as self.result.
-
-        (Idea stolen from Python Browsing Probe (PBP).)
+        Returns the URL that needs to be visited, or None if the journey
+        already ended by going back in the history.
         """
+        self._timings = []
         self._form = None
         self._form_files.clear()
         self.last_submit_button = None
@@ -706,51 +879,581 @@ class TwillBrowser:
                 self.result = self._history.pop()
             except IndexError as error:
                 raise TwillException("Cannot go further back") from error
-            return
+            return None
         else:
             raise TwillException(f"Unknown function {func_name!r}")
 
-        result = self._client.get(url)
-        if result.status_code == HTTPStatus.UNAUTHORIZED:
-            header = result.headers.get("WWW-Authenticate")
+        return url
+
+    def _auth_for(self, url: str, response: Response) -> Optional[BasicAuth]:
+        """Get the credentials if the response asks for authentication."""
+        if response.status_code == HTTPStatus.UNAUTHORIZED:
+            header = response.headers.get("WWW-Authenticate")
             match_realm = self._re_basic_auth.match(header)
             if match_realm:
                 realm = match_realm.group(1)
-                auth = self._auth.get((url, realm)) or self._auth.get(url)
-                if auth:
-                    result = self._client.get(url, auth=auth)
+                return self._auth.get((url, realm)) or self._auth.get(url)
+        return None
+
+    def _refresh_url(
+        self, result: ResultWrapper, refresh_interval: int, visited: Set[str]
+    ) -> Optional[str]:
+        """Get the URL if the result page shall be refreshed."""
+        interval, url = self._get_meta_refresh(result)
+        if not url:
+            return None
+        if interval and interval >= refresh_interval:
+            (log.info if self.show_refresh else log.debug)(
+                "Meta refresh interval too long: %d", interval
+            )
+            return None
+        if url in visited:
+            log.warning("Circular meta refresh detected!")
+            return None
+        (log.info if self.show_refresh else log.debug)(
+            "Meta refresh to new URL: %s", url
+        )
+        visited.add(url)
+        return url
+
+    def _end_journey(self, func_name: str, result: ResultWrapper) -> None:
+        """End the journey by storing the result as the current page."""
+        if (
+            func_name in ("follow_link", "open")
+            # if we're really reloading and just didn't say so, don't store
+            and self.result is not None
+            and self.result.url != result.url
+        ):
+            self._add_to_history(self.result)
+
+        self._store_timings(result)
+        self.result = result
+        check_budgets(result)
+
+
+class TwillBrowser(BaseTwillBrowser):
+    """A simple, stateful browser."""
+
+    _client: Client
+
+    def __init__(
+        self,
+        base_url: str = "",
+        app: Optional[Callable[..., Any]] = None,
+        follow_redirects: bool = True,  # noqa: FBT001, FBT002
+        verify: Union[bool, str] = False,  # noqa: FBT001, FBT002
+        timeout: Union[None, float, Timeout] = 10,
+        uds: Optional[str] = None,
+    ) -> None:
+        """Initialize the twill browser.
+
+        Optionally, you can send requests to a WSGI app instead over the
+        network, and you can specify a base URL for all requests.
+        The "follow_redirects" parameter has the default value True so that
+        the browser by default automatically follows all redirects.
+        The "verify" argument can be used to specify whether or how server
+        certificates shall be verified; this can also be a CA bundle path.
+        In the "timeout" argument you can specify the timeout in seconds.
+        With "uds" you can send all requests to the Unix domain socket with
+        the given path, which can also be given as an 'http+unix' base URL.
+        """
+        # callables to be called with every response (kept when resetting)
+        self.response_hooks = []
+        # the HTTP cache, the cassette and the stubs (kept when resetting)
+        self._cache = None
+        self._cassette = None
+        self._stubs = None
+        self.reset(
+            app=app,
+            base_url=base_url,
+            follow_redirects=follow_redirects,
+            verify=verify,
+            timeout=timeout,
+            uds=uds,
+        )
+
+    def close(self) -> None:
+        """Close the browser and its HTTP client."""
+        try:
+            client = self._client
+        except AttributeError:
+            pass
+        else:
+            client.close()
+            self._clear()
+
+    def reset(
+        self,
+        base_url: str = "",
+        app: Optional[Callable[..., Any]] = None,
+        follow_redirects: bool = True,  # noqa: FBT001, FBT002
+        verify: Union[bool, str] = False,  # noqa: FBT001,FBT002
+        timeout: Union[None, float, Timeout] = 10,
+        uds: Optional[str] = None,
+    ) -> None:
+        """Reset the browser.
+
+        Optionally, you can send requests to a WSGI app instead over the
+        network, and you can specify a base URL for all requests.
+        The "follow_redirects" parameter has the default value True so that
+        the browser by default automatically follows all redirects.
+        The "verify" argument can be used to specify whether or how server
+        certificates shall be verified; this can also be a CA bundle path.
+        In the "timeout" argument you can specify the timeout in seconds.
+        With "uds" you can send all requests to the Unix domain socket with
+        the given path, which can also be given as an 'http+unix' base URL.
+        """
+        if app and is_asgi_app(app):
+            raise TwillException(
+                "ASGI apps can only be used with the asynchronous browser."
+            )
+        self.close()
+        base_url, socket = _unix_socket(base_url)
+        self._settings = _ClientSettings(
+            app, None, follow_redirects, verify, timeout, uds, socket
+        )
+        transport = (
+            WSGITransport(app=app)
+            if app
+            else http_transport(verify, uds or socket)
+        )
+        stub_transport = StubTransport(transport, self._stubs)
+        self._stub_transport = stub_transport
+        cassette_transport = CassetteTransport(stub_transport, self._cassette)
+        self._cassette_transport = cassette_transport
+        cache_transport = CacheTransport(cassette_transport, self._cache)
+        self._cache_transport = cache_transport
+        self._setup(
+            Client(
+                base_url=base_url,
+                follow_redirects=follow_redirects,
+                verify=verify,
+                timeout=timeout,
+                transport=cache_transport,
+            )
+        )
+
+    def soft_reset(self, base_url: str = "") -> None:
+        """Reset the browser, but keep its connections open.
+
+        Cookies, headers, authentication, history and forms are reset
+        like with reset(), but the browser keeps the settings it has been
+        created with.  If it uses a pooled HTTP transport to the same
+        target, the transport is kept, so that the next requests can
+        reuse the open keep-alive connections.  Otherwise, a new client
+        with the same settings is created.
+        """
+        if self._can_reuse_client(base_url):
+            self._reuse_client(base_url)
+        else:
+            settings = self._settings
+            self.reset(
+                base_url=base_url,
+                app=settings.app,
+                follow_redirects=settings.follow_redirects,
+                verify=settings.verify,
+                timeout=settings.timeout,
+                uds=settings.uds,
+            )
+
+    def go(self, url: str) -> None:
+        """Visit given URL."""
+        for try_url in self._go_urls(url):
+            try:
+                self._journey("open", try_url)
+            except (
+                OSError,
+                ConnectError,
+                InvalidURL,
+                UnicodeError,
+            ) as error:
+                log.info("cannot go to '%s': %s", try_url, error)
+            else:
+                break
+        else:
+            raise TwillException(f"cannot go to '{url}'")
+        log.info("==> at %s", self.url)
+
+    def reload(self) -> None:
+        """Tell the browser to reload the current page."""
+        self._journey("reload")
+        log.info("==> reloaded")
+
+    def back(self) -> None:
+        """Return to previous page, if possible."""
+        try:
+            self._journey("back")
+            log.info("==> back to %s", self.url)
+        except TwillException:
+            log.warning("==> back at empty page")
+
+    def follow_link(self, link: Union[str, Link]) -> None:
+        """Follow the given link."""
+        self._journey("follow_link", link)
+        log.info("==> at %s", self.url)
+
+    def submit(
+        self,
+        field_name: Optional[Union[str, int]] = None,
+        form_name: Optional[Union[str, int]] = None,
+    ) -> None:
+        """Submit the last or specified form using the given field."""
+        method, url, kwargs = self._prepare_submit(field_name, form_name)
+        self._submitted(
+            self._received(self._client.request(method, url, **kwargs))
+        )
+
+    def _journey(self, func_name: str, *args, **_kwargs) -> None:
+        """Execute the function with the given name and arguments.
+
+        The name should be one of 'open', 'reload', 'back', or 'follow_link'.
+        This method then runs that function with the given arguments and turns
+        the results into a nice friendly standard ResultWrapper object, which
+        is stored as self.result.
+
+        (Idea stolen from Python Browsing Probe (PBP).)
+        """
+        url = self._start_journey(func_name, *args)
+        if url is None:
+            return
+
+        response = self._received(self._client.get(url))
+        auth = self._auth_for(url, response)
+        if auth:
+            response = self._received(self._client.get(url, auth=auth))
+        result = ResultWrapper(response)
 
         # handle redirection via meta refresh (not handled in requests)
         refresh_interval = get_equiv_refresh_interval()
         if refresh_interval:
-            visited = set()  # break circular refresh chains
+            visited: Set[str] = set()  # break circular refresh chains
             while True:
-                interval, url = self._get_meta_refresh(result)
+                url = self._refresh_url(result, refresh_interval, visited)
                 if not url:
                     break
-                if interval and interval >= refresh_interval:
-                    (log.info if self.show_refresh else log.debug)(
-                        "Meta refresh interval too long: %d", interval
+                result = ResultWrapper(self._received(self._client.get(url)))
+
+        self._end_journey(func_name, result)
+
+
+class AsyncTwillBrowser(BaseTwillBrowser):
+    """A simple, stateful browser using an asynchronous HTTP client.
+
+    This browser has the same properties as the twill browser, but the
+    methods that send requests (go, reload, back, follow_link and submit)
+    as well as reset and close are coroutines.  Many such browsers can be
+    run concurrently in the same event loop.
+    """
+
+    _client: AsyncClient
+
+    @staticmethod
+    def _timing_hooks() -> Dict[str, List[Callable]]:
+        """Get the event hooks for measuring the timings of requests."""
+        return {
+            "request": [_start_timer_async],
+            "response": [_headers_received_async],
+        }
+
+    def __init__(
+        self,
+        base_url: str = "",
+        app: Optional[Callable[..., Any]] = None,
+        follow_redirects: bool = True,  # noqa: FBT001, FBT002
+        verify: Union[bool, str] = False,  # noqa: FBT001, FBT002
+        timeout: Union[None, float, Timeout] = 10,
+        uds: Optional[str] = None,
+        transport: Optional[AsyncBaseTransport] = None,
+    ) -> None:
+        """Initialize the asynchronous twill browser.
+
+        The arguments have the same meaning and order as for the twill
+        browser, except that the app must be an ASGI app. Additionally,
+        you can pass an asynchronous transport for sending the requests.
+        """
+        # callables to be called with every response (kept when resetting)
+        self.response_hooks = []
+        # the HTTP cache, the cassette and the stubs (kept when resetting)
+        self._cache = None
+        self._cassette = None
+        self._stubs = None
+        self._setup(
+            self._new_client(
+                base_url,
+                app,
+                follow_redirects,
+                verify,
+                timeout,
+                uds,
+                transport,
+            )
+        )
+
+    def _new_client(
+        self,
+        base_url: str,
+        app: Optional[Callable[..., Any]],
+        follow_redirects: bool,  # noqa: FBT001
+        verify: Union[bool, str],  # noqa: FBT001
+        timeout: Union[None, float, Timeout],
+        uds: Optional[str],
+        transport: Optional[AsyncBaseTransport],
+    ) -> AsyncClient:
+        """Create a new asynchronous HTTP client."""
+        base_url, socket = _unix_socket(base_url)
+        self._settings = _ClientSettings(
+            app, transport, follow_redirects, verify, timeout, uds, socket
+        )
+        if transport is None:
+            if app:
+                if not is_asgi_app(app):
+                    raise TwillException(
+                        "WSGI apps can only be used with the twill browser."
                     )
+                transport = ASGITransport(app=app)
+            else:
+                transport = async_http_transport(verify, uds or socket)
+        stub_transport = AsyncStubTransport(transport, self._stubs)
+        self._stub_transport = stub_transport
+        cassette_transport = AsyncCassetteTransport(
+            stub_transport, self._cassette
+        )
+        self._cassette_transport = cassette_transport
+        cache_transport = AsyncCacheTransport(cassette_transport, self._cache)
+        self._cache_transport = cache_transport
+        return AsyncClient(
+            base_url=base_url,
+            follow_redirects=follow_redirects,
+            verify=verify,
+            timeout=timeout,
+            transport=cache_transport,
+        )
+
+    async def __aenter__(self) -> "AsyncTwillBrowser":
+        """Enter the browser context."""
+        return self
+
+    async def __aexit__(self, *_args: object) -> None:
+        """Exit the browser context and close the browser."""
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the browser and its HTTP client."""
+        try:
+            client = self._client
+        except AttributeError:
+            pass
+        else:
+            await client.aclose()
+            self._clear()
+
+    async def reset(
+        self,
+        base_url: str = "",
+        app: Optional[Callable[..., Any]] = None,
+        follow_redirects: bool = True,  # noqa: FBT001, FBT002
+        verify: Union[bool, str] = False,  # noqa: FBT001,FBT002
+        timeout: Union[None, float, Timeout] = 10,
+        uds: Optional[str] = None,
+        transport: Optional[AsyncBaseTransport] = None,
+    ) -> None:
+        """Reset the browser.
+
+        The arguments have the same meaning as when creating the browser.
+        """
+        await self.close()
+        self._setup(
+            self._new_client(
+                base_url,
+                app,
+                follow_redirects,
+                verify,
+                timeout,
+                uds,
+                transport,
+            )
+        )
+
+    async def soft_reset(self, base_url: str = "") -> None:
+        """Reset the browser, but keep its connections open.
+
+        This works like the soft_reset() method of the twill browser.
+        """
+        if self._can_reuse_client(base_url):
+            self._reuse_client(base_url)
+        else:
+            settings = self._settings
+            await self.reset(
+                base_url=base_url,
+                app=settings.app,
+                follow_redirects=settings.follow_redirects,
+                verify=settings.verify,
+                timeout=settings.timeout,
+                uds=settings.uds,
+                transport=settings.transport,
+            )
+
+    async def go(self, url: str) -> None:
+        """Visit given URL."""
+        for try_url in self._go_urls(url):
+            try:
+                await self._journey("open", try_url)
+            except (
+                OSError,
+                ConnectError,
+                InvalidURL,
+                UnicodeError,
+            ) as error:
+                log.info("cannot go to '%s': %s", try_url, error)
+            else:
+                break
+        else:
+            raise TwillException(f"cannot go to '{url}'")
+        log.info("==> at %s", self.url)
+
+    async def reload(self) -> None:
+        """Tell the browser to reload the current page."""
+        await self._journey("reload")
+        log.info("==> reloaded")
+
+    async def back(self) -> None:
+        """Return to previous page, if possible."""
+        try:
+            await self._journey("back")
+            log.info("==> back to %s", self.url)
+        except TwillException:
+            log.warning("==> back at empty page")
+
+    async def follow_link(self, link: Union[str, Link]) -> None:
+        """Follow the given link."""
+        await self._journey("follow_link", link)
+        log.info("==> at %s", self.url)
+
+    async def submit(
+        self,
+        field_name: Optional[Union[str, int]] = None,
+        form_name: Optional[Union[str, int]] = None,
+    ) -> None:
+        """Submit the last or specified form using the given field."""
+        method, url, kwargs = self._prepare_submit(field_name, form_name)
+        self._submitted(
+            self._received(await self._client.request(method, url, **kwargs))
+        )
+
+    async def _journey(self, func_name: str, *args, **_kwargs) -> None:
+        """Execute the function with the given name and arguments.
+
+        This works like the journey of the twill browser, except that
+        the requests are sent asynchronously.
+        """
+        url = self._start_journey(func_name, *args)
+        if url is None:
+            return
+
+        response = self._received(await self._client.get(url))
+        auth = self._auth_for(url, response)
+        if auth:
+            response = self._received(await self._client.get(url, auth=auth))
+        result = ResultWrapper(response)
+
+        # handle redirection via meta refresh (not handled in requests)
+        refresh_interval = get_equiv_refresh_interval()
+        if refresh_interval:
+            visited: Set[str] = set()  # break circular refresh chains
+            while True:
+                url = self._refresh_url(result, refresh_interval, visited)
+                if not url:
                     break
-                if url in visited:
-                    log.warning("Circular meta refresh detected!")
-                    break
-                (log.info if self.show_refresh else log.debug)(
-                    "Meta refresh to new URL: %s", url
+                result = ResultWrapper(
+                    self._received(await self._client.get(url))
                 )
-                result = self._client.get(url)
-                visited.add(url)
 
-        if (
-            func_name in ("follow_link", "open")
-            # if we're really reloading and just didn't say so, don't store
-            and self.result is not None
-            and self.result.url != result.url
-        ):
-            self._history.append(self.result)
+        self._end_journey(func_name, result)
+
+
+class BrowserProxy:
+    """Proxy for the twill browser of the current context.
+
+    Asynchronously executed twill scripts run with their own browsers, but
+    twill commands and extensions can always access the browser that is
+    used by the current script through this proxy.
+    """
+
+    __slots__ = ()
+
+    def __getattr__(self, name: str) -> Any:
+        """Get an attribute of the current browser.
+
+        Coroutine methods of an asynchronous browser cannot be used by
+        synchronous commands, since these would never await them.
+        """
+        value = getattr(_current_browser.get(), name)
+        command = _sync_command.get()
+        if command is not None and iscoroutinefunction(value):
+            raise TwillException(
+                f"The command '{command}' cannot be used with the"
+                " asynchronous browser, since it does not await its"
+                f" '{name}' method."
+            )
+        return value
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        """Set an attribute of the current browser."""
+        setattr(_current_browser.get(), name, value)
+
+    def __delattr__(self, name: str) -> None:
+        """Delete an attribute of the current browser."""
+        delattr(_current_browser.get(), name)
+
+    @property  # type: ignore[misc]
+    def __class__(self) -> type:  # so that isinstance() works
+        """Get the class of the current browser."""
+        return type(_current_browser.get())
+
+    def __repr__(self) -> str:
+        """Represent the current browser."""
+        return repr(_current_browser.get())
+
+
+# the global browser is the default, it is shared by all contexts
+_current_browser: ContextVar[BaseTwillBrowser] = ContextVar(
+    "browser",
+    default=TwillBrowser(),  # noqa: B039
+)
+
+
+# the name of the synchronous command that is currently running, if any
+_sync_command: ContextVar[Optional[str]] = ContextVar(
+    "sync_command", default=None
+)
+
+
+@contextmanager
+def sync_command(name: str) -> Iterator[None]:
+    """Mark the synchronous command with the given name as running.
+
+    While it is running, the global browser proxy raises a TwillException
+    if the command tries to use a coroutine method of the browser.
+    """
+    token = _sync_command.set(name)
+    try:
+        yield
+    finally:
+        _sync_command.reset(token)
+
+
+def get_browser() -> BaseTwillBrowser:
+    """Get the twill browser used in the current context."""
+    return _current_browser.get()
+
+
+def set_browser(browser: BaseTwillBrowser) -> Token[BaseTwillBrowser]:
+    """Set the twill browser used in the current context.
 
-        self.result = ResultWrapper(result)
+    Returns a token that can be used to restore the previous browser.
+    """
+    return _current_browser.set(browser)
 
 
-browser = TwillBrowser()  # the global twill browser instance
+# the global twill browser instance (or the one used in the current context)
+browser = cast("TwillBrowser", BrowserProxy())
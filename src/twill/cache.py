@@ -0,0 +1,534 @@
+"""An HTTP cache for the twill browser following RFC 9111.
+
+The cache works like the cache of a web browser. Fresh responses are served
+without contacting the server, and stale responses are revalidated with
+conditional requests using their ETag or Last-Modified validators. The
+responses are kept in memory, where the least recently used responses are
+evicted when the size limit has been reached. Optionally, they are also
+stored in a directory, so that they can be used by later runs. Since the
+cache is kept when the browser is reset and can be shared by the sessions
+of many users, responses that are private or set cookies are not stored.
+
+The cache is used through a transport that wraps the actual transport of
+the HTTP client, so that redirects are cached as well.
+"""
+
+import hashlib
+import json
+import time
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+from httpx import (
+    AsyncBaseTransport,
+    BaseTransport,
+    ByteStream,
+    Headers,
+    Request,
+    Response,
+    StreamConsumed,
+)
+
+from . import log
+
+__all__ = [
+    "AsyncCacheTransport",
+    "CacheTransport",
+    "CachedResponse",
+    "HttpCache",
+    "cache_status",
+]
+
+DEFAULT_MAX_SIZE = 32 * 1024 * 1024  # default size limit of the cache
+HEURISTIC_FRACTION = 0.1  # fraction of the age of the last modification
+
+CACHE_EXTENSION = "twill_cache"  # response extension with the cache status
+
+# status codes of responses that are heuristically cacheable
+_heuristically_cacheable = frozenset(
+    (200, 203, 204, 300, 301, 308, 404, 405, 410, 414, 501)
+)
+# status codes of responses that can be cached with explicit freshness
+_cacheable = _heuristically_cacheable | {302, 307}
+
+# methods that invalidate the cached responses for their targets
+_unsafe_methods = frozenset(("DELETE", "PATCH", "POST", "PUT"))
+
+# headers of a 304 response that must not update the stored response
+_not_updated = frozenset(
+    (
+        "content-encoding",
+        "content-length",
+        "content-type",
+        "set-cookie",
+        "transfer-encoding",
+    )
+)
+
+CacheControl = Dict[str, Optional[str]]
+
+
+def _cache_control(headers: Headers) -> CacheControl:
+    """Get the cache directives from the given headers."""
+    directives: CacheControl = {}
+    for value in headers.get_list("cache-control", split_commas=True):
+        name, sep, argument = value.partition("=")
+        name = name.strip().lower()
+        if name:
+            directives[name] = argument.strip().strip('"') if sep else None
+    return directives
+
+
+def _seconds(value: Optional[str]) -> Optional[int]:
+    """Get a number of seconds from a header value or directive."""
+    if value is None:
+        return None
+    try:
+        seconds = int(value)
+    except ValueError:
+        return None
+    return max(0, seconds)
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    """Get the timestamp of an HTTP date."""
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def cache_status(response: Response) -> Optional[str]:
+    """Get how the given response was served by the HTTP cache.
+
+    Returns 'hit' if the response was served from the cache, 'revalidated'
+    if it was served from the cache after revalidating it with the server,
+    or None if the response was received from the server.
+    """
+    return response.extensions.get(CACHE_EXTENSION)
+
+
+class CachedResponse(NamedTuple):
+    """A response that has been stored in the HTTP cache."""
+
+    url: str  # the URL of the request
+    status: int  # the status code of the response
+    headers: List[Tuple[str, str]]  # the headers of the response
+    content: bytes  # the raw, possibly compressed, body of the response
+    request_time: float  # the time when the request was sent
+    response_time: float  # the time when the response was received
+    vary: Tuple[Tuple[str, Optional[str]], ...]  # the varying request headers
+
+    def to_json(self) -> str:
+        """Serialize the cached response as JSON."""
+        return json.dumps(
+            {
+                "url": self.url,
+                "status": self.status,
+                "headers": self.headers,
+                "content": b64encode(self.content).decode("ascii"),
+                "request_time": self.request_time,
+                "response_time": self.response_time,
+                "vary": self.vary,
+            },
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def from_json(cls, data: str) -> "CachedResponse":
+        """Deserialize a cached response from JSON."""
+        response = json.loads(data)
+        return cls(
+            response["url"],
+            response["status"],
+            [(name, value) for name, value in response["headers"]],
+            b64decode(response["content"], validate=True),
+            response["request_time"],
+            response["response_time"],
+            tuple((name, value) for name, value in response["vary"]),
+        )
+
+    def age(self, now: float) -> float:
+        """Get the current age of the response in seconds."""
+        headers = Headers(self.headers)
+        date = _timestamp(headers.get("date")) or self.response_time
+        apparent_age = max(0.0, self.response_time - date)
+        age = _seconds(headers.get("age")) or 0
+        corrected_age = age + self.response_time - self.request_time
+        return max(apparent_age, corrected_age) + now - self.response_time
+
+    def freshness_lifetime(self) -> float:
+        """Get the time in seconds during which the response is fresh."""
+        headers = Headers(self.headers)
+        max_age = _seconds(_cache_control(headers).get("max-age"))
+        if max_age is not None:
+            return max_age
+        date = _timestamp(headers.get("date")) or self.response_time
+        expires = headers.get("expires")
+        if expires is not None:
+            expires_time = _timestamp(expires)
+            return max(0.0, expires_time - date) if expires_time else 0.0
+        if self.status in _heuristically_cacheable:
+            last_modified = _timestamp(headers.get("last-modified"))
+            if last_modified:
+                return max(0.0, date - last_modified) * HEURISTIC_FRACTION
+        return 0.0
+
+    def is_fresh(self, now: float, request_directives: CacheControl) -> bool:
+        """Check whether the response can be used without revalidation."""
+        if "no-cache" in _cache_control(Headers(self.headers)):
+            return False
+        lifetime = self.freshness_lifetime()
+        max_age = _seconds(request_directives.get("max-age"))
+        if max_age is not None:
+            lifetime = min(lifetime, max_age)
+        return lifetime > self.age(now)
+
+    def matches(self, request: Request) -> bool:
+        """Check whether the response can be used for the given request."""
+        headers = request.headers
+        return all(headers.get(name) == value for name, value in self.vary)
+
+    def response(self, request: Request, status: str, now: float) -> Response:
+        """Create a response for the request from the cached response."""
+        headers = Headers(self.headers)
+        headers["Age"] = str(int(self.age(now)))
+        return Response(
+            self.status,
+            headers=headers,
+            stream=ByteStream(self.content),
+            request=request,
+            extensions={CACHE_EXTENSION: status},
+        )
+
+
+class HttpCache:
+    """An HTTP cache with a size limit and optional storage on disk.
+
+    The size limit in bytes applies to the bodies of the responses held
+    in memory. If a directory is given, all responses are also stored as
+    files in this directory, so that they survive the process.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        directory: Union[None, str, Path] = None,
+    ) -> None:
+        """Create an empty HTTP cache."""
+        self.max_size = max_size
+        self.directory = Path(directory) if directory else None
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self._responses: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._size = 0
+        self.hits = 0  # number of responses served from the cache
+        self.revalidations = 0  # number of responses revalidated
+        self.misses = 0  # number of responses received from the server
+
+    def __len__(self) -> int:
+        """Get the number of responses held in memory."""
+        return len(self._responses)
+
+    @property
+    def size(self) -> int:
+        """Get the size of the responses held in memory in bytes."""
+        return self._size
+
+    def _path(self, key: str) -> Optional[Path]:
+        """Get the path of the file for the given key."""
+        if not self.directory:
+            return None
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.directory / f"{digest}.cache"
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Get the cached response for the given key."""
+        responses = self._responses
+        response = responses.get(key)
+        if response is not None:
+            responses.move_to_end(key)
+            return response
+        path = self._path(key)
+        if not path:
+            return None
+        try:
+            response = CachedResponse.from_json(
+                path.read_text(encoding="utf-8")
+            )
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            log.warning("Ignoring invalid cache file %s: %s", path, error)
+            return None
+        self._remember(key, response)
+        return response
+
+    def put(self, key: str, response: CachedResponse) -> None:
+        """Store the response for the given key."""
+        self._forget(key)
+        self._remember(key, response)
+        path = self._path(key)
+        if path:
+            try:
+                path.write_text(response.to_json(), encoding="utf-8")
+            except OSError as error:
+                log.warning("Cannot write cache file %s: %s", path, error)
+
+    def delete(self, key: str) -> None:
+        """Remove the response for the given key."""
+        self._forget(key)
+        path = self._path(key)
+        if path:
+            path.unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """Remove all responses from the cache."""
+        self._responses.clear()
+        self._size = 0
+        if self.directory:
+            for path in self.directory.glob("*.cache"):
+                path.unlink(missing_ok=True)
+
+    def _remember(self, key: str, response: CachedResponse) -> None:
+        """Hold the response in memory, evicting the oldest responses."""
+        size = len(response.content)
+        if size > self.max_size:
+            return
+        responses = self._responses
+        responses[key] = response
+        self._size += size
+        while self._size > self.max_size:
+            _key, evicted = responses.popitem(last=False)
+            self._size -= len(evicted.content)
+
+    def _forget(self, key: str) -> None:
+        """Remove the response from memory."""
+        response = self._responses.pop(key, None)
+        if response is not None:
+            self._size -= len(response.content)
+
+    def lookup(
+        self, request: Request
+    ) -> Tuple[Optional[Response], Optional[CachedResponse]]:
+        """Look up the response for a request that is about to be sent.
+
+        Returns a response if the request can be answered from the cache.
+        Otherwise, if the request can be made conditional, this is done,
+        and the stale response that shall be revalidated is returned.
+        """
+        if request.method != "GET":
+            return None, None
+        directives = _cache_control(request.headers)
+        if "no-store" in directives:
+            return None, None
+        cached = self.get(str(request.url))
+        if cached is None or not cached.matches(request):
+            return None, None
+        now = time.time()
+        if "no-cache" not in directives and cached.is_fresh(now, directives):
+            self.hits += 1
+            return cached.response(request, "hit", now), None
+        headers = Headers(cached.headers)
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if not (etag or last_modified):
+            return None, None
+        request_headers = request.headers
+        if (
+            "if-none-match" in request_headers
+            or "if-modified-since" in request_headers
+        ):
+            return None, None  # the request is already conditional
+        if etag:
+            request_headers["If-None-Match"] = etag
+        if last_modified:
+            request_headers["If-Modified-Since"] = last_modified
+        return None, cached
+
+    def needs_content(
+        self,
+        request: Request,
+        response: Response,
+        cached: Optional[CachedResponse],
+    ) -> bool:
+        """Check whether the content of a received response is needed.
+
+        Unsafe requests invalidate the cached responses for their targets.
+        """
+        method = request.method
+        status = response.status_code
+        if method in _unsafe_methods:
+            if status < 400:  # noqa: PLR2004
+                self._invalidate(request, response)
+            return False
+        if method != "GET":
+            return False
+        if cached is not None and status == 304:  # noqa: PLR2004
+            return True
+        self.misses += 1
+        return self._storable(request, response)
+
+    def _invalidate(self, request: Request, response: Response) -> None:
+        """Invalidate the cached responses after an unsafe request."""
+        url = request.url
+        self.delete(str(url))
+        for name in ("location", "content-location"):
+            location = response.headers.get(name)
+            if location:
+                target = url.join(location)
+                if target.host == url.host:
+                    self.delete(str(target))
+
+    @staticmethod
+    def _storable(request: Request, response: Response) -> bool:
+        """Check whether the response to a GET request can be stored."""
+        status = response.status_code
+        if status not in _cacheable:
+            return False
+        if "no-store" in _cache_control(request.headers):
+            return False
+        headers = response.headers
+        directives = _cache_control(headers)
+        if "no-store" in directives or "private" in directives:
+            return False
+        if "set-cookie" in headers:  # belongs to the session of one user
+            return False
+        if "*" in headers.get("vary", ""):
+            return False
+        if "max-age" in directives or "expires" in headers:
+            return True
+        return status in _heuristically_cacheable and (
+            "etag" in headers or "last-modified" in headers
+        )
+
+    def store(
+        self,
+        request: Request,
+        response: Response,
+        content: bytes,
+        cached: Optional[CachedResponse],
+        request_time: float,
+    ) -> Response:
+        """Store a received response and return the response to be used.
+
+        If a stale response has been revalidated, it is updated and used.
+        """
+        now = time.time()
+        key = str(request.url)
+        if cached is not None and response.status_code == 304:  # noqa: PLR2004
+            self.revalidations += 1
+            headers = Headers(cached.headers)
+            for name, value in response.headers.items():
+                if name not in _not_updated:
+                    headers[name] = value
+            cached = cached._replace(
+                headers=list(headers.items()),
+                request_time=request_time,
+                response_time=now,
+            )
+            self.put(key, cached)
+            return cached.response(request, "revalidated", now)
+        headers = response.headers
+        vary = tuple(
+            (name, request.headers.get(name))
+            for name in (
+                name.strip().lower()
+                for name in headers.get("vary", "").split(",")
+            )
+            if name
+        )
+        self.put(
+            key,
+            CachedResponse(
+                key,
+                response.status_code,
+                list(headers.items()),
+                content,
+                request_time,
+                now,
+                vary,
+            ),
+        )
+        return Response(
+            response.status_code,
+            headers=headers,
+            stream=ByteStream(content),
+            request=request,
+            extensions=response.extensions,
+        )
+
+
+class CacheTransport(BaseTransport):
+    """A transport that uses an HTTP cache if one has been set."""
+
+    def __init__(
+        self, transport: BaseTransport, cache: Optional[HttpCache] = None
+    ) -> None:
+        """Wrap the given transport."""
+        self.transport = transport
+        self.cache = cache
+
+    def handle_request(self, request: Request) -> Response:
+        """Handle the request using the cache if possible."""
+        cache = self.cache
+        if cache is None:
+            return self.transport.handle_request(request)
+        response, cached = cache.lookup(request)
+        if response is not None:
+            return response
+        request_time = time.time()
+        response = self.transport.handle_request(request)
+        if not cache.needs_content(request, response, cached):
+            return response
+        try:
+            content = b"".join(response.iter_raw())
+        except StreamConsumed:  # the transport has read the response
+            content = response.content
+        finally:
+            response.close()
+        return cache.store(request, response, content, cached, request_time)
+
+    def close(self) -> None:
+        """Close the wrapped transport."""
+        self.transport.close()
+
+
+class AsyncCacheTransport(AsyncBaseTransport):
+    """An asynchronous transport that uses an HTTP cache if one is set."""
+
+    def __init__(
+        self, transport: AsyncBaseTransport, cache: Optional[HttpCache] = None
+    ) -> None:
+        """Wrap the given transport."""
+        self.transport = transport
+        self.cache = cache
+
+    async def handle_async_request(self, request: Request) -> Response:
+        """Handle the request using the cache if possible."""
+        cache = self.cache
+        if cache is None:
+            return await self.transport.handle_async_request(request)
+        response, cached = cache.lookup(request)
+        if response is not None:
+            return response
+        request_time = time.time()
+        response = await self.transport.handle_async_request(request)
+        if not cache.needs_content(request, response, cached):
+            return response
+        try:
+            content = b"".join([chunk async for chunk in response.aiter_raw()])
+        except StreamConsumed:  # the transport has read the response
+            content = response.content
+        finally:
+            await response.aclose()
+        return cache.store(request, response, content, cached, request_time)
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self.transport.aclose()
@@ -0,0 +1,285 @@
+"""Recording and replaying of HTTP exchanges for the twill browser.
+
+A cassette holds the requests sent by the browser together with the raw
+responses received from the server. While recording, every exchange is
+appended to the cassette file as a compressed line of JSON. When replaying,
+the responses are served from the cassette without using the network, so
+that scripts can be run offline, and much faster than against a real server.
+
+Like the HTTP cache, the cassette is used through a transport that wraps
+the actual transport of the HTTP client, so that redirects are recorded and
+replayed as well.
+"""
+
+import gzip
+import hashlib
+import json
+from base64 import b64decode, b64encode
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from httpx import (
+    AsyncBaseTransport,
+    BaseTransport,
+    ByteStream,
+    ConnectError,
+    Request,
+    Response,
+    StreamConsumed,
+)
+
+from . import log
+
+__all__ = [
+    "AsyncCassetteTransport",
+    "Cassette",
+    "CassetteTransport",
+    "Exchange",
+]
+
+
+def _digest(content: bytes) -> str:
+    """Get a digest of a request body for matching requests."""
+    return hashlib.sha256(content).hexdigest()[:16] if content else ""
+
+
+class Exchange(NamedTuple):
+    """A request and the response that was received for it."""
+
+    method: str  # the method of the request
+    url: str  # the URL of the request
+    body: str  # a digest of the request body, empty if there is none
+    status: int  # the status code of the response
+    headers: List[Tuple[str, str]]  # the headers of the response
+    content: bytes  # the raw, possibly compressed, body of the response
+
+    def to_json(self) -> str:
+        """Serialize the exchange as a line of JSON."""
+        data: Dict[str, object] = {
+            "method": self.method,
+            "url": self.url,
+            "body": self.body,
+            "status": self.status,
+            "headers": self.headers,
+        }
+        try:
+            data["text"] = self.content.decode("utf-8")
+        except UnicodeDecodeError:
+            data["content"] = b64encode(self.content).decode("ascii")
+        return json.dumps(data, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, line: str) -> "Exchange":
+        """Deserialize an exchange from a line of JSON."""
+        data = json.loads(line)
+        text = data.get("text")
+        content = (
+            text.encode("utf-8")
+            if text is not None
+            else b64decode(data.get("content", ""))
+        )
+        return cls(
+            data["method"],
+            data["url"],
+            data.get("body", ""),
+            data["status"],
+            [(name, value) for name, value in data["headers"]],
+            content,
+        )
+
+    def response(self, request: Request) -> Response:
+        """Create a response for the given request from the exchange."""
+        return Response(
+            self.status,
+            headers=self.headers,
+            stream=ByteStream(self.content),
+            request=request,
+        )
+
+
+class Cassette:
+    """Exchanges that are recorded or replayed by the twill browser.
+
+    If a filename is given, the cassette is read from that file when
+    replaying, and the file is overwritten with the recorded exchanges
+    when recording.
+    """
+
+    def __init__(
+        self,
+        filename: Union[None, str, Path] = None,
+        *,
+        replay: bool = False,
+        exchanges: Iterable[Exchange] = (),
+    ) -> None:
+        """Create a cassette for recording or replaying exchanges."""
+        self.filename = Path(filename) if filename else None
+        self.replaying = replay
+        self.exchanges: List[Exchange] = list(exchanges)
+        if self.filename:
+            if replay:
+                self.exchanges.extend(self.read(self.filename))
+            else:
+                self.filename.write_bytes(b"")
+        # the recorded exchanges per method and URL
+        self._index: Dict[Tuple[str, str], List[Exchange]] = {}
+        # the position of the next exchange to be replayed per method and URL
+        self._positions: Dict[Tuple[str, str], int] = {}
+        for exchange in self.exchanges:
+            self._add(exchange)
+
+    def __len__(self) -> int:
+        """Get the number of exchanges in the cassette."""
+        return len(self.exchanges)
+
+    @staticmethod
+    def read(filename: Union[str, Path]) -> List[Exchange]:
+        """Read the exchanges from the given cassette file."""
+        with gzip.open(filename, "rt", encoding="utf-8") as f:
+            return [Exchange.from_json(line) for line in f if line.strip()]
+
+    def save(self, filename: Union[str, Path]) -> None:
+        """Save all exchanges to the given cassette file."""
+        with gzip.open(filename, "wt", encoding="utf-8") as f:
+            for exchange in self.exchanges:
+                f.write(exchange.to_json() + "\n")
+
+    def _add(self, exchange: Exchange) -> None:
+        """Add the exchange to the index."""
+        key = (exchange.method, exchange.url)
+        self._index.setdefault(key, []).append(exchange)
+
+    def rewind(self) -> None:
+        """Replay the exchanges from the start again."""
+        self._positions.clear()
+
+    def record(
+        self, request: Request, response: Response, content: bytes
+    ) -> None:
+        """Record the exchange for the given request and response."""
+        exchange = Exchange(
+            request.method,
+            str(request.url),
+            _digest(request.content),
+            response.status_code,
+            list(response.headers.multi_items()),
+            content,
+        )
+        self.exchanges.append(exchange)
+        self._add(exchange)
+        if self.filename:
+            # every exchange is appended as a separate gzip member,
+            # so that the file is usable even if the run is aborted
+            try:
+                with gzip.open(self.filename, "at", encoding="utf-8") as f:
+                    f.write(exchange.to_json() + "\n")
+            except OSError as error:
+                log.warning(
+                    "Cannot write cassette file %s: %s", self.filename, error
+                )
+
+    def play(self, request: Request) -> Response:
+        """Get the recorded response for the given request.
+
+        Requests with the same method and URL get the recorded responses in
+        the order in which they were recorded, preferring those for requests
+        with the same body, and starting over when all have been replayed.
+        """
+        key = (request.method, str(request.url))
+        exchanges = self._index.get(key)
+        if not exchanges:
+            raise ConnectError(
+                f"No recorded response for {key[0]} {key[1]}",
+                request=request,
+            )
+        count = len(exchanges)
+        position = self._positions.get(key, 0)
+        body = _digest(request.content)
+        for offset in range(count):
+            index = (position + offset) % count
+            if exchanges[index].body == body:
+                break
+        else:  # the body differs, e.g. because of a multipart boundary
+            index = position % count
+        self._positions[key] = index + 1
+        return exchanges[index].response(request)
+
+
+class CassetteTransport(BaseTransport):
+    """A transport that records or replays exchanges if a cassette is set."""
+
+    def __init__(
+        self, transport: BaseTransport, cassette: Optional[Cassette] = None
+    ) -> None:
+        """Wrap the given transport."""
+        self.transport = transport
+        self.cassette = cassette
+
+    def handle_request(self, request: Request) -> Response:
+        """Handle the request using the cassette if there is one."""
+        cassette = self.cassette
+        if cassette is None:
+            return self.transport.handle_request(request)
+        request.read()  # the body is needed for matching the request
+        if cassette.replaying:
+            return cassette.play(request)
+        response = self.transport.handle_request(request)
+        try:
+            content = b"".join(response.iter_raw())
+        except StreamConsumed:  # the transport has read the response
+            content = response.content
+        finally:
+            response.close()
+        cassette.record(request, response, content)
+        return Response(
+            response.status_code,
+            headers=response.headers,
+            stream=ByteStream(content),
+            request=request,
+            extensions=response.extensions,
+        )
+
+    def close(self) -> None:
+        """Close the wrapped transport."""
+        self.transport.close()
+
+
+class AsyncCassetteTransport(AsyncBaseTransport):
+    """An asynchronous transport that records or replays exchanges."""
+
+    def __init__(
+        self,
+        transport: AsyncBaseTransport,
+        cassette: Optional[Cassette] = None,
+    ) -> None:
+        """Wrap the given transport."""
+        self.transport = transport
+        self.cassette = cassette
+
+    async def handle_async_request(self, request: Request) -> Response:
+        """Handle the request using the cassette if there is one."""
+        cassette = self.cassette
+        if cassette is None:
+            return await self.transport.handle_async_request(request)
+        await request.aread()
+        if cassette.replaying:
+            return cassette.play(request)
+        response = await self.transport.handle_async_request(request)
+        try:
+            content = b"".join([chunk async for chunk in response.aiter_raw()])
+        except StreamConsumed:  # the transport has read the response
+            content = response.content
+        finally:
+            await response.aclose()
+        cassette.record(request, response, content)
+        return Response(
+            response.status_code,
+            headers=response.headers,
+            stream=ByteStream(content),
+            request=request,
+            extensions=response.extensions,
+        )
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self.transport.aclose()
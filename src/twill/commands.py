@@ -8,14 +8,19 @@ import getpass
 import re
 import sys
 import time
+from contextvars import ContextVar
 from os.path import sep
 from typing import Any, Dict, Optional
 
 from . import log, set_err_out, set_output, utils
 from .agents import agents
 from .browser import browser
+from .cache import HttpCache
+from .cassette import Cassette
 from .errors import TwillAssertionError, TwillException
 from .namespaces import get_twill_glocals
+from .stats import get_timers
+from .stub import Stubs
 
 __all__ = [
     "add_auth",
@@ -24,8 +29,10 @@ __all__ = [
     "agent",
     "back",
     "browser",
+    "cache",
     "clear_cookies",
     "clear_extra_headers",
+    "clear_stubs",
     "code",
     "config",
     "debug",
@@ -51,12 +58,17 @@ __all__ = [
     "go",
     "info",
     "load_cookies",
+    "max_redirects",
+    "max_size",
+    "max_time",
     "not_find",
     "notfind",
     "options",
+    "record",
     "redirect_error",
     "redirect_output",
     "reload",
+    "replay",
     "reset_browser",
     "reset_error",
     "reset_output",
@@ -77,26 +89,37 @@ __all__ = [
     "show_history",
     "show_html",
     "show_links",
+    "show_timers",
+    "show_timings",
     "showcookies",
     "showforms",
     "showhistory",
     "showhtml",
     "showlinks",
     "sleep",
+    "stub",
+    "stub_file",
     "submit",
     "tidy_ok",
     "timeout",
+    "timer_start",
+    "timer_stop",
     "title",
     "url",
 ]
 
 
-def reset_browser(base_url: str = "") -> None:
+def reset_browser(
+    base_url: str = "", *, keep_connections: bool = False
+) -> None:
     """>> reset_browser [base_url]
 
     Reset the browser completely.
     """
-    browser.reset(base_url=base_url)
+    if keep_connections:
+        browser.soft_reset(base_url)
+    else:
+        browser.reset(base_url=base_url)
     options.clear()
     options.update(default_options)
 
@@ -146,6 +169,50 @@ def code(should_be: int) -> None:
         raise TwillAssertionError(f"code is {browser.code} != {should_be}")
 
 
+def _current_result() -> utils.ResultWrapper:
+    """Get the current page or raise an error if there is none."""
+    result = browser.result
+    if result is None:
+        raise TwillAssertionError("not viewing any page!")
+    return result
+
+
+def max_time(milliseconds: str, which: str = "all") -> None:
+    """>> max_time <milliseconds> [all|last]
+
+    Check that loading the current page did not take longer than the given
+    time. This includes redirects and meta refreshes unless 'last' is given,
+    in which case only the last request is checked.
+    """
+    if which not in ("all", "last"):
+        raise TwillException(
+            f"max_time can check 'all' or 'last', not {which!r}"
+        )
+    result = _current_result()
+    utils.check_time(result, float(milliseconds), last=which == "last")
+
+
+def max_size(size: str) -> None:
+    """>> max_size <bytes>
+
+    Check that no more than the given number of bytes have been received for
+    the current page, including redirects and meta refreshes.
+    """
+    result = _current_result()
+    utils.check_size(result, utils.make_int(size))
+
+
+def max_redirects(redirects: str) -> None:
+    """>> max_redirects <n>
+
+    Check that the current page has not been redirected (via HTTP or meta
+    refresh) more than the given number of times.  A negative number
+    means that there is no limit.
+    """
+    result = _current_result()
+    utils.check_redirects(result, utils.make_int(redirects))
+
+
 def tidy_ok() -> None:
     """>> tidy_ok
 
@@ -284,7 +351,8 @@ def back() -> None:
 def show(what: Optional[str] = None) -> None:
     """>> show [<objects>]
 
-    Show the specified objects (html, cookies, forms, links, history).
+    Show the specified objects (html, cookies, forms, links, history,
+    timers, timings).
     """
     if not what:
         what = "html"
@@ -363,6 +431,53 @@ def sleep(interval: str = "1") -> None:
     time.sleep(float(interval))
 
 
+def timer_start(name: str) -> None:
+    """>> timer_start <name>
+
+    Start the timer for the transaction with the given name.
+    """
+    get_timers().start(name)
+
+
+def timer_stop(name: str) -> None:
+    """>> timer_stop <name>
+
+    Stop the timer for the transaction with the given name.
+
+    The elapsed time is recorded and aggregated with the other times
+    measured for the same transaction. It is also logged and stored in
+    seconds in the global variable __timer__.
+    """
+    seconds = get_timers().stop(name)
+    log.info("Transaction '%s' took %.3f s.", name, seconds)
+    get_twill_glocals()[0]["__timer__"] = seconds
+
+
+def show_timings() -> None:
+    """>> show_timings
+
+    Show the timings of the requests that were needed for the current page.
+
+    Note: Use browser.timings to get the timings programmatically.
+    """
+    browser.show_timings()
+
+
+def show_timers() -> None:
+    """>> show_timers
+
+    Show the times that have been measured for all transactions.
+    """
+    summary = get_timers().summary()
+    if summary:
+        log.info("\nTransaction timers:\n")
+        for line in summary:
+            log.info("\t%s", line)
+        log.info("")
+    else:
+        log.info("No transactions have been timed.")
+
+
 def agent(what: str) -> None:
     """>> agent <agent>
 
@@ -489,7 +604,28 @@ def form_value(form_name: str, field_name: str, value: str) -> None:
         raise TwillAssertionError("Form not found")
 
     control = browser.form_field(form, field_name)
+    if not prepare_form_control(form, control):
+        return
 
+    value = browser.decode(value)
+    utils.set_form_control_value(control, value)
+
+
+fv = formvalue = form_value  # backward compatibility and convenience
+
+
+def prepare_form_control(
+    form: utils.FormElement, control: utils.FieldElement
+) -> bool:
+    """Prepare setting the value of a form control.
+
+    Records a click on the control.  Read-only controls are made
+    writeable if this has been configured; otherwise, False is returned,
+    meaning that the value shall not be changed.  File upload controls
+    cannot be set and raise a TwillException.
+
+    This is used by 'form_value' and by extensions that fill in forms.
+    """
     browser.clicked(form, control)
 
     attrib = getattr(control, "attrib", {})
@@ -499,18 +635,14 @@ def form_value(form_name: str, field_name: str, value: str) -> None:
             del attrib["readonly"]
         else:
             log.info("Form field is read-only or ignorable; nothing done.")
-            return
+            return False
 
     if getattr(control, "type", None) == "file":
         raise TwillException(
             'form field is for file upload; use "form_file" instead'
         )
 
-    value = browser.decode(value)
-    utils.set_form_control_value(control, value)
-
-
-fv = formvalue = form_value  # backward compatibility and convenience
+    return True
 
 
 def form_action(form_name: str, action_url: str) -> None:
@@ -636,6 +768,140 @@ def get_password(prompt: str) -> str:
 getpassword = get_password  # backward compatibility and convenience
 
 
+def cache(what: str = "", directory: str = "") -> None:
+    """>> cache [on|off|clear] [<directory>]
+
+    Enable, disable or clear the HTTP cache of the browser, or show its state.
+
+    Fresh responses are served from the cache, and stale responses are
+    revalidated with conditional requests. When enabling the cache, you can
+    give a directory for storing the responses, so that they can be used in
+    later runs. The cache is kept when the browser is reset.
+    """
+    current = browser.cache
+    if what == "on":
+        if current is None or directory:
+            browser.cache = HttpCache(directory=directory or None)
+    elif what == "off":
+        browser.cache = None
+    elif what == "clear":
+        if current is not None:
+            current.clear()
+    elif what:
+        raise TwillException(f"Unknown cache action: {what!r}")
+    elif current is None:
+        log.info("The HTTP cache is disabled.")
+    else:
+        log.info(
+            "The HTTP cache holds %d response(s) with %d bytes in memory.",
+            len(current),
+            current.size,
+        )
+        if current.directory:
+            log.info("Responses are stored in %s.", current.directory)
+        log.info(
+            "Hits: %d, revalidated: %d, misses: %d.",
+            current.hits,
+            current.revalidations,
+            current.misses,
+        )
+
+
+def record(filename: str) -> None:
+    """>> record <filename>|off
+
+    Record all requests and responses in the given cassette file.
+
+    The file is overwritten, and every exchange is added to it immediately.
+    The recorded exchanges can be replayed using 'replay'. Recording is
+    continued when the browser is reset, until 'record off' is given.
+    """
+    if filename == "off":
+        browser.cassette = None
+        log.info("Recording has been stopped.")
+    else:
+        browser.cassette = Cassette(filename)
+        log.info("Recording requests to %s.", filename)
+
+
+def replay(filename: str) -> None:
+    """>> replay <filename>|off
+
+    Replay the responses recorded in the given cassette file.
+
+    No requests will be sent over the network; requests that have not been
+    recorded fail as if the server could not be reached. Replaying is
+    continued when the browser is reset, until 'replay off' is given.
+    """
+    if filename == "off":
+        browser.cassette = None
+        log.info("Replaying has been stopped.")
+        return
+    try:
+        cassette = Cassette(filename, replay=True)
+    except (OSError, ValueError, KeyError) as error:
+        raise TwillException(
+            f"Cannot replay cassette {filename}: {error}"
+        ) from error
+    browser.cassette = cassette
+    log.info(
+        "Replaying %d recorded response(s) from %s.", len(cassette), filename
+    )
+
+
+def _get_stubs() -> Stubs:
+    """Get the stubs of the browser, adding them if necessary."""
+    stubs = browser.stubs
+    if stubs is None:
+        stubs = browser.stubs = Stubs()
+    return stubs
+
+
+def stub(
+    method: str,
+    pattern: str,
+    status: str = "200",
+    body: str = "",
+    *headers: str,
+) -> None:
+    """>> stub <method> <pattern> [<status> [<body> [<header> ...]]]
+
+    Answer requests matching the given method and URL pattern in-process.
+
+    The method can be '*' to match all methods. The pattern is a regular
+    expression that must match the path of the URL, or the whole URL if it
+    contains a scheme. Headers are given as "Name: value". Requests that do
+    not match any stub are sent as usual.
+    """
+    try:
+        _get_stubs().add(method, pattern, int(status), body, headers)
+    except ValueError as error:
+        raise TwillException(f"Cannot add stub: {error}") from error
+
+
+def stub_file(filename: str) -> None:
+    """>> stub_file <filename>
+
+    Add the stubs defined in the given file.
+
+    Every line of the file contains the method, the URL pattern, the status
+    and an optional body of a stub, followed by indented header lines.
+    A body starting with "@" is read from the file with the given name.
+    """
+    try:
+        _get_stubs().load(filename)
+    except (OSError, ValueError) as error:
+        raise TwillException(f"Cannot load stubs: {error}") from error
+
+
+def clear_stubs() -> None:
+    """>> clear_stubs
+
+    Remove all stubs, so that all requests are sent as usual.
+    """
+    browser.stubs = None
+
+
 def save_cookies(filename: str) -> None:
     """>> save_cookies <filename>
 
@@ -883,12 +1149,19 @@ def clear_extra_headers() -> None:
 
 default_options: Dict[str, Any] = {
     "equiv_refresh_interval": 2,
+    "history_limit": 0,
+    "max_redirects": -1,
+    "max_size": 0,
+    "max_time": 0,
     "readonly_controls_writeable": False,
     "require_tidy": False,
     "with_default_realm": False,
 }
 
-options = default_options.copy()  # the global options dictionary
+# the global options dictionary (or the one used in the current context)
+options = utils.ContextDict(
+    ContextVar("options", default=default_options.copy())  # noqa: B039
+)
 
 
 def config(key: Optional[str] = None, value: Any = None) -> None:
@@ -902,9 +1175,16 @@ def config(key: Optional[str] = None, value: Any = None) -> None:
     So far:
 
      * 'equiv_refresh_interval', default 2 -- time limit for HTTP-EQUIV=REFRESH
+     * 'history_limit', default 0 -- maximum pages kept in the history
+     * 'max_redirects', default -1 -- maximum redirects for every page load
+     * 'max_size', default 0 -- maximum bytes received for every page load
+     * 'max_time', default 0 -- maximum milliseconds for every page load
      * 'readonly_controls_writeable', default False -- all controls writeable
      * 'require_tidy', default False -- *require* that tidy be installed
      * 'with_default_realm', default False -- use a default realm for HTTP AUTH
+
+    A maximum value of 0 means that there is no such budget or limit,
+    except for 'max_redirects', where a negative value means no limit.
     """
     info = log.info
     if key is None:
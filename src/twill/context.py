@@ -0,0 +1,56 @@
+"""Run twill in separate execution contexts.
+
+The browser, the options, the namespaces, the list of commands and the
+transaction timers that are used by twill are stored in context variables.
+By default, all code shares the same global objects. Code that runs in a
+separate context, for instance in different threads, can use its own
+objects instead, so that several twill scripts can run concurrently
+without interfering.
+"""
+
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from . import namespaces
+from .browser import BaseTwillBrowser, TwillBrowser, set_browser
+from .commands import options
+from .parse import command_list
+from .stats import Timers, set_timers
+
+__all__ = ["new_context"]
+
+
+@contextmanager
+def new_context(
+    browser: Optional[BaseTwillBrowser] = None,
+) -> Iterator[BaseTwillBrowser]:
+    """Use a separate browser, options, namespaces, commands and timers.
+
+    Inside the with block, twill uses the given browser or a new
+    synchronous browser, a copy of the current options, copies of the
+    current global namespace and command list, an empty stack of
+    local namespaces, and new transaction timers. The previous objects
+    are restored afterwards, and a browser that has been created here
+    will be closed.
+
+    Since threads do not inherit the context of the thread that started
+    them, every thread that runs twill scripts concurrently with others
+    should do so inside such a with block.
+    """
+    new_browser = None
+    if browser is None:
+        browser = new_browser = TwillBrowser()
+    tokens = (
+        set_browser(browser),
+        options.set(options.copy()),
+        namespaces.new_namespaces(),
+        command_list.set(command_list.copy()),
+        set_timers(Timers()),
+    )
+    try:
+        yield browser
+    finally:
+        for token in reversed(tokens):
+            token.var.reset(token)
+        if new_browser:
+            new_browser.close()
@@ -14,13 +14,21 @@ Commands:
           fv_multi <form_name> field1=value1 field2=value2 field3=value3
 
  * fv_multi_sub -- same as 'fv_multi', followed by a 'submit'.
-"""
 
-import re
+ * fv_values -- set multiple values of one form field at once, e.g.
+
+          fv_values <form_name> countries DE FR -IT
+"""
 
 from twill import browser, commands, log, utils
 
-__all__ = ["fv_match", "fv_multi", "fv_multi_match", "fv_multi_sub"]
+__all__ = [
+    "fv_match",
+    "fv_multi",
+    "fv_multi_match",
+    "fv_multi_sub",
+    "fv_values",
+]
 
 
 def fv_match(form_name: str, field_pattern: str, value: str) -> None:
@@ -37,11 +45,7 @@ def fv_match(form_name: str, field_pattern: str, value: str) -> None:
         log.error("no such form '%s'", form_name)
         return
 
-    regex = re.compile(field_pattern)
-
-    matches = [
-        ctl for ctl in form.inputs if regex.search(str(ctl.get("name")))
-    ]
+    matches = browser.form_index(form).search(field_pattern)
 
     if matches:
         log.info("-- matches %d", len(matches))
@@ -70,11 +74,7 @@ def fv_multi_match(form_name: str, field_pattern: str, *values: str) -> None:
         log.error("no such form '%s'", form_name)
         return
 
-    regex = re.compile(field_pattern)
-
-    matches = [
-        ctl for ctl in form.inputs if regex.search(str(ctl.get("name")))
-    ]
+    matches = browser.form_index(form).search(field_pattern)
 
     if matches:
         log.info("-- matches %d, values %d", len(matches), len(values))
@@ -117,3 +117,26 @@ def fv_multi_sub(form_name: str, *pairs: str) -> None:
         commands.fv(form_name, field_name, value)
 
     commands.submit()
+
+
+def fv_values(form_name: str, field_name: str, *values: str) -> None:
+    """>> fv_values <form_name> <field_name> <value>...
+
+    Set multiple values of a form field, e.g. select many options of a
+    multiple select or check many checkboxes of a group.  The values can
+    be prefixed with '+' or '-' as with 'fv', and they are all set in one
+    go, which is much faster than using 'fv' for every value.
+    """
+    form = browser.form(form_name)
+    if form is None:
+        log.error("no such form '%s'", form_name)
+        return
+
+    control = browser.form_field(form, field_name)
+    if not commands.prepare_form_control(form, control):
+        return
+
+    utils.set_form_control_values(
+        control, [browser.decode(value) for value in values]
+    )
+    log.info("set %d values", len(values))
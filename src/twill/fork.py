@@ -1,23 +1,158 @@
 """The twill multiprocess execution system."""
 
+import asyncio
 import os
 import sys
 import time
-from argparse import ArgumentParser
-from pickle import dump, load
+import traceback
+from argparse import ArgumentParser, Namespace
+from contextlib import suppress
+from multiprocessing import Pipe
+from multiprocessing.connection import Connection, wait
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    cast,
+)
 
-from twill import execute_file, set_log_level
+from httpx import Response
 
+from twill import browser, execute_file, execute_file_async, set_log_level
+from twill.browser import AsyncTwillBrowser, BaseTwillBrowser
+from twill.cassette import Cassette
+from twill.load import (
+    LoadProfile,
+    Scenario,
+    ScenarioMix,
+    profile_names,
+    read_scenarios,
+)
+from twill.stats import Histogram, Timers, set_timers
+from twill.utils import is_asgi_app, load_app
 
-def main() -> None:
-    """Run twill scripts in parallel."""
-    try:
-        if sys.platform == "win32":
-            raise AttributeError
-        fork = os.fork
-    except AttributeError:
-        sys.exit("Error: Must use Unix to be able to fork processes.")
+SOAK_INTERVAL = 60  # default report interval for the soak profile
+
+
+def _script_runner(
+    app: Optional[Callable[..., Any]], url: Optional[str]
+) -> Tuple[BaseTwillBrowser, Callable[[str], None]]:
+    """Get the browser and a function for running scripts.
+
+    If an app is given, the scripts are run against that app in-process.
+    ASGI apps are run with an asynchronous browser in an event loop.
+    The browser keeps its settings and its connections between the runs.
+    """
+    if app is None or not is_asgi_app(app):
+        if app is not None:
+            browser.reset(app=app)
+
+        def run_script(filename: str) -> None:
+            execute_file(filename, initial_url=url, keep_connections=True)
+
+        return browser, run_script
+
+    loop = asyncio.new_event_loop()
+    async_browser = AsyncTwillBrowser(app=app)
 
+    def run_async_script(filename: str) -> None:
+        loop.run_until_complete(
+            execute_file_async(
+                filename,
+                async_browser,
+                initial_url=url,
+                keep_connections=True,
+            )
+        )
+
+    return async_browser, run_async_script
+
+
+def run_child(
+    connection: Connection,
+    scenarios: ScenarioMix,
+    schedule: Iterable[Optional[float]],
+    url: Optional[str] = None,
+    deadline: Optional[float] = None,
+    app: Optional[Callable[..., Any]] = None,
+    cassette: Optional[Cassette] = None,
+) -> None:
+    """Run the scenarios repeatedly and send the timings to the parent.
+
+    The schedule contains the times (as given by time.monotonic) at which
+    the scenarios shall be run, or None if they shall be run immediately.
+    If a deadline is given, no more runs will be started after that time.
+    If an app is given, the scripts send their requests to that app.
+    If a cassette is given, the responses are replayed from the cassette.
+    For every run, a scenario is chosen by weight. After runs that are not
+    followed by a scheduled run, the think time of the scenario is waited.
+
+    After every run, the name of the scenario, the duration of the run,
+    its latency measured from the scheduled time, the error (if one
+    occurred), the durations of all requests in the run and the
+    transaction timers (if any were used) are sent through the given
+    connection.
+    """
+    request_times: List[float] = []
+
+    def record_request(response: Response) -> None:
+        """Record the duration of a request."""
+        with suppress(RuntimeError):  # response has not been read
+            request_times.append(response.elapsed.total_seconds())
+
+    current_browser, run_script = _script_runner(app, url)
+    current_browser.response_hooks.append(record_request)
+    if cassette is not None:
+        current_browser.cassette = cassette
+
+    think_time = 0.0
+    for scheduled in schedule:
+        if scheduled is None and think_time:
+            # the think time is only used when running in a closed loop,
+            # open-loop runs are already spaced out by the schedule
+            time.sleep(think_time)
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            break
+        if scheduled is not None and scheduled > now:
+            time.sleep(scheduled - now)
+        scenario = scenarios.choose()
+        timers = Timers()
+        set_timers(timers)
+        error = None
+        start_time = time.monotonic()
+        try:
+            for filename in scenario.scripts:
+                run_script(filename)
+        except Exception as e:  # noqa: BLE001
+            error = str(e) or e.__class__.__name__
+        end_time = time.monotonic()
+        duration = end_time - start_time
+        # measure the latency from the scheduled time, so that delays
+        # caused by previous slow runs are taken into account
+        latency = end_time - (start_time if scheduled is None else scheduled)
+        timers.started.clear()
+        connection.send(
+            (
+                scenario.name,
+                duration,
+                latency,
+                error,
+                request_times,
+                timers or None,
+            )
+        )
+        request_times.clear()
+        think_time = scenarios.think_time(scenario)
+
+
+def _parse_args(argv: Optional[List[str]]) -> Namespace:
+    """Parse the command line arguments."""
     parser = ArgumentParser()
     add = parser.add_argument
     add(
@@ -45,98 +180,370 @@ def main() -> None:
         type=int,
         help="number of processes to execute in parallel",
     )
+    add(
+        "-d",
+        "--duration",
+        action="store",
+        dest="duration",
+        type=float,
+        help="run for this many seconds instead of a fixed number of times",
+    )
+    add(
+        "-r",
+        "--rate",
+        action="store",
+        dest="rate",
+        type=float,
+        help="target (peak) number of runs per second",
+    )
+    add(
+        "--ramp-up",
+        action="store",
+        dest="ramp_up",
+        default=0,
+        type=float,
+        help="number of seconds for gradually increasing the load",
+    )
+    add(
+        "--profile",
+        action="store",
+        dest="profile",
+        default="constant",
+        choices=profile_names,
+        help="the load profile when running at a given rate",
+    )
+    add(
+        "-i",
+        "--interval",
+        action="store",
+        dest="interval",
+        type=float,
+        help="report statistics in intervals of this many seconds",
+    )
+    add(
+        "-s",
+        "--scenarios",
+        action="store",
+        dest="scenarios",
+        help="file with weighted scenarios to run instead of the scripts",
+    )
+    add(
+        "--app",
+        action="store",
+        dest="app",
+        metavar="MODULE:CALLABLE",
+        help="send the requests to the given WSGI or ASGI app in-process",
+    )
+    add(
+        "--replay",
+        action="store",
+        dest="replay",
+        metavar="CASSETTE",
+        help="replay the responses recorded in the given cassette file",
+    )
     add(
         "scripts",
         metavar="SCRIPT",
-        nargs="+",
+        nargs="*",
         help="one or more twill scripts to execute",
     )
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
 
-    # make sure that the current working directory is in the path
-    if "" not in sys.path:
-        sys.path.append("")
+    if args.scenarios:
+        if args.scripts:
+            parser.error("scripts cannot be given together with scenarios")
+        try:
+            args.scenarios = read_scenarios(args.scenarios)
+            ScenarioMix(args.scenarios)
+        except (OSError, ValueError) as error:
+            parser.error(f"cannot use scenarios: {error}")
+    elif args.scripts:
+        args.scenarios = [Scenario("scripts", tuple(args.scripts))]
+    else:
+        parser.error("no scripts or scenarios have been given")
 
-    average_number = args.number // args.processes
-    last_number = average_number + args.number % args.processes
-    child_pids = []
-    is_parent = True
-    repeat = 0
+    if args.app:
+        try:
+            args.app = load_app(args.app)
+        except (ImportError, AttributeError, TypeError, ValueError) as error:
+            parser.error(f"cannot load app: {error}")
 
-    # start a bunch of child processes and record their pids in the parent
-    for i in range(args.processes):
-        pid = fork()
-        if pid:
-            child_pids.append(pid)
-        else:
-            repeat = average_number if i else last_number
-            is_parent = False
-            break
+    if args.replay:
+        try:
+            args.replay = Cassette(args.replay, replay=True)
+        except (OSError, ValueError, KeyError) as error:
+            parser.error(f"cannot replay cassette: {error}")
 
-    # set the children up to run and record their stats
-    failed = False
+    if args.processes < 1:
+        parser.error("the number of processes must be positive")
+    if args.duration is not None and args.duration <= 0:
+        parser.error("the duration must be positive")
+    if args.ramp_up < 0:
+        parser.error("the ramp-up time must not be negative")
+    if args.rate is None:
+        if args.profile != "constant":
+            parser.error("load profiles can only be used with a rate")
+    elif args.rate <= 0:
+        parser.error("the rate must be positive")
+    elif args.duration is None:
+        args.duration = args.number / args.rate
+    if args.interval is None and args.profile == "soak":
+        args.interval = SOAK_INTERVAL
 
-    if is_parent:
-        time.sleep(1)
+    return args
 
-        total_time = total_exec = 0
 
-        # iterate over all the child pids, wait until they finish,
-        # and then sum statistics
-        for child_pid in child_pids[:]:
-            pid, status = os.waitpid(child_pid, 0)
-            if status or pid != child_pid:  # failure
-                print(
-                    f"[twill-fork parent: process {child_pid} FAILED:"
-                    f" exit status {status}]"
-                )
+def _closed_loop(
+    first: Optional[float], count: Optional[int]
+) -> Iterator[Optional[float]]:
+    """Get a schedule for running as often as possible.
+
+    The first run can be scheduled at a given time, and the number
+    of runs can be limited to the given count.
+    """
+    n = 0
+    while count is None or n < count:
+        yield first if n == 0 else None
+        n += 1
+
+
+def _schedule(
+    args: Namespace, index: int, start_time: float
+) -> Iterable[Optional[float]]:
+    """Get the schedule for the child process with the given index."""
+    processes = args.processes
+    if args.rate:
+        profile = LoadProfile.create(
+            args.profile, args.rate, args.duration, args.ramp_up
+        )
+        return (
+            start_time + arrival
+            for arrival in profile.arrivals(1 / processes, index / processes)
+        )
+    # without a rate, start the processes one after the other
+    # during ramp-up and run the scripts as often as possible
+    delay = args.ramp_up * index / processes
+    count = None
+    if not args.duration:
+        count = args.number // processes
+        if not index:
+            count += args.number % processes
+    return _closed_loop(start_time + delay if delay else None, count)
+
+
+class Statistics:
+    """Statistics collected from the child processes."""
+
+    def __init__(self) -> None:
+        """Initialize the statistics."""
+        self.durations = Histogram()
+        self.latencies = Histogram()
+        self.requests = Histogram()
+        self.timers = Timers()
+        self.errors = 0
+        self.first_error: Optional[str] = None
+
+    def record(
+        self,
+        duration: float,
+        latency: float,
+        error: Optional[str],
+        request_times: List[float],
+        timers: Optional[Timers] = None,
+    ) -> None:
+        """Record the timings of a run."""
+        self.durations.record(duration)
+        self.latencies.record(latency)
+        for request_time in request_times:
+            self.requests.record(request_time)
+        if timers:
+            self.timers.merge(timers)
+        if error:
+            self.errors += 1
+            if self.first_error is None:
+                self.first_error = error
+
+
+def _collect(
+    readers: List[Connection],
+    start_time: float,
+    interval: Optional[float],
+    scenarios: Dict[str, Statistics],
+) -> Statistics:
+    """Collect the timings from the children while they are running.
+
+    If an interval is given, statistics are reported in these intervals.
+    The statistics for every scenario are collected in the given dict.
+    """
+    total = Statistics()
+    current = Statistics()
+    next_report = start_time + interval if interval else None
+    while readers:
+        timeout = (
+            max(0, next_report - time.monotonic()) if next_report else None
+        )
+        for ready in wait(readers, timeout):
+            reader = cast("Connection", ready)
+            try:
+                timings = reader.recv()
+            except EOFError:
+                readers.remove(reader)
+                reader.close()
+                continue
+            name, *timings = timings
+            total.record(*timings)
+            current.record(*timings)
+            if name not in scenarios:
+                scenarios[name] = Statistics()
+            scenarios[name].record(*timings)
+        if interval and next_report and time.monotonic() >= next_report:
+            elapsed = next_report - start_time
+            runs = len(current.durations)
+            print(
+                f"[twill-fork: {elapsed:g} s: {runs} runs,"
+                f" {runs / interval:.2f} runs/s, {current.errors} errors,"
+                f" latency {current.latencies.summary()}]"
+            )
+            current = Statistics()
+            next_report += interval
+    return total
+
+
+def _summarize(
+    args: Namespace,
+    stats: Statistics,
+    scenario_stats: Dict[str, Statistics],
+    total_time: float,
+) -> None:
+    """Print a summary of the collected statistics."""
+    durations, requests = stats.durations, stats.requests
+    total_exec = len(durations)
+    print("\n----\n")
+    print(f"number of processes: {args.processes}")
+    if args.rate:
+        print(f"target rate: {args.rate:g} runs/s ({args.profile} profile)")
+    print(f"total executed: {total_exec}")
+    print(f"errors: {stats.errors}")
+    if stats.first_error:
+        print(f"first error: {stats.first_error}")
+    print(f"total time to execute: {total_time:.2f} s")
+    if total_exec:
+        print(f"average time: {durations.mean * 1000:.2f} ms")
+        print(
+            f"throughput: {total_exec / total_time:.2f} executions/s,"
+            f" {len(requests) / total_time:.2f} requests/s"
+        )
+        print(f"execution time: {durations.summary()}")
+        if args.rate:
+            print(f"latency from scheduled start: {stats.latencies.summary()}")
+        if requests.count:
+            print(f"request time: {requests.summary()}")
+        if stats.timers:
+            print("\ntransaction timers:")
+            for line in stats.timers.summary():
+                print(line)
+        if len(args.scenarios) > 1:
+            print("\nscenarios:")
+            for scenario in args.scenarios:
+                scenario_stat = scenario_stats.get(scenario.name)
+                if not scenario_stat:
+                    print(f"{scenario.name}: 0 runs")
+                    continue
+                runs = len(scenario_stat.durations)
                 print(
-                    "[twill-fork parent:"
-                    " (not counting stats for this process)]"
+                    f"{scenario.name}: {runs} runs"
+                    f" ({runs / total_exec:.1%}),"
+                    f" {scenario_stat.errors} errors,"
+                    f" execution time {scenario_stat.durations.summary()}"
                 )
-                failed = True
-            else:  # record statistics, otherwise
-                filename = f".status.{child_pid}"
-                with open(filename, "rb") as fp:
-                    this_time, n_executed = load(fp)  # noqa: S301
-                os.unlink(filename)  # noqa: PTH108
-                total_time += this_time
-                total_exec += n_executed
-
-        # summarize
-        print("\n----\n")
-        print(f"number of processes: {args.processes}")
-        print(f"total executed: {total_exec}")
-        print(f"total time to execute: {total_time:.2f} s")
-        if total_exec:
-            avg_time = 1000 * total_time / total_exec
-            print(f"average time: {avg_time:.2f} ms")
-        else:
-            print("(nothing completed, no average!)")
-        print()
-
     else:
-        pid = os.getpid()
-        print(f"[twill-fork: pid {pid} : executing {repeat} times]")
+        print("(nothing completed, no average!)")
+    print()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run twill scripts in parallel."""
+    try:
+        if sys.platform == "win32":
+            raise AttributeError
+        fork = os.fork
+    except AttributeError:
+        sys.exit("Error: Must use Unix to be able to fork processes.")
+
+    # make sure that the current working directory is in the path
+    if "" not in sys.path:
+        sys.path.append("")
+
+    args = _parse_args(argv)
+
+    child_pids = []
+    readers: List[Connection] = []
+
+    start_time = time.monotonic()
+    # when running at a given rate, all scheduled runs will be executed,
+    # otherwise, the runs must be started before the end of the duration
+    deadline = (
+        start_time + args.ramp_up + args.duration
+        if args.duration and not args.rate
+        else None
+    )
 
-        start_time = time.time()
+    # start a bunch of child processes and record their pids in the parent;
+    # every child gets a pipe for sending its timings to the parent
+    for i in range(args.processes):
+        reader, writer = Pipe(duplex=False)
+        sys.stdout.flush()
+        pid = fork()
+        if pid:
+            writer.close()
+            child_pids.append(pid)
+            readers.append(reader)
+            continue
+        # this is the child process
+        reader.close()
+        for other_reader in readers:
+            other_reader.close()
+        status = 0
+        try:
+            print(f"[twill-fork: pid {os.getpid()} : started]")
+            set_log_level("warning")
+            run_child(
+                writer,
+                ScenarioMix(args.scenarios),
+                _schedule(args, i, start_time),
+                args.url,
+                deadline,
+                args.app,
+                args.replay,
+            )
+        except BaseException:  # noqa: BLE001
+            traceback.print_exc()
+            status = 1
+        finally:
+            writer.close()
+            sys.stdout.flush()
+            sys.stderr.flush()
+        os._exit(status)
 
-        set_log_level("warning")
-        for _i in range(repeat):
-            for filename in args.scripts:
-                execute_file(filename, initial_url=args.url)
+    scenario_stats: Dict[str, Statistics] = {}
+    stats = _collect(readers, start_time, args.interval, scenario_stats)
+    total_time = time.monotonic() - start_time
 
-        end_time = time.time()
-        this_time = end_time - start_time
+    # wait until all children have finished
+    failed = False
+    for child_pid in child_pids:
+        pid, status = os.waitpid(child_pid, 0)
+        if status or pid != child_pid:  # failure
+            print(
+                f"[twill-fork parent: process {child_pid} FAILED:"
+                f" exit status {status}]"
+            )
+            failed = True
 
-        # write statistics
-        filename = f".status.{pid}"
-        with open(filename, "wb") as fp:
-            info = (this_time, repeat)
-            dump(info, fp)
+    _summarize(args, stats, scenario_stats, total_time)
 
-    sys.exit(-1 if failed else 0)
+    sys.exit(-1 if failed or stats.errors else 0)
 
 
 if __name__ == "__main__":
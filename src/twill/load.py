@@ -0,0 +1,266 @@
+"""Load profiles and scenarios for running twill scripts under load.
+
+A load profile consists of stages with a duration and a target rate of
+script executions per second at the start and at the end of the stage.
+The rate changes linearly within every stage. The profile determines
+the times at which the executions are scheduled, independent of how long
+the executions actually take (open-loop load generation).
+
+A scenario mix consists of scripts with weights and think times. Every
+time a virtual user runs a script, a scenario is chosen by weight.
+"""
+
+from math import sqrt
+from pathlib import Path
+from random import Random
+from typing import (
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+__all__ = [
+    "LoadProfile",
+    "Scenario",
+    "ScenarioMix",
+    "Stage",
+    "profile_names",
+    "read_scenarios",
+]
+
+profile_names = ("constant", "step", "spike", "soak")
+
+STEPS = 4  # number of steps in the step profile
+SPIKE_BASE = 0.2  # base rate of the spike profile relative to the peak
+SPIKE_LENGTH = 0.1  # length of the spike relative to the duration
+
+
+class Stage(NamedTuple):
+    """A stage of a load profile."""
+
+    duration: float  # duration of the stage in seconds
+    start_rate: float  # rate at the start of the stage per second
+    end_rate: float  # rate at the end of the stage per second
+
+
+class LoadProfile:
+    """A load profile consisting of stages with linearly changing rates."""
+
+    def __init__(self, stages: Sequence[Stage]) -> None:
+        """Create a load profile with the given stages."""
+        for stage in stages:
+            if (
+                stage.duration < 0
+                or stage.start_rate < 0
+                or stage.end_rate < 0
+            ):
+                raise ValueError("Durations and rates must not be negative.")
+        self.stages: List[Stage] = list(stages)
+
+    @classmethod
+    def create(
+        cls,
+        name: str,
+        rate: float,
+        duration: float,
+        ramp_up: float = 0,
+    ) -> "LoadProfile":
+        """Create a load profile with the given name.
+
+        The rate is the peak rate of the profile, and the duration is the
+        duration of the profile without the ramp-up time. During ramp-up,
+        the rate increases linearly from zero to the initial rate.
+
+        * constant, soak: run at the given rate all the time
+        * step: increase the rate in four steps up to the given rate
+        * spike: run at a fifth of the given rate, with a spike at the
+          given rate for a tenth of the duration in the middle
+        """
+        if name in ("constant", "soak"):
+            stages = [Stage(duration, rate, rate)]
+        elif name == "step":
+            stages = [
+                Stage(
+                    duration / STEPS, rate * step / STEPS, rate * step / STEPS
+                )
+                for step in range(1, STEPS + 1)
+            ]
+        elif name == "spike":
+            base_rate = rate * SPIKE_BASE
+            base_duration = duration * (1 - SPIKE_LENGTH) / 2
+            stages = [
+                Stage(base_duration, base_rate, base_rate),
+                Stage(duration * SPIKE_LENGTH, rate, rate),
+                Stage(base_duration, base_rate, base_rate),
+            ]
+        else:
+            raise ValueError(f"Unknown load profile: {name!r}")
+        if ramp_up:
+            stages.insert(0, Stage(ramp_up, 0, stages[0].start_rate))
+        return cls(stages)
+
+    @property
+    def duration(self) -> float:
+        """Get the total duration of the profile in seconds."""
+        return sum(stage.duration for stage in self.stages)
+
+    @property
+    def total(self) -> float:
+        """Get the expected total number of executions."""
+        return sum(
+            stage.duration * (stage.start_rate + stage.end_rate) / 2
+            for stage in self.stages
+        )
+
+    def rate_at(self, time: float) -> float:
+        """Get the target rate at the given time in seconds."""
+        start = 0.0
+        for stage in self.stages:
+            end = start + stage.duration
+            if time < end:
+                fraction = (time - start) / stage.duration
+                return stage.start_rate + fraction * (
+                    stage.end_rate - stage.start_rate
+                )
+            start = end
+        return 0.0
+
+    def arrivals(self, share: float = 1, offset: float = 0) -> Iterator[float]:
+        """Get the times at which executions are scheduled.
+
+        The times are given in seconds from the start of the profile.
+        If share is given, only that part of the rate will be used, and
+        the offset (between 0 and 1) shifts the scheduled times, so that
+        several workers using different offsets can share the load.
+        """
+        start = 0.0  # start time of the current stage
+        done = 0.0  # number of executions scheduled before the stage
+        wanted = offset  # the number of executions at the next time
+        for stage in self.stages:
+            # the number of executions in the stage until time t is
+            # a * t + b / 2 * t ** 2 which is solved for t below
+            a = stage.start_rate * share
+            b = (
+                (stage.end_rate - stage.start_rate) * share / stage.duration
+                if stage.duration
+                else 0
+            )
+            in_stage = stage.duration * (a + b * stage.duration / 2)
+            while wanted < done + in_stage:
+                needed = wanted - done
+                if b:
+                    time = (sqrt(a * a + 2 * b * needed) - a) / b
+                else:
+                    time = needed / a
+                yield start + time
+                wanted += 1
+            start += stage.duration
+            done += in_stage
+
+
+class Scenario(NamedTuple):
+    """A scenario consisting of twill scripts."""
+
+    name: str  # the name of the scenario
+    scripts: Tuple[str, ...]  # the scripts that are run in the scenario
+    weight: float = 1  # the relative frequency of the scenario
+    think_time: Tuple[float, float] = (0, 0)  # min and max think time
+
+
+class ScenarioMix:
+    """A mix of scenarios that are chosen randomly according to weights."""
+
+    def __init__(
+        self, scenarios: Sequence[Scenario], seed: Optional[int] = None
+    ) -> None:
+        """Create a scenario mix from the given scenarios."""
+        if not scenarios:
+            raise ValueError("No scenarios have been given.")
+        if any(scenario.weight < 0 for scenario in scenarios):
+            raise ValueError("Weights must not be negative.")
+        if not any(scenario.weight for scenario in scenarios):
+            raise ValueError("At least one weight must be positive.")
+        names: Set[str] = set()
+        for scenario in scenarios:
+            if scenario.name in names:
+                raise ValueError(f"Duplicate scenario name: {scenario.name!r}")
+            names.add(scenario.name)
+        self.scenarios = list(scenarios)
+        self.weights = [scenario.weight for scenario in scenarios]
+        self.random = Random(seed)  # noqa: S311
+
+    def choose(self) -> Scenario:
+        """Choose a scenario according to the weights."""
+        if len(self.scenarios) == 1:
+            return self.scenarios[0]
+        return self.random.choices(self.scenarios, self.weights)[0]
+
+    def think_time(self, scenario: Scenario) -> float:
+        """Get a random think time for the given scenario."""
+        low, high = scenario.think_time
+        return self.random.uniform(low, high) if high > low else low
+
+
+def _parse_think_time(value: str) -> Tuple[float, float]:
+    """Parse a think time given as seconds or a range of seconds."""
+    low, sep, high = value.partition("-")
+    think_time = (float(low), float(high)) if sep else (float(low),) * 2
+    if think_time[0] < 0 or think_time[1] < think_time[0]:
+        raise ValueError(f"invalid think time {value!r}")
+    return think_time
+
+
+def read_scenarios(filename: str) -> List[Scenario]:
+    """Read scenarios from the given file.
+
+    Every line of the file contains the weight of the scenario, the think
+    time after running the scenario in seconds, and the twill script for
+    the scenario. The think time can be given as a range like "1-3" for a
+    random think time between one and three seconds. Empty lines and lines
+    starting with "#" are ignored. Script paths are relative to the file.
+    An optional scenario name can be appended after the script path;
+    otherwise the name of the script without extension is used. The names
+    of the scenarios must be unique, since the statistics are reported
+    per scenario name.
+
+    For example::
+
+        # weight  think time  script
+        70        1-3         browse.twill
+        25        2           search.twill
+        5         0           checkout.twill  buy
+    """
+    directory = Path(filename).parent
+    scenarios = []
+    names: Set[str] = set()
+    with open(filename, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()  # noqa: PLW2901
+            if not line or line.startswith("#"):
+                continue
+            parts = line.split()
+            if len(parts) not in (3, 4):
+                raise ValueError(
+                    f"{filename}:{line_no}: expected weight, think time,"
+                    " script and optional name"
+                )
+            try:
+                weight = float(parts[0])
+                think_time = _parse_think_time(parts[1])
+            except ValueError as error:
+                raise ValueError(f"{filename}:{line_no}: {error}") from None
+            script = directory / parts[2]
+            name = parts[3] if len(parts) > 3 else script.stem  # noqa: PLR2004
+            if name in names:
+                raise ValueError(
+                    f"{filename}:{line_no}: duplicate scenario name {name!r}"
+                )
+            names.add(name)
+            scenarios.append(
+                Scenario(name, (str(script),), weight, think_time)
+            )
+    return scenarios
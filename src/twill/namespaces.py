@@ -1,6 +1,7 @@
 """Global and local dictionaries, and initialization/utility functions."""
 
-from typing import Any, Dict, Tuple
+from contextvars import ContextVar, Token
+from typing import Any, Dict, List, Tuple
 
 from . import errors
 
@@ -20,25 +21,42 @@ def init_global_dict() -> None:
     parse.command_list.extend(cmd_list)
 
 
-_local_dict_stack = []  # local dictionaries
+_local_dict_stack: List[Dict[str, Any]] = []  # local dictionaries
+
+# the global dictionary and the stack of local dictionaries
+# that are used by the script running in the current context
+_namespaces: ContextVar[Tuple[Dict[str, Any], List[Dict[str, Any]]]] = (
+    ContextVar("namespaces", default=(global_dict, _local_dict_stack))
+)
+
+
+def new_namespaces() -> Token[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Use new namespaces in the current context.
+
+    The new global dictionary starts as a copy of the current one,
+    and the stack of local dictionaries starts empty.
+    Returns a token that can be used to restore the previous namespaces.
+    """
+    return _namespaces.set((_namespaces.get()[0].copy(), []))
 
 
 def new_local_dict() -> Dict[str, Any]:
     """Initialize a new local dictionary and push it onto the stack."""
     local_dict: Dict[str, Any] = {}
-    _local_dict_stack.append(local_dict)
+    _namespaces.get()[1].append(local_dict)
     return local_dict
 
 
 def pop_local_dict() -> Dict[str, Any]:
     """Get rid of the current local dictionary."""
-    return _local_dict_stack.pop()
+    return _namespaces.get()[1].pop()
 
 
 def get_twill_glocals() -> Tuple[Dict[str, Any], Dict[str, Any]]:
     """Return both global and current local dictionary."""
+    global_dict, local_dict_stack = _namespaces.get()
     if global_dict is None:
         raise errors.TwillException("Must initialize global namespace first!")
-    if not _local_dict_stack:
+    if not local_dict_stack:
         new_local_dict()
-    return global_dict, _local_dict_stack[-1]
+    return global_dict, local_dict_stack[-1]
@@ -1,10 +1,32 @@
 """Code parsing and evaluation for the twill mini-language."""
 
+import asyncio
+import hashlib
+import marshal
+import os
 import re
 import sys
-from contextlib import nullcontext
+from collections import OrderedDict
+from contextlib import suppress
+from contextvars import ContextVar
+from inspect import isawaitable, iscoroutine
 from io import StringIO
-from typing import Any, Callable, Dict, List, Optional, Sequence, TextIO, Tuple
+from pathlib import Path
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TextIO,
+    Tuple,
+    cast,
+)
 
 from pyparsing import (
     CharsNotIn,
@@ -13,7 +35,6 @@ from pyparsing import (
     Literal,
     Opt,
     ParseException,
-    ParseResults,
     Word,
     ZeroOrMore,
     pyparsing_unicode,
@@ -21,9 +42,11 @@ from pyparsing import (
     rest_of_line,
 )
 
-from . import commands, log, namespaces
-from .browser import browser
-from .errors import TwillNameError
+from . import __version__, async_commands, commands, log, namespaces
+from .browser import AsyncTwillBrowser, browser, get_browser, sync_command
+from .errors import TwillException, TwillNameError
+from .stats import get_timers
+from .utils import ContextList
 
 # pyparsing stuff
 
@@ -86,7 +109,9 @@ full_command = comment | (command + arguments + Opt(comment))
 full_command.set_name("full_command")
 
 
-command_list: List[str] = []  # filled in by namespaces.init_global_dict().
+# the list of all commands (or the one used in the current context),
+# filled in by namespaces.init_global_dict()
+command_list = ContextList(ContextVar("command_list", default=[]))  # noqa: B039
 
 
 def process_args(
@@ -159,7 +184,13 @@ def execute_command(
     code_obj = compile(eval_str, cmd_info, "eval")
 
     # evaluate the code object in the appropriate dictionary
-    result = eval(code_obj, globals_dict, locals_dict)
+    with sync_command(cmd):
+        result = eval(code_obj, globals_dict, locals_dict)
+    if iscoroutine(result):
+        result.close()
+        raise TwillException(
+            f"The command '{cmd}' can only be used in asynchronous scripts."
+        )
 
     # set __url__
     locals_dict["__url__"] = browser.url
@@ -167,9 +198,224 @@ def execute_command(
     return result
 
 
+async def execute_command_async(
+    cmd: str,
+    args: Sequence[str],
+    globals_dict: Dict[str, Any],
+    locals_dict: Dict[str, Any],
+    cmd_info: str,
+) -> None:
+    """Actually execute the command asynchronously.
+
+    Commands that send requests or sleep are replaced with their
+    asynchronous versions, and commands returning awaitables are awaited.
+    Other commands cannot use the coroutine methods of the asynchronous
+    browser, since they would never await them; if they try to do so
+    through the global browser, a TwillException is raised.
+
+    The side effects are the same as for execute_command().
+    """
+    locals_dict["__cmd__"] = cmd
+    locals_dict["__args__"] = args
+    if cmd not in command_list:
+        raise TwillNameError(f"unknown twill command: '{cmd}'")
+
+    if cmd in async_commands.__all__ and globals_dict.get(cmd) is getattr(
+        commands, cmd, None
+    ):
+        result = await getattr(async_commands, cmd)(*args)
+    else:
+        code_obj = compile(f"{cmd}(*__args__)", cmd_info, "eval")
+        with sync_command(cmd):
+            result = eval(code_obj, globals_dict, locals_dict)
+        if isawaitable(result):
+            result = await result
+
+    locals_dict["__url__"] = browser.url
+
+    return result
+
+
 _log_commands: Callable = log.debug  # type: ignore[has-type]
 
 
+class CompiledLine(NamedTuple):
+    """A line of a twill script compiled for repeated execution."""
+
+    line_no: int  # the number of the line in the script
+    line: str  # the stripped line
+    command: Optional[str]  # the command, None for comments and errors
+    arguments: Tuple[str, ...]  # the arguments as they have been parsed
+    static: Optional[Tuple[str, ...]]  # the processed arguments if constant
+    error: Optional[str] = None  # the parse error, if any
+
+
+def _is_constant(arg: str) -> bool:
+    """Check whether the argument does not need any variable substitution."""
+    return not (
+        arg.startswith(("__", "$")) or _re_variable.search(arg) is not None
+    )
+
+
+def compile_line(line_no: int, line: str) -> CompiledLine:
+    """Parse a line of a twill script into its compiled form.
+
+    Arguments without variables are processed right away, so that they
+    can be used as they are every time the line is executed.
+    """
+    try:
+        results = full_command.parse_string(line)
+    except ParseException as error:
+        return CompiledLine(line_no, line, None, (), None, str(error))
+    if not results:  # e.g. a comment
+        return CompiledLine(line_no, line, None, (), None)
+    arguments = tuple(results.arguments.as_list())
+    static = (
+        tuple(arg.replace("\\n", "\n") for arg in arguments)
+        if all(_is_constant(arg) for arg in arguments)
+        else None
+    )
+    return CompiledLine(line_no, line, results.command, arguments, static)
+
+
+def compile_script(inp: TextIO) -> Tuple[CompiledLine, ...]:
+    """Compile all non-empty lines of a twill script."""
+    return tuple(compile_line(*line) for line in _script_lines(inp))
+
+
+CACHE_SUFFIX = ".twillc"  # the extension of the parse cache files
+
+MAX_COMPILED_FILES = 256  # the number of compiled scripts kept in memory
+
+_CACHE_MAGIC = f"twill {__version__}"  # invalidates caches of other versions
+
+# a compiled script with the modification time and size of its file
+_CompiledFile = Tuple[Tuple[int, int], Tuple[CompiledLine, ...]]
+
+# the compiled scripts, where the least recently used ones are evicted first
+_compiled_files: "OrderedDict[str, _CompiledFile]" = OrderedDict()
+
+
+def get_cache_dir() -> Optional[Path]:
+    """Get the directory for the parse cache files.
+
+    This is the directory twill in the user cache directory given by the
+    environment variable XDG_CACHE_HOME, or ~/.cache if it is not set.
+    Returns None if the home directory cannot be determined.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME")
+    if not cache_home:
+        try:
+            cache_home = str(Path.home() / ".cache")
+        except RuntimeError:
+            return None
+    return Path(cache_home) / "twill"
+
+
+def compile_file(filename: str) -> Tuple[CompiledLine, ...]:
+    """Compile a twill script file, using the parse cache if possible.
+
+    The compiled script is cached in memory and in a file in the user cache
+    directory (see get_cache_dir), which is not written if Python has been
+    told not to write bytecode. Like with .pyc files, the cached script is
+    used as long as the modification time and the size of the script file
+    are the same. If the cache file cannot be read or written, the script
+    is simply compiled again.
+    """
+    path = Path(filename).absolute()
+    stat = path.stat()
+    key = (stat.st_mtime_ns, stat.st_size)
+    name = str(path)
+    compiled_files = _compiled_files
+    cached = compiled_files.get(name)
+    if cached and cached[0] == key:
+        compiled_files.move_to_end(name)
+        return cached[1]
+    cache_file = _cache_file(path)
+    lines = _read_cache_file(cache_file, name, key) if cache_file else None
+    if lines is None:
+        with path.open(encoding="utf-8") as inp:
+            lines = compile_script(inp)
+        if cache_file and not sys.dont_write_bytecode:
+            _write_cache_file(cache_file, name, key, lines)
+    compiled_files[name] = key, lines
+    compiled_files.move_to_end(name)
+    while len(compiled_files) > MAX_COMPILED_FILES:
+        compiled_files.popitem(last=False)
+    return lines
+
+
+def _cache_file(path: Path) -> Optional[Path]:
+    """Get the parse cache file for the script with the given path."""
+    cache_dir = get_cache_dir()
+    if not cache_dir:
+        return None
+    digest = hashlib.sha256(str(path).encode()).hexdigest()
+    return cache_dir / f"{path.name}-{digest[:16]}{CACHE_SUFFIX}"
+
+
+def _read_cache_file(
+    cache_file: Path, name: str, key: Tuple[int, int]
+) -> Optional[Tuple[CompiledLine, ...]]:
+    """Read a compiled script from the cache file if it is up to date."""
+    try:
+        with cache_file.open("rb") as f:
+            magic, path, mtime, size, lines = marshal.load(f)  # noqa: S302
+        if magic != _CACHE_MAGIC or path != name or (mtime, size) != key:
+            return None
+        return tuple(CompiledLine(*line) for line in lines)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def _write_cache_file(
+    cache_file: Path,
+    name: str,
+    key: Tuple[int, int],
+    lines: Tuple[CompiledLine, ...],
+) -> None:
+    """Write a compiled script to the cache file."""
+    data = marshal.dumps(
+        (_CACHE_MAGIC, name, *key, [tuple(line) for line in lines])
+    )
+    # write to a temporary file first, since processes may run concurrently
+    temp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}")
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file.write_bytes(data)
+        temp_file.replace(cache_file)
+    except OSError as error:
+        log.debug("Cannot write parse cache file %s: %s", cache_file, error)
+        with suppress(OSError):
+            temp_file.unlink()
+
+
+def clear_compiled_files() -> None:
+    """Clear the in-memory cache of compiled script files."""
+    _compiled_files.clear()
+
+
+def _command_and_args(
+    compiled: CompiledLine,
+    globals_dict: Dict[str, Any],
+    locals_dict: Dict[str, Any],
+) -> Tuple[Optional[str], Optional[List[str]]]:
+    """Get the command and the processed arguments of a compiled line."""
+    if compiled.error:
+        log.error("PARSE ERROR: %s", compiled.error)
+    command = compiled.command
+    if not command:
+        return None, None
+    _log_commands("twill: executing cmd '%s'", compiled.line)
+    static = compiled.static
+    args = (
+        list(static)
+        if static is not None
+        else process_args(compiled.arguments, globals_dict, locals_dict)
+    )
+    return command, args
+
+
 def parse_command(
     line: str,
     globals_dict: Dict[str, Any],
@@ -179,18 +425,9 @@ def parse_command(
 
     Returns a tuple with the command and its arguments.
     """
-    try:
-        results: Optional[ParseResults] = full_command.parse_string(line)
-    except ParseException as e:
-        log.error("PARSE ERROR: %s", e)
-        results = None
-    if results:
-        _log_commands("twill: executing cmd '%s'", line.strip())
-        args = process_args(
-            results.arguments.as_list(), globals_dict, locals_dict
-        )
-        return results.command, args
-    return None, None  # e.g. a comment
+    return _command_and_args(
+        compile_line(0, line.strip()), globals_dict, locals_dict
+    )
 
 
 def execute_string(buf: str, **kw: Any) -> None:
@@ -201,33 +438,73 @@ def execute_string(buf: str, **kw: Any) -> None:
     if "no_reset" not in kw:
         kw["no_reset"] = True
 
-    _execute_script(fp, **kw)
+    _execute_script(compile_script(fp), **kw)
 
 
 def execute_file(filename: str, **kw: Any) -> None:
-    """Execute commands from a file."""
-    with (
-        nullcontext(sys.stdin)
-        if filename == "-"
-        else open(filename, encoding="utf-8")
-    ) as inp:
-        log.info("\n>> Running twill file %s", filename)
+    """Execute commands from a file.
+
+    The compiled script is cached, so that executing it again is faster.
+
+    Unless no_reset is set, the browser is reset before running the script.
+    If keep_connections is set, the browser keeps its settings and its open
+    connections like with its soft_reset() method; otherwise it is reset
+    completely.
+    """
+    lines = _compile_input(filename)
+    log.info("\n>> Running twill file %s", filename)
+
+    kw["source"] = filename
+    _execute_script(lines, **kw)
+
 
-        kw["source"] = filename
-        _execute_script(inp, **kw)
+def _compile_input(filename: str) -> Iterable[CompiledLine]:
+    """Compile a script file, or the standard input if the name is "-".
 
+    The standard input is not cached, and its lines are compiled one by
+    one while they are read, so that every line is executed right away.
+    """
+    if filename == "-":
+        return (compile_line(*line) for line in _script_lines(sys.stdin))
+    return compile_file(filename)
+
+
+def _script_lines(inp: TextIO) -> Iterator[Tuple[int, str]]:
+    """Get the numbers and contents of all non-empty lines of a script."""
+    for line_no, line_raw in enumerate(inp, 1):
+        line = line_raw.strip()
+        if line:  # skip empty lines
+            yield line_no, line
 
-def _execute_script(inp: TextIO, **kw: Any) -> None:
-    """Execute lines taken from a file-like iterator."""
+
+def _log_error(
+    error: Exception, line_no: int, line: str, source_info: str
+) -> None:
+    """Log an error that happened while executing a line of a script."""
+    error_type = error.__class__.__name__ or "Error"
+    error_context = f"{error_type} raised on line {line_no} of '{source_info}'"
+    if line:
+        error_context += f" while executing\n>> {line}"
+    if not browser.first_error:
+        browser.first_error = error_context
+    log.error("\nOops! %s", error_context)
+    error_msg = str(error).strip()
+    log.error("\nError: %s", error_msg)
+
+
+def _execute_script(lines: Iterable[CompiledLine], **kw: Any) -> None:
+    """Execute the compiled lines of a script."""
     # initialize new local dictionary and get global and current local
     namespaces.new_local_dict()
     globals_dict, locals_dict = namespaces.get_twill_glocals()
 
     locals_dict["__url__"] = browser.url
 
-    # reset browser
+    # reset browser, optionally keeping its connections open
     if not kw.get("no_reset"):
-        commands.reset_browser()
+        commands.reset_browser(
+            keep_connections=bool(kw.get("keep_connections"))
+        )
 
     # go to a specific URL?
     init_url = kw.get("initial_url")
@@ -242,15 +519,12 @@ def _execute_script(inp: TextIO, **kw: Any) -> None:
     source_info = kw.get("source", "<input>")
 
     try:
-        for line_no, line_raw in enumerate(inp, 1):
-            line = line_raw.strip()
-            if not line:  # skip empty lines
-                continue
-
+        for compiled in lines:
+            line_no, line = compiled.line_no, compiled.line
             cmd_info = f"{source_info}:{line_no}"
             log.info("AT LINE: %s", cmd_info)
 
-            cmd, args = parse_command(line, globals_dict, locals_dict)
+            cmd, args = _command_and_args(compiled, globals_dict, locals_dict)
             if cmd is None:
                 continue
 
@@ -260,17 +534,7 @@ def _execute_script(inp: TextIO, **kw: Any) -> None:
                 # abort script execution if a SystemExit is raised
                 return
             except Exception as error:
-                error_type = error.__class__.__name__ or "Error"
-                error_context = (
-                    f"{error_type} raised on line {line_no} of '{source_info}'"
-                )
-                if line:
-                    error_context += f" while executing\n>> {line}"
-                if not browser.first_error:
-                    browser.first_error = error_context
-                log.error("\nOops! %s", error_context)
-                error_msg = str(error).strip()
-                log.error("\nError: %s", error_msg)
+                _log_error(error, line_no, line, source_info)
                 if not catch_errors:
                     raise
 
@@ -281,10 +545,9 @@ def _execute_script(inp: TextIO, **kw: Any) -> None:
             for filename in reversed(cleanups):
                 log.info("\n>> Running twill cleanup file %s", filename)
                 try:
-                    with open(filename, encoding="utf-8") as cleanup:
-                        _execute_script(
-                            cleanup, source=filename, no_reset=True
-                        )
+                    _execute_script(
+                        compile_file(filename), source=filename, no_reset=True
+                    )
                 except Exception as error:  # noqa: BLE001
                     log.error(
                         ">> Cannot run cleanup file %s: %s", filename, error
@@ -294,6 +557,151 @@ def _execute_script(inp: TextIO, **kw: Any) -> None:
         namespaces.pop_local_dict()
 
 
+async def execute_string_async(
+    buf: str, browser: Optional[AsyncTwillBrowser] = None, **kw: Any
+) -> None:
+    """Execute commands from a string buffer asynchronously.
+
+    The commands are executed like with execute_file_async().
+    """
+    fp = StringIO(buf)
+
+    kw["source"] = ["<string buffer>"]
+    if "no_reset" not in kw:
+        kw["no_reset"] = True
+
+    await _in_own_context(
+        browser, _execute_script_async, compile_script(fp), **kw
+    )
+
+
+async def execute_file_async(
+    filename: str, browser: Optional[AsyncTwillBrowser] = None, **kw: Any
+) -> None:
+    """Execute commands from a file asynchronously.
+
+    The script is executed in its own task, with its own namespaces and
+    its own asynchronous browser, unless you pass a browser explicitly.
+    Whenever the script waits for a response, other scripts can run,
+    so many scripts can be executed concurrently in the same event loop.
+    """
+    await _in_own_context(browser, _execute_file_async, filename, **kw)
+
+
+async def _in_own_context(
+    browser: Optional[AsyncTwillBrowser],
+    execute: Callable[..., Awaitable[None]],
+    *args: Any,
+    **kw: Any,
+) -> None:
+    """Run an asynchronous script execution in its own context.
+
+    The times measured by transaction timers in the script are added
+    to the timers of the current context.
+    """
+    from .context import new_context  # noqa: PLC0415
+
+    timers = get_timers()
+
+    async def execute_in_task() -> None:
+        # changes of context variables only affect the current task
+        own_browser = browser or AsyncTwillBrowser()
+        try:
+            with new_context(own_browser):
+                try:
+                    await execute(*args, **kw)
+                finally:
+                    own_timers = get_timers()
+                    own_timers.started.clear()
+                    timers.merge(own_timers)
+        finally:
+            if own_browser is not browser:
+                await own_browser.close()
+
+    await asyncio.ensure_future(execute_in_task())
+
+
+async def _execute_file_async(filename: str, **kw: Any) -> None:
+    """Execute commands from a file asynchronously in the current context."""
+    lines = _compile_input(filename)
+    log.info("\n>> Running twill file %s", filename)
+
+    kw["source"] = filename
+    await _execute_script_async(lines, **kw)
+
+
+async def _execute_script_async(
+    lines: Iterable[CompiledLine], **kw: Any
+) -> None:
+    """Execute the compiled lines of a script asynchronously."""
+    # initialize new local dictionary and get global and current local
+    namespaces.new_local_dict()
+    globals_dict, locals_dict = namespaces.get_twill_glocals()
+
+    locals_dict["__url__"] = browser.url
+
+    # reset browser, optionally keeping its connections open
+    if not kw.get("no_reset"):
+        await async_commands.reset_browser(
+            keep_connections=bool(kw.get("keep_connections"))
+        )
+
+    # go to a specific URL?
+    init_url = kw.get("initial_url")
+    if init_url:
+        await async_commands.go(init_url)
+        locals_dict["__url__"] = browser.url
+
+    # should we catch exceptions on failure?
+    catch_errors = kw.get("never_fail")
+
+    # source_info stuff
+    source_info = kw.get("source", "<input>")
+
+    try:
+        for compiled in lines:
+            line_no, line = compiled.line_no, compiled.line
+            cmd_info = f"{source_info}:{line_no}"
+            log.info("AT LINE: %s", cmd_info)
+
+            cmd, args = _command_and_args(compiled, globals_dict, locals_dict)
+            if cmd is None:
+                continue
+
+            try:
+                await execute_command_async(
+                    cmd, args, globals_dict, locals_dict, cmd_info
+                )
+            except SystemExit:
+                # abort script execution if a SystemExit is raised
+                return
+            except Exception as error:
+                _log_error(error, line_no, line, source_info)
+                if not catch_errors:
+                    raise
+
+    finally:
+        cleanups = locals_dict.get("__cleanups__")
+        if cleanups:
+            current_browser = cast("AsyncTwillBrowser", get_browser())
+            first_error = current_browser.first_error
+            result = current_browser.result
+            for filename in reversed(cleanups):
+                log.info("\n>> Running twill cleanup file %s", filename)
+                try:
+                    await _execute_script_async(
+                        compile_file(filename), source=filename, no_reset=True
+                    )
+                except Exception as error:  # noqa: BLE001
+                    log.error(
+                        ">> Cannot run cleanup file %s: %s", filename, error
+                    )
+            await current_browser.reset()
+            current_browser.first_error = first_error
+            current_browser.result = result
+        namespaces.pop_local_dict()
+
+
 def log_commands(flag: bool) -> bool:  # noqa: FBT001
     """Turn printing of commands as they are executed on or off."""
     global _log_commands
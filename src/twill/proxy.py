@@ -0,0 +1,149 @@
+"""Proxies configured in the environment for the twill browser.
+
+The httpx client only uses the proxies given in the environment variables
+HTTP_PROXY, HTTPS_PROXY, ALL_PROXY and NO_PROXY when it creates its own
+transport. Since the twill browser wraps its transport for the HTTP cache,
+cassettes and stubs, it uses the transports defined here, which send the
+requests through the configured proxies unless their hosts are excluded.
+"""
+
+from typing import Dict, Optional, Union
+from urllib.request import getproxies, proxy_bypass
+
+from httpx import (
+    URL,
+    AsyncBaseTransport,
+    AsyncHTTPTransport,
+    BaseTransport,
+    HTTPTransport,
+    Request,
+    Response,
+)
+
+__all__ = [
+    "AsyncProxyTransport",
+    "ProxyTransport",
+    "async_http_transport",
+    "environment_proxies",
+    "http_transport",
+]
+
+
+def environment_proxies() -> Dict[str, str]:
+    """Get the proxy URLs for the URL schemes set in the environment."""
+    proxies = getproxies()
+    scheme_proxies = {}
+    for scheme in ("http", "https"):
+        proxy = proxies.get(scheme) or proxies.get("all")
+        if proxy:
+            if "://" not in proxy:
+                proxy = f"http://{proxy}"
+            scheme_proxies[scheme] = proxy
+    return scheme_proxies
+
+
+def _proxy_for(url: URL, proxies: Dict[str, str]) -> Optional[str]:
+    """Get the scheme whose proxy shall be used for the URL, if any."""
+    scheme = url.scheme
+    if scheme not in proxies or proxy_bypass(url.host):
+        return None
+    return scheme
+
+
+class ProxyTransport(BaseTransport):
+    """A transport sending requests through proxies where configured."""
+
+    def __init__(
+        self,
+        transport: BaseTransport,
+        proxies: Dict[str, str],
+        proxy_transports: Dict[str, BaseTransport],
+    ) -> None:
+        """Use the proxy transports per scheme or the direct transport."""
+        self.transport = transport
+        self.proxies = proxies
+        self.proxy_transports = proxy_transports
+
+    def handle_request(self, request: Request) -> Response:
+        """Handle the request directly or through a proxy."""
+        scheme = _proxy_for(request.url, self.proxies)
+        transport = (
+            self.transport if scheme is None else self.proxy_transports[scheme]
+        )
+        return transport.handle_request(request)
+
+    def close(self) -> None:
+        """Close the direct and the proxy transports."""
+        self.transport.close()
+        for transport in self.proxy_transports.values():
+            transport.close()
+
+
+class AsyncProxyTransport(AsyncBaseTransport):
+    """An asynchronous transport sending requests through proxies."""
+
+    def __init__(
+        self,
+        transport: AsyncBaseTransport,
+        proxies: Dict[str, str],
+        proxy_transports: Dict[str, AsyncBaseTransport],
+    ) -> None:
+        """Use the proxy transports per scheme or the direct transport."""
+        self.transport = transport
+        self.proxies = proxies
+        self.proxy_transports = proxy_transports
+
+    async def handle_async_request(self, request: Request) -> Response:
+        """Handle the request directly or through a proxy."""
+        scheme = _proxy_for(request.url, self.proxies)
+        transport = (
+            self.transport if scheme is None else self.proxy_transports[scheme]
+        )
+        return await transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """Close the direct and the proxy transports."""
+        await self.transport.aclose()
+        for transport in self.proxy_transports.values():
+            await transport.aclose()
+
+
+def http_transport(
+    verify: Union[bool, str],  # noqa: FBT001
+    uds: Optional[str] = None,
+) -> BaseTransport:
+    """Create a pooled HTTP transport using the environment proxies.
+
+    Requests to a Unix domain socket are never sent through a proxy.
+    """
+    transport = HTTPTransport(verify=verify, uds=uds)
+    proxies = {} if uds else environment_proxies()
+    if not proxies:
+        return transport
+    return ProxyTransport(
+        transport,
+        proxies,
+        {
+            scheme: HTTPTransport(verify=verify, proxy=proxy)
+            for scheme, proxy in proxies.items()
+        },
+    )
+
+
+def async_http_transport(
+    verify: Union[bool, str],  # noqa: FBT001
+    uds: Optional[str] = None,
+) -> AsyncBaseTransport:
+    """Create a pooled asynchronous HTTP transport using the proxies."""
+    transport = AsyncHTTPTransport(verify=verify, uds=uds)
+    proxies = {} if uds else environment_proxies()
+    if not proxies:
+        return transport
+    return AsyncProxyTransport(
+        transport,
+        proxies,
+        {
+            scheme: AsyncHTTPTransport(verify=verify, proxy=proxy)
+            for scheme, proxy in proxies.items()
+        },
+    )
@@ -0,0 +1,375 @@
+"""Run a number of twill scripts, optionally in parallel processes.
+
+When more than one job is requested, the scripts are distributed over a
+pool of worker processes. Every worker process has its own twill browser,
+and it runs one script after the other, just like the twill shell does.
+
+The durations and failures of the scripts can be recorded in a history
+file, which is then used to run the longest scripts and the scripts that
+failed last time first, and to split the scripts into balanced shards.
+"""
+
+import json
+import os
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor
+from concurrent.futures import wait as wait_for_futures
+from io import StringIO
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from . import log, set_log_level, set_output
+from .browser import browser
+from .parse import execute_file
+from .stats import Timers, get_timers, set_timers
+
+__all__ = [
+    "RunHistory",
+    "ScriptResult",
+    "parse_shard",
+    "run_files",
+    "run_script",
+]
+
+
+class ScriptResult(NamedTuple):
+    """The result of running a twill script."""
+
+    filename: str
+    error: Optional[str] = None  # the error if the script failed
+    first_error: Optional[str] = None  # the first error in the script
+    traceback: Optional[str] = None  # the traceback of the error
+    dump: Optional[bytes] = None  # the page content when the error occurred
+    output: Optional[str] = None  # the output if it has been captured
+    duration: float = 0  # the execution time in seconds
+    timers: Optional[Timers] = None  # the transaction timers of the script
+
+    @property
+    def success(self) -> bool:
+        """Check whether the script ran successfully."""
+        return self.error is None
+
+
+class RunHistory:
+    """The durations and failures of the last runs of twill scripts.
+
+    The history is stored as a JSON file and is used for scheduling the
+    scripts and for splitting them into shards with similar run times.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        """Load the history from the given file if it exists.
+
+        If no path is given, the history is only kept in memory.
+        """
+        self.path = path
+        self.scripts: Dict[str, Dict[str, Any]] = {}
+        if not path:
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                scripts = json.load(f)["scripts"]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            log.warning("Ignoring invalid history file %s: %s", path, error)
+            return
+        if isinstance(scripts, dict):
+            self.scripts = scripts
+
+    def save(self) -> None:
+        """Save the history to its file."""
+        if not self.path:
+            return
+        try:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"scripts": self.scripts}, f, indent=1)
+        except OSError as error:
+            log.warning("Cannot save history file %s: %s", self.path, error)
+
+    def update(self, results: Iterable[ScriptResult]) -> None:
+        """Record the given results in the history."""
+        for result in results:
+            self.scripts[_script_key(result.filename)] = {
+                "duration": round(result.duration, 3),
+                "failed": not result.success,
+            }
+
+    def duration(self, filename: str) -> Optional[float]:
+        """Get the last duration of the given script if known."""
+        script = self.scripts.get(_script_key(filename))
+        return script.get("duration") if script else None
+
+    def failed(self, filename: str) -> bool:
+        """Check whether the given script failed in its last run."""
+        script = self.scripts.get(_script_key(filename))
+        return bool(script and script.get("failed"))
+
+    def durations(self, filenames: Sequence[str]) -> List[float]:
+        """Get the durations of the given scripts.
+
+        Scripts without a known duration are assumed to take as long as
+        the known scripts take on average.
+        """
+        durations = [self.duration(filename) for filename in filenames]
+        known = [duration for duration in durations if duration is not None]
+        average = sum(known) / len(known) if known else 1.0
+        return [average if d is None else d for d in durations]
+
+    def schedule(
+        self,
+        filenames: Sequence[str],
+        *,
+        failed_first: bool = False,
+        longest_first: bool = False,
+    ) -> List[str]:
+        """Get the order in which the given scripts should be run.
+
+        The scripts that failed last time can be put first, and the
+        scripts can be ordered by descending duration. Apart from that,
+        the given order is preserved.
+        """
+        durations = self.durations(filenames) if longest_first else None
+        order = sorted(
+            range(len(filenames)),
+            key=lambda i: (
+                failed_first and not self.failed(filenames[i]),
+                -durations[i] if durations else 0,
+            ),
+        )
+        return [filenames[i] for i in order]
+
+    def shard(
+        self, filenames: Sequence[str], index: int, count: int
+    ) -> List[str]:
+        """Get the scripts of the shard with the given index (from 1).
+
+        The scripts are split into count shards with similar total
+        durations, where the longest scripts are distributed first.
+        The split depends only on the file names and the history,
+        so it is the same on all nodes that use the same history.
+        Without known durations, the sorted file names are distributed
+        in turn. The order of the scripts is preserved within every shard.
+        """
+        if not 1 <= index <= count:
+            raise ValueError(f"invalid shard {index}/{count}")
+        durations = self.durations(filenames)
+        totals = [0.0] * count
+        shards: List[List[int]] = [[] for _ in range(count)]
+        for i in sorted(
+            range(len(filenames)),
+            key=lambda i: (-durations[i], filenames[i], i),
+        ):
+            shard = min(range(count), key=lambda n: (totals[n], n))
+            totals[shard] += durations[i]
+            shards[shard].append(i)
+        return [filenames[i] for i in sorted(shards[index - 1])]
+
+
+def _script_key(filename: str) -> str:
+    """Get the key for the given script in the history."""
+    return Path(filename).as_posix()
+
+
+def parse_shard(shard: str) -> Tuple[int, int]:
+    """Parse a shard specification of the form 'index/count'."""
+    try:
+        index, count = map(int, shard.split("/"))
+    except ValueError:
+        raise ValueError(f"invalid shard {shard!r}") from None
+    if not 1 <= index <= count:
+        raise ValueError(f"invalid shard {shard!r}")
+    return index, count
+
+
+def run_script(
+    filename: str,
+    initial_url: Optional[str] = None,
+    *,
+    never_fail: bool = False,
+    dump: bool = False,
+) -> ScriptResult:
+    """Run a twill script with the current browser and report the result.
+
+    If dump is set, the content of the current page is added to the result
+    when the script fails. The times measured by transaction timers in the
+    script are added to the result and to the timers of the current context.
+    """
+    timers = Timers()
+    token = set_timers(timers)
+    start = time.perf_counter()
+    try:
+        execute_file(filename, initial_url=initial_url, never_fail=never_fail)
+    except Exception as error:  # noqa: BLE001
+        duration = time.perf_counter() - start
+        first_error = browser.first_error
+        result = ScriptResult(
+            filename,
+            error=str(error),
+            first_error=str(first_error) if first_error else None,
+            traceback=traceback.format_exc(),
+            dump=browser.dump if dump and browser.result else None,
+            duration=duration,
+        )
+    else:
+        result = ScriptResult(filename, duration=time.perf_counter() - start)
+    finally:
+        token.var.reset(token)
+    if not timers:
+        return result
+    timers.started.clear()
+    get_timers().merge(timers)
+    return result._replace(timers=timers)
+
+
+def _init_worker(log_level: int, twill_args: List[str]) -> None:
+    """Initialize a worker process."""
+    from . import shell  # noqa: PLC0415
+
+    set_log_level(log_level)
+    shell.twill_args[:] = twill_args
+
+
+def _run_script_in_worker(
+    filename: str,
+    initial_url: Optional[str],
+    *,
+    never_fail: bool,
+    dump: bool,
+) -> ScriptResult:
+    """Run a twill script in a worker process and capture its output."""
+    with StringIO() as output:
+        set_output(output)
+        try:
+            result = run_script(
+                filename, initial_url, never_fail=never_fail, dump=dump
+            )
+        finally:
+            set_output()
+        return result._replace(output=output.getvalue())
+
+
+def run_files(
+    filenames: Sequence[str],
+    jobs: int = 1,
+    initial_url: Optional[str] = None,
+    *,
+    never_fail: bool = False,
+    fail_fast: bool = False,
+    dump: bool = False,
+    on_result: Optional[Callable[[ScriptResult], None]] = None,
+    history: Optional[RunHistory] = None,
+    failed_first: bool = False,
+    shard: Optional[Tuple[int, int]] = None,
+    balance_shards: bool = False,
+) -> List[ScriptResult]:
+    """Run the given twill scripts and return their results.
+
+    If jobs is greater than one, the scripts are run in a pool with that
+    many worker processes, and the output of each script is captured and
+    added to its result. If jobs is zero, the number of CPUs is used.
+    Otherwise, the scripts are run one after the other in this process,
+    using the current browser.
+
+    If fail_fast is set, no further scripts are started after the first
+    script failed. If on_result is set, it will be called with every result
+    as soon as the script has finished.
+
+    If a history is passed, the durations and failures are recorded in it.
+    When running in parallel, the scripts that took longest in the history
+    are started first. If failed_first is set, the scripts that failed in
+    the history are run first. If a shard is given as a tuple (index,
+    count), only the scripts in that shard (counting from one) are run.
+    By default, the sorted file names are split evenly, so that all nodes
+    get the same shards. If balance_shards is set, the shards are balanced
+    using the durations in the history instead; this requires that all
+    nodes use the same history, since the shards would differ otherwise.
+
+    The results are returned in the order in which the scripts have been
+    scheduled, without the scripts that did not run.
+    """
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    scheduler = history or RunHistory(None)
+    if shard:
+        sharding = scheduler if balance_shards else RunHistory(None)
+        filenames = sharding.shard(filenames, *shard)
+    jobs = min(jobs, len(filenames))
+    filenames = scheduler.schedule(
+        filenames, failed_first=failed_first, longest_first=jobs > 1
+    )
+
+    results: Dict[int, ScriptResult] = {}
+
+    if jobs <= 1:
+        for index, filename in enumerate(filenames):
+            result = run_script(
+                filename, initial_url, never_fail=never_fail, dump=dump
+            )
+            results[index] = result
+            if on_result:
+                on_result(result)
+            if fail_fast and not result.success:
+                break
+    else:
+        from . import shell  # noqa: PLC0415
+
+        with ProcessPoolExecutor(
+            jobs,
+            initializer=_init_worker,
+            initargs=(log.getEffectiveLevel(), shell.twill_args),
+        ) as executor:
+            indices: Dict[Future[ScriptResult], int] = {
+                executor.submit(
+                    _run_script_in_worker,
+                    filename,
+                    initial_url,
+                    never_fail=never_fail,
+                    dump=dump,
+                ): index
+                for index, filename in enumerate(filenames)
+            }
+            pending = set(indices)
+            while pending:
+                done, pending = wait_for_futures(
+                    pending, return_when=FIRST_COMPLETED
+                )
+                failed = False
+                for future in sorted(done, key=indices.__getitem__):
+                    if future.cancelled():
+                        continue
+                    index = indices[future]
+                    try:
+                        result = future.result()
+                    except Exception as error:  # noqa: BLE001
+                        # the worker died or the result cannot be unpickled
+                        result = ScriptResult(
+                            filenames[index],
+                            error=str(error) or error.__class__.__name__,
+                            traceback=traceback.format_exc(),
+                        )
+                    results[index] = result
+                    if on_result:
+                        on_result(result)
+                    if not result.success:
+                        failed = True
+                if fail_fast and failed:
+                    for future in pending:
+                        future.cancel()
+
+    script_results = [results[index] for index in sorted(results)]
+    if history is not None:
+        history.update(script_results)
+        history.save()
+    return script_results
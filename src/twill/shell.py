@@ -18,7 +18,6 @@ from . import (
     __url__,
     __version__,
     commands,
-    execute_file,
     log,
     log_levels,
     namespaces,
@@ -28,6 +27,13 @@ from . import (
     shutdown,
 )
 from .browser import browser
+from .runner import (
+    RunHistory,
+    ScriptResult,
+    parse_shard,
+    run_files,
+)
+from .stats import Timers
 from .utils import Singleton, gather_filenames
 
 readline: Any
@@ -343,6 +349,13 @@ def main(  # noqa: C901, PLR0912, PLR0915
     parser = ArgumentParser()
     add = parser.add_argument
 
+    add(
+        "--balance-shards",
+        action="store_true",
+        dest="balance_shards",
+        help="balance shards using the durations in the history file,"
+        " which must be shared by all nodes",
+    )
     add(
         "-d",
         "--dump-html",
@@ -357,6 +370,18 @@ def main(  # noqa: C901, PLR0912, PLR0915
         dest="fail",
         help="fail exit on first file to fail",
     )
+    add(
+        "--failed-first",
+        action="store_true",
+        dest="failed_first",
+        help="run the scripts that failed last time first",
+    )
+    add(
+        "--history",
+        action="store",
+        dest="history",
+        help="record durations and failures of scripts in this file",
+    )
     add(
         "-i",
         "--interactive",
@@ -364,6 +389,15 @@ def main(  # noqa: C901, PLR0912, PLR0915
         dest="interactive",
         help="drop into an interactive shell (after running files)",
     )
+    add(
+        "-j",
+        "--jobs",
+        action="store",
+        dest="jobs",
+        default=1,
+        type=int,
+        help="number of scripts to run in parallel (0 for number of CPUs)",
+    )
     add(
         "-l",
         "--loglevel",
@@ -392,6 +426,12 @@ def main(  # noqa: C901, PLR0912, PLR0915
         dest="quiet",
         help="do not show normal output",
     )
+    add(
+        "--shard",
+        action="store",
+        dest="shard",
+        help="run only the given shard i/N of the scripts",
+    )
     add(
         "-u",
         "--url",
@@ -454,6 +494,17 @@ def main(  # noqa: C901, PLR0912, PLR0915
     if show_browser and (not dump_file or dump_file == "-"):
         sys.exit("Please also specify a dump file with -d")
 
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError:
+            sys.exit("Please specify the shard as i/N with 1 <= i <= N")
+    if args.balance_shards and not (shard and args.history):
+        sys.exit(
+            "Please also specify --shard and --history with --balance-shards"
+        )
+
     if log_level:
         log_level = log_level.lstrip("=").lstrip() or None
         if log_level and log_level.upper() not in log_levels:
@@ -482,26 +533,43 @@ def main(  # noqa: C901, PLR0912, PLR0915
 
         filenames = gather_filenames(scripts)
         dump = None
-
-        for filename in filenames:
-            try:
-                interactive = False
-                execute_file(
-                    filename,
-                    initial_url=args.url,
-                    never_fail=args.never_fail,
-                )
-                success.append(filename)
-            except Exception as error:
-                if dump_file:
-                    dump = browser.dump
-                if args.fail:
-                    raise
-                if browser.first_error:
-                    log.error("\nFirst error: %s", browser.first_error)
-                log.error("\n*** ERROR: %s", error)
-                log.debug(traceback.format_exc())
-                failure.append(filename)
+        timers = Timers()
+
+        def report(result: ScriptResult) -> None:
+            """Report the result of a script that has been run."""
+            nonlocal dump
+            if result.output:
+                sys.stdout.write(result.output)
+            if result.timers:
+                timers.merge(result.timers)
+            if result.success:
+                success.append(result.filename)
+                return
+            if result.dump is not None:
+                dump = result.dump
+            if result.first_error:
+                log.error("\nFirst error: %s", result.first_error)
+            log.error("\n*** ERROR: %s", result.error)
+            if result.traceback:
+                log.debug(result.traceback)
+            failure.append(result.filename)
+
+        interactive = False
+        run_files(
+            filenames,
+            args.jobs,
+            initial_url=args.url,
+            never_fail=args.never_fail,
+            fail_fast=args.fail,
+            dump=bool(dump_file),
+            on_result=report,
+            history=RunHistory(args.history) if args.history else None,
+            failed_first=args.failed_first,
+            shard=shard,
+            balance_shards=args.balance_shards,
+        )
+        if args.fail and failure:
+            log.error("Stopped after the first failure.")
 
         log.info("--")
         if dump:
@@ -526,6 +594,10 @@ def main(  # noqa: C901, PLR0912, PLR0915
         if failure:
             log.error("Failed:\n\t%s", "\n\t".join(failure))
             failed = True
+        if timers:
+            log.info(
+                "Transaction timers:\n\t%s", "\n\t".join(timers.summary())
+            )
 
         if dump and show_browser:
             import webbrowser  # noqa: PLC0415
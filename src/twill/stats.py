@@ -0,0 +1,366 @@
+"""Statistics for measuring the performance of twill scripts.
+
+The histogram in this module records durations in logarithmic buckets
+that are divided linearly into sub-buckets, like an HDR histogram.
+The relative error of the reported percentiles is below one percent,
+and the memory used does not grow with the number of recorded values.
+Histograms can be merged, so that the values recorded in different
+processes can be combined.
+
+The timers in this module record the durations of named transactions
+in twill scripts, such as logging in or checking out, in histograms.
+The timers are stored in a context variable, like the twill browser.
+
+The request timers in this module break down the time of every single
+request into the phases reported by the httpcore trace extension.
+"""
+
+from contextlib import suppress
+from contextvars import ContextVar, Token
+from time import perf_counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from httpx import Request, Response, ResponseNotRead
+
+from .cache import cache_status
+from .errors import TwillException
+
+__all__ = [
+    "Histogram",
+    "RequestTimer",
+    "RequestTiming",
+    "Timers",
+    "get_timers",
+    "set_timers",
+]
+
+SUB_BUCKET_BITS = 8  # number of bits used for the sub-buckets
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS  # number of values with full precision
+HALF_SUB_BUCKETS = SUB_BUCKETS >> 1  # number of sub-buckets per bucket
+
+UNIT = 1e-6  # the values are recorded in microseconds
+
+
+def _bucket_index(value: int) -> int:
+    """Get the index of the bucket for the given value."""
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return (
+        SUB_BUCKETS
+        + (shift - 1) * HALF_SUB_BUCKETS
+        + ((value >> shift) - HALF_SUB_BUCKETS)
+    )
+
+
+def _bucket_value(index: int) -> int:
+    """Get the highest value that is recorded in the given bucket."""
+    if index < SUB_BUCKETS:
+        return index
+    shift, sub_index = divmod(index - SUB_BUCKETS, HALF_SUB_BUCKETS)
+    shift += 1
+    return ((sub_index + HALF_SUB_BUCKETS + 1) << shift) - 1
+
+
+class Histogram:
+    """A histogram of durations that can be merged with other histograms.
+
+    The durations are recorded in seconds, with a resolution of one
+    microsecond and a relative precision of better than one percent.
+    """
+
+    __slots__ = ("count", "counts", "max", "min", "total")
+
+    def __init__(self, values: Optional[Iterable[float]] = None) -> None:
+        """Create an empty histogram, or one with the given values."""
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+        if values:
+            for value in values:
+                self.record(value)
+
+    def record(self, seconds: float) -> None:
+        """Record the given duration in seconds."""
+        value = max(0, round(seconds / UNIT))
+        index = _bucket_index(value)
+        counts = self.counts
+        counts[index] = counts.get(index, 0) + 1
+        if self.count:
+            if value < self.min:
+                self.min = value
+            elif value > self.max:
+                self.max = value
+        else:
+            self.min = self.max = value
+        self.count += 1
+        self.total += value
+
+    def merge(self, other: "Histogram") -> None:
+        """Add all values that have been recorded in another histogram."""
+        if not other.count:
+            return
+        counts = self.counts
+        for index, count in other.counts.items():
+            counts[index] = counts.get(index, 0) + count
+        if self.count:
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        else:
+            self.min, self.max = other.min, other.max
+        self.count += other.count
+        self.total += other.total
+
+    def __len__(self) -> int:
+        """Get the number of recorded values."""
+        return self.count
+
+    @property
+    def mean(self) -> float:
+        """Get the mean of the recorded durations in seconds."""
+        return self.total / self.count * UNIT if self.count else 0.0
+
+    @property
+    def minimum(self) -> float:
+        """Get the smallest recorded duration in seconds."""
+        return self.min * UNIT
+
+    @property
+    def maximum(self) -> float:
+        """Get the largest recorded duration in seconds."""
+        return self.max * UNIT
+
+    def percentile(self, percentile: float) -> float:
+        """Get the duration in seconds at the given percentile.
+
+        This is the smallest duration such that the given percentage of
+        all recorded durations is less than or equal to it.
+        """
+        if not self.count:
+            return 0.0
+        if percentile >= 100:  # noqa: PLR2004
+            return self.maximum
+        wanted = max(1, -(-self.count * percentile // 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= wanted:
+                value = min(max(_bucket_value(index), self.min), self.max)
+                return value * UNIT
+        return self.maximum  # pragma: no cover
+
+    def summary(self, percentiles: Iterable[float] = (50, 90, 99)) -> str:
+        """Summarize the recorded durations in milliseconds."""
+        parts = [f"mean {self.mean * 1000:.2f}"]
+        parts.extend(
+            f"p{percentile:g} {self.percentile(percentile) * 1000:.2f}"
+            for percentile in percentiles
+        )
+        parts.append(f"max {self.maximum * 1000:.2f}")
+        return ", ".join(parts) + " ms"
+
+
+class Timers:
+    """Timers measuring the durations of named transactions.
+
+    The durations of all transactions with the same name are aggregated
+    in a histogram, so that timers can be started and stopped many times.
+    """
+
+    __slots__ = ("histograms", "started")
+
+    def __init__(self) -> None:
+        """Create timers without any recorded durations."""
+        self.histograms: Dict[str, Histogram] = {}
+        self.started: Dict[str, float] = {}
+
+    def start(self, name: str) -> None:
+        """Start the timer with the given name."""
+        self.started[name] = perf_counter()
+
+    def stop(self, name: str) -> float:
+        """Stop the timer with the given name and record its duration.
+
+        Returns the duration in seconds.
+        """
+        end = perf_counter()
+        try:
+            start = self.started.pop(name)
+        except KeyError:
+            raise TwillException(
+                f"Timer '{name}' has not been started."
+            ) from None
+        seconds = end - start
+        self.record(name, seconds)
+        return seconds
+
+    def record(self, name: str, seconds: float) -> None:
+        """Record a duration in seconds for the given name."""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.record(seconds)
+
+    def merge(self, other: "Timers") -> None:
+        """Add all durations that have been recorded in other timers."""
+        histograms = self.histograms
+        for name, other_histogram in other.histograms.items():
+            histogram = histograms.get(name)
+            if histogram is None:
+                histogram = histograms[name] = Histogram()
+            histogram.merge(other_histogram)
+
+    def clear(self) -> None:
+        """Remove all recorded durations and stop all running timers."""
+        self.histograms.clear()
+        self.started.clear()
+
+    def __len__(self) -> int:
+        """Get the number of timers with recorded durations."""
+        return len(self.histograms)
+
+    def summary(self) -> List[str]:
+        """Summarize the recorded durations with one line per timer."""
+        return [
+            f"{name}: {len(histogram)} measured, {histogram.summary()}"
+            for name, histogram in sorted(self.histograms.items())
+        ]
+
+
+_current_timers: ContextVar[Timers] = ContextVar(
+    "timers",
+    default=Timers(),  # noqa: B039
+)
+
+
+def get_timers() -> Timers:
+    """Get the timers used in the current context."""
+    return _current_timers.get()
+
+
+def set_timers(timers: Timers) -> Token:
+    """Set the timers used in the current context.
+
+    Returns a token that can be used to restore the previous timers.
+    """
+    return _current_timers.set(timers)
+
+
+class RequestTiming(NamedTuple):
+    """The timing of a single request.
+
+    All times are given in seconds. The time to first byte is measured
+    from the start of the request until the response headers have been
+    received, so it includes the time for connecting and the TLS handshake
+    if a new connection had to be opened. The byte counts are the sizes
+    of the request body and the response body as sent over the wire.
+    """
+
+    method: str  # the request method
+    url: str  # the requested URL
+    status: int  # the status code of the response
+    connect: float  # the time for opening the connection
+    tls: float  # the time for the TLS handshake
+    ttfb: float  # the time to first byte
+    download: float  # the time for downloading the response body
+    total: float  # the total time of the request
+    request_bytes: int  # the number of bytes sent in the body
+    response_bytes: int  # the number of bytes received in the body
+    cache: Optional[str] = None  # 'hit' or 'revalidated' if cached
+
+    def __str__(self) -> str:
+        """Summarize the timing of the request."""
+        return (
+            f"{self.method} {self.url} ({self.status}):"
+            f" connect {self.connect * 1000:.2f},"
+            f" tls {self.tls * 1000:.2f},"
+            f" ttfb {self.ttfb * 1000:.2f},"
+            f" download {self.download * 1000:.2f},"
+            f" total {self.total * 1000:.2f} ms,"
+            f" sent {self.request_bytes} B,"
+            f" received {self.response_bytes} B"
+            + (f" (cache {self.cache})" if self.cache else "")
+        )
+
+
+class RequestTimer:
+    """Measure the timing of a request.
+
+    The timer is started when the request is sent. Its trace method can be
+    used as httpcore trace extension for recording the connection phases.
+    Transports that do not support tracing (such as the WSGI transport)
+    only allow measuring the time to first byte and the total time.
+    """
+
+    __slots__ = ("events", "headers", "start")
+
+    def __init__(self) -> None:
+        """Start the timer."""
+        self.start = perf_counter()
+        self.headers: Optional[float] = None
+        self.events: Dict[str, float] = {}
+
+    def trace(self, event_name: str, _info: Dict[str, Any]) -> None:
+        """Record the time of a trace event."""
+        # strip the prefix, e.g. "http11." or "connection."
+        self.events[event_name.partition(".")[2]] = perf_counter()
+
+    async def atrace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """Record the time of a trace event in an asynchronous transport."""
+        self.trace(event_name, info)
+
+    def received(self) -> None:
+        """Record the time when the response headers have been received."""
+        self.headers = perf_counter()
+
+    def _duration(self, phase: str) -> float:
+        """Get the duration of a traced phase of the request."""
+        events = self.events
+        started = events.get(f"{phase}.started")
+        completed = events.get(f"{phase}.complete")
+        if started is None or completed is None:
+            return 0.0
+        return completed - started
+
+    def timing(self, response: Response) -> RequestTiming:
+        """Get the timing of the request for the response.
+
+        The response should have been read and closed already.
+        """
+        request: Request = response.request
+        events = self.events
+        start = self.start
+        headers = events.get("receive_response_headers.complete")
+        if headers is None:
+            headers = self.headers or start
+        end = events.get("receive_response_body.complete")
+        if end is None:
+            try:
+                end = start + response.elapsed.total_seconds()
+            except RuntimeError:  # the response has not been closed
+                end = perf_counter()
+        end = max(end, headers)
+        connect = self._duration("connect_tcp") or self._duration(
+            "connect_unix_socket"
+        )
+        cache = cache_status(response)
+        response_bytes = 0 if cache else response.num_bytes_downloaded
+        if not response_bytes and not cache:
+            # the transport may have set the content
+            with suppress(ResponseNotRead):
+                response_bytes = len(response.content)
+        return RequestTiming(
+            request.method,
+            str(request.url),
+            response.status_code,
+            connect,
+            self._duration("start_tls"),
+            headers - start,
+            end - headers,
+            end - start,
+            int(request.headers.get("content-length", 0)),
+            response_bytes,
+            cache,
+        )
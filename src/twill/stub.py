@@ -0,0 +1,261 @@
+"""Stubbed responses for the twill browser.
+
+Stubs are routes that map a request method and a URL pattern to a canned
+response with a status code, headers and a body. Requests matching a route
+are answered in-process without any latency, other requests are passed on
+to the actual transport. With a catch-all route, the stubs can completely
+replace a server, which makes tests fast and deterministic.
+
+The stubs can be defined in Python, with twill commands, or in a file
+where every route is given on a line with the method, the URL pattern,
+the status and an optional body, followed by indented header lines::
+
+    # method  pattern  status  body
+    GET       /        200     <title>Home</title>
+    GET       /api/.*  200     {"ok": true}
+        Content-Type: application/json
+    POST      /login   303
+        Location: /
+    GET       /logo    200     @logo.png
+    *         .*       404     Not found
+
+A body starting with "@" is read from the given file, relative to the file
+with the routes.
+"""
+
+import re
+from pathlib import Path
+from typing import (
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Pattern,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+from httpx import (
+    URL,
+    AsyncBaseTransport,
+    BaseTransport,
+    Headers,
+    Request,
+    Response,
+)
+
+__all__ = [
+    "AsyncStubTransport",
+    "Route",
+    "StubTransport",
+    "Stubs",
+]
+
+DEFAULT_CONTENT_TYPE = "text/html; charset=utf-8"
+
+HeaderList = Sequence[Tuple[str, str]]
+
+
+class Route(NamedTuple):
+    """A route mapping requests to a canned response."""
+
+    method: str  # the request method, or "*" for all methods
+    pattern: Pattern[str]  # the pattern for the path or the whole URL
+    status: int  # the status code of the response
+    headers: HeaderList  # the headers of the response
+    body: bytes  # the body of the response
+
+    def matches(self, method: str, url: URL) -> bool:
+        """Check whether the route matches the given method and URL."""
+        if self.method not in ("*", method):
+            return False
+        pattern = self.pattern
+        # patterns containing a scheme are matched against the whole URL
+        target = str(url) if "://" in pattern.pattern else url.path
+        return pattern.fullmatch(target) is not None
+
+    def response(self, request: Request) -> Response:
+        """Create the response for the given request."""
+        headers = Headers(self.headers)
+        if self.body and "content-type" not in headers:
+            headers["Content-Type"] = DEFAULT_CONTENT_TYPE
+        return Response(
+            self.status, headers=headers, content=self.body, request=request
+        )
+
+
+def _parse_header(header: str) -> Tuple[str, str]:
+    """Parse a header given as "Name: value"."""
+    name, sep, value = header.partition(":")
+    name = name.strip()
+    if not sep or not name:
+        raise ValueError(f"invalid header {header.strip()!r}")
+    return name, value.strip()
+
+
+class Stubs:
+    """A table of routes with stubbed responses.
+
+    The first route matching a request determines the response. Adding
+    a route with the same method and pattern replaces the existing route.
+    """
+
+    def __init__(self, routes: Iterable[Route] = ()) -> None:
+        """Create a table with the given routes."""
+        self.routes: List[Route] = list(routes)
+        self.hits = 0  # number of requests answered with a stub
+
+    def __len__(self) -> int:
+        """Get the number of routes."""
+        return len(self.routes)
+
+    def add(
+        self,
+        method: str,
+        pattern: str,
+        status: int = 200,
+        body: Union[str, bytes] = b"",
+        headers: Union[None, HeaderList, Iterable[str]] = None,
+    ) -> Route:
+        """Add a route with the given response.
+
+        The pattern is a regular expression that must match the path of
+        the URL, or the whole URL if the pattern contains a scheme. The
+        headers can be given as pairs or as strings like "Name: value".
+        """
+        method = method.upper()
+        try:
+            compiled = re.compile(pattern)
+        except re.error as error:
+            raise ValueError(f"invalid pattern {pattern!r}: {error}") from None
+        if not 100 <= status <= 999:  # noqa: PLR2004
+            raise ValueError(f"invalid status {status}")
+        route = Route(
+            method,
+            compiled,
+            status,
+            tuple(
+                _parse_header(header) if isinstance(header, str) else header
+                for header in headers or ()
+            ),
+            body.encode("utf-8") if isinstance(body, str) else body,
+        )
+        routes = self.routes
+        for index, other in enumerate(routes):
+            if other.method == method and other.pattern.pattern == pattern:
+                routes[index] = route
+                break
+        else:
+            routes.append(route)
+        return route
+
+    def clear(self) -> None:
+        """Remove all routes."""
+        self.routes.clear()
+
+    def load(self, filename: Union[str, Path]) -> None:
+        """Add the routes defined in the given file."""
+        directory = Path(filename).parent
+        # the route definitions with their line numbers and headers
+        definitions: List[Tuple[int, List[str], List[Tuple[str, str]]]] = []
+        with open(filename, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                stripped = line.strip()
+                if not stripped or stripped.startswith("#"):
+                    continue
+                try:
+                    if line[0].isspace():
+                        if not definitions:
+                            raise ValueError("header without route")
+                        definitions[-1][2].append(_parse_header(stripped))
+                        continue
+                    parts = stripped.split(None, 3)
+                    if len(parts) < 3:  # noqa: PLR2004
+                        raise ValueError(
+                            "expected method, pattern, status and body"
+                        )
+                except ValueError as error:
+                    raise ValueError(
+                        f"{filename}:{line_no}: {error}"
+                    ) from None
+                definitions.append((line_no, parts, []))
+        for line_no, parts, headers in definitions:
+            method, pattern, status = parts[:3]
+            body = parts[3] if len(parts) > 3 else ""  # noqa: PLR2004
+            try:
+                self.add(
+                    method,
+                    pattern,
+                    int(status),
+                    (directory / body[1:]).read_bytes()
+                    if body.startswith("@")
+                    else body,
+                    headers,
+                )
+            except (OSError, ValueError) as error:
+                raise ValueError(f"{filename}:{line_no}: {error}") from None
+
+    def match(self, request: Request) -> Optional[Route]:
+        """Get the first route matching the given request."""
+        method, url = request.method, request.url
+        for route in self.routes:
+            if route.matches(method, url):
+                return route
+        return None
+
+    def respond(self, request: Request) -> Optional[Response]:
+        """Get the stubbed response for the given request, if any."""
+        route = self.match(request)
+        if route is None:
+            return None
+        self.hits += 1
+        return route.response(request)
+
+
+class StubTransport(BaseTransport):
+    """A transport answering requests with stubs if they are set."""
+
+    def __init__(
+        self, transport: BaseTransport, stubs: Optional[Stubs] = None
+    ) -> None:
+        """Wrap the given transport."""
+        self.transport = transport
+        self.stubs = stubs
+
+    def handle_request(self, request: Request) -> Response:
+        """Handle the request using the stubs if one matches."""
+        stubs = self.stubs
+        if stubs is not None:
+            response = stubs.respond(request)
+            if response is not None:
+                return response
+        return self.transport.handle_request(request)
+
+    def close(self) -> None:
+        """Close the wrapped transport."""
+        self.transport.close()
+
+
+class AsyncStubTransport(AsyncBaseTransport):
+    """An asynchronous transport answering requests with stubs."""
+
+    def __init__(
+        self, transport: AsyncBaseTransport, stubs: Optional[Stubs] = None
+    ) -> None:
+        """Wrap the given transport."""
+        self.transport = transport
+        self.stubs = stubs
+
+    async def handle_async_request(self, request: Request) -> Response:
+        """Handle the request using the stubs if one matches."""
+        stubs = self.stubs
+        if stubs is not None:
+            response = stubs.respond(request)
+            if response is not None:
+                return response
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        """Close the wrapped transport."""
+        await self.transport.aclose()
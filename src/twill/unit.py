@@ -4,13 +4,16 @@ import sys
 import time
 from io import StringIO
 from multiprocessing import Process
-from typing import Callable, Optional, TextIO
+from typing import Callable, Optional, TextIO, Union
 
+from .browser import browser
 from .parse import execute_file
+from .stub import Stubs
 
 HOST = "127.0.0.1"  # interface to run the server on
 PORT = 8080  # default port to run the server on
 SLEEP = 0  # time to wait for the server to start
+STUB_URL = "http://twill.test/"  # default URL when running on stubs
 
 
 class TestInfo:
@@ -85,3 +88,22 @@ def run_test(test_info: TestInfo) -> None:
         test_info.run_script()
     finally:
         server_process.terminate()
+
+
+def run_stubbed_test(
+    script: str, stubs: Union[str, Stubs], url: str = STUB_URL
+) -> None:
+    """Run test on stubs instead of a website running in a sub process.
+
+    The stubs can also be given as the name of a file defining them.
+    Requests that do not match any of the stubs are sent as usual.
+    """
+    if not isinstance(stubs, Stubs):
+        filename, stubs = stubs, Stubs()
+        stubs.load(filename)
+    previous_stubs = browser.stubs
+    browser.stubs = stubs
+    try:
+        execute_file(script, initial_url=url)
+    finally:
+        browser.stubs = previous_stubs
@@ -4,19 +4,44 @@ Apart from various simple utility functions, twill's robust parsing
 code is implemented in the ConfigurableParsingFactory class.
 """
 
+import inspect
 import os
 import re
-from contextlib import suppress
+import time
+import zlib
+from contextvars import ContextVar, Token
+from copy import deepcopy
+from functools import lru_cache
+from http import HTTPStatus
+from importlib import import_module
 from pathlib import Path
-from typing import Any, List, NamedTuple, Optional, Sequence, Tuple, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    MutableMapping,
+    MutableSequence,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
+from weakref import WeakKeyDictionary
 
-from httpx import Headers, Response
+from httpx import Headers, Request, Response
+from lxml.etree import ParserError
 from lxml.html import (
     CheckboxGroup,
+    Element,
     FormElement,
     HtmlElement,
     InputElement,
-    MultipleSelectOptions,
     RadioGroup,
     SelectElement,
     TextareaElement,
@@ -32,15 +57,24 @@ except (ImportError, OSError):
     tidylib = None
 
 from . import log, twill_ext
-from .errors import TwillException
+from .errors import TwillAssertionError, TwillException
+
+if TYPE_CHECKING:
+    from .stats import RequestTiming
 
 __all__ = [
     "CheckboxGroup",
+    "CompactResponse",
+    "ContextDict",
+    "ContextList",
+    "ControlElement",
     "FieldElement",
     "FormElement",
+    "FormIndex",
     "HtmlElement",
     "InputElement",
     "Link",
+    "OptionIndex",
     "RadioGroup",
     "Response",
     "ResultWrapper",
@@ -48,16 +82,24 @@ __all__ = [
     "Singleton",
     "TextareaElement",
     "UrlWithRealm",
+    "check_budgets",
+    "check_redirects",
+    "check_size",
+    "check_time",
     "gather_filenames",
     "get_equiv_refresh_interval",
+    "get_history_limit",
     "html_to_tree",
     "is_hidden_filename",
     "is_twill_filename",
     "make_boolean",
     "make_int",
     "make_twill_filename",
+    "option_index",
     "print_form",
     "run_tidy",
+    "set_form_control_value",
+    "set_form_control_values",
     "tree_to_html",
     "trunc",
     "unique_match",
@@ -68,6 +110,20 @@ FieldElement = Union[
     CheckboxGroup, InputElement, RadioGroup, SelectElement, TextareaElement
 ]
 
+ControlElement = Union[InputElement, SelectElement, TextareaElement]
+
+
+# Headers that do not apply to the decoded content of a compacted response
+_compact_skip_headers = frozenset(
+    ("content-encoding", "content-length", "transfer-encoding")
+)
+
+# Characters that have a special meaning in regular expressions
+_regex_chars = frozenset(".^$*+?{}[]\\|()")
+
+# Submit buttons and input fields outside of forms (in document order)
+_fix_forms_xpath = "//button[@type='submit'] | //input[not(ancestor::form)]"
+
 
 class Link(NamedTuple):
     """A link with some text and a URL."""
@@ -76,6 +132,19 @@ class Link(NamedTuple):
     url: str
 
 
+@lru_cache(maxsize=128)
+def _link_matcher(pattern: str) -> Callable[[str], bool]:
+    """Get a function checking whether a string contains the given pattern.
+
+    Patterns without special characters are searched as plain substrings,
+    which is faster than searching them as regular expressions.
+    """
+    if _regex_chars.isdisjoint(pattern):
+        return lambda s: pattern in s
+    search = re.compile(pattern).search
+    return lambda s: search(s) is not None
+
+
 # Depending on the configuration, realms can be ignored
 UrlWithRealm = Union[str, Tuple[str, str]]
 
@@ -97,33 +166,347 @@ class Singleton:
         cls.__it__ = None
 
 
+class ContextDict(MutableMapping[str, Any]):
+    """A proxy for a dictionary that is stored in a context variable.
+
+    This allows modules to export a dictionary that is context-local,
+    so that twill scripts running in different threads or tasks can use
+    their own versions of the dictionary.
+    """
+
+    __slots__ = ("_var",)
+
+    def __init__(self, var: ContextVar[Dict[str, Any]]) -> None:
+        """Initialize the proxy for the given context variable."""
+        self._var = var
+
+    def __getitem__(self, key: str) -> Any:
+        """Get an item from the dictionary of the current context."""
+        return self._var.get()[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        """Set an item in the dictionary of the current context."""
+        self._var.get()[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        """Delete an item from the dictionary of the current context."""
+        del self._var.get()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the dictionary of the current context."""
+        return iter(self._var.get())
+
+    def __len__(self) -> int:
+        """Get the size of the dictionary of the current context."""
+        return len(self._var.get())
+
+    def __repr__(self) -> str:
+        """Represent the dictionary of the current context."""
+        return repr(self._var.get())
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get an item from the dictionary of the current context."""
+        return self._var.get().get(key, default)
+
+    def clear(self) -> None:
+        """Clear the dictionary of the current context."""
+        self._var.get().clear()
+
+    def copy(self) -> Dict[str, Any]:
+        """Copy the dictionary of the current context."""
+        return self._var.get().copy()
+
+    def set(self, value: Dict[str, Any]) -> Token[Dict[str, Any]]:
+        """Use the given dictionary in the current context.
+
+        Returns a token that can be used to restore the previous dictionary.
+        """
+        return self._var.set(value)
+
+
+class ContextList(MutableSequence[str]):
+    """A proxy for a list of strings that is stored in a context variable.
+
+    This allows modules to export a list that is context-local,
+    so that twill scripts running in different threads or tasks can use
+    their own versions of the list.
+    """
+
+    __slots__ = ("_var",)
+
+    def __init__(self, var: ContextVar[List[str]]) -> None:
+        """Initialize the proxy for the given context variable."""
+        self._var = var
+
+    def __getitem__(self, index: Any) -> Any:
+        """Get an item from the list of the current context."""
+        return self._var.get()[index]
+
+    def __setitem__(self, index: Any, value: Any) -> None:
+        """Set an item in the list of the current context."""
+        self._var.get()[index] = value
+
+    def __delitem__(self, index: Any) -> None:
+        """Delete an item from the list of the current context."""
+        del self._var.get()[index]
+
+    def __len__(self) -> int:
+        """Get the length of the list of the current context."""
+        return len(self._var.get())
+
+    def __contains__(self, value: object) -> bool:
+        """Check whether the list of the current context has a value."""
+        return value in self._var.get()
+
+    def __repr__(self) -> str:
+        """Represent the list of the current context."""
+        return repr(self._var.get())
+
+    def insert(self, index: int, value: str) -> None:
+        """Insert a value into the list of the current context."""
+        self._var.get().insert(index, value)
+
+    def copy(self) -> List[str]:
+        """Copy the list of the current context."""
+        return self._var.get().copy()
+
+    def set(self, value: List[str]) -> Token[List[str]]:
+        """Use the given list in the current context.
+
+        Returns a token that can be used to restore the previous list.
+        """
+        return self._var.set(value)
+
+
+class CompactResponse(NamedTuple):
+    """A response stored with a compressed body to save memory."""
+
+    url: str  # the URL of the response
+    status: int  # the status code of the response
+    headers: List[Tuple[str, str]]  # the headers of the response
+    body: bytes  # the decoded content of the response, compressed with zlib
+
+    @classmethod
+    def from_response(cls, response: Response) -> "CompactResponse":
+        """Create a compact response from a full response."""
+        return cls(
+            str(response.url),
+            response.status_code,
+            [
+                (name, value)
+                for name, value in response.headers.multi_items()
+                if name.lower() not in _compact_skip_headers
+            ],
+            zlib.compress(response.content),
+        )
+
+    def response(self) -> Response:
+        """Rebuild the full response."""
+        return Response(
+            self.status,
+            headers=self.headers,
+            content=zlib.decompress(self.body),
+            request=Request("GET", self.url),
+        )
+
+
+class FormIndex:
+    """An index of the fields of a form for looking them up quickly.
+
+    The fields are indexed by name and id, and by position in the form.
+    Checkbox and radio groups and the results of searching the names with
+    regular expressions are computed when needed and then remembered.
+    The index stays valid as long as the fields of the form do not change,
+    which is the case until another page is loaded. The values of the fields
+    can change and are therefore not indexed.
+    """
+
+    def __init__(self, form: FormElement) -> None:
+        """Build the index for the given form."""
+        self.form = form
+        self.fields: List[ControlElement] = list(form.inputs)
+        self.by_name: Dict[str, List[ControlElement]] = {}
+        self.by_id: Dict[str, List[ControlElement]] = {}
+        for field in self.fields:
+            name = field.name
+            if name:
+                self.by_name.setdefault(name, []).append(field)
+            field_id = field.get("id")
+            if field_id:
+                self.by_id.setdefault(field_id, []).append(field)
+        self._groups: Dict[str, Optional[FieldElement]] = {}
+        self._searches: Dict[str, List[ControlElement]] = {}
+
+    def __len__(self) -> int:
+        """Get the number of fields in the form."""
+        return len(self.fields)
+
+    def group(self, name: str) -> Optional[FieldElement]:
+        """Get the checkbox or radio group with the given name.
+
+        Returns None if there are no multiple checkboxes or radio buttons
+        with that name.
+        """
+        groups = self._groups
+        if name in groups:
+            return groups[name]
+        group: Optional[FieldElement] = None
+        fields = self.by_name.get(name, [])
+        if len(fields) > 1:
+            types = {getattr(field, "type", None) for field in fields}
+            if types == {"checkbox"}:
+                group = CheckboxGroup(cast("List[InputElement]", fields))
+            elif types == {"radio"}:
+                group = RadioGroup(cast("List[InputElement]", fields))
+        groups[name] = group
+        return group
+
+    def search(self, pattern: str) -> List[ControlElement]:
+        """Get the fields with names matching the given regex pattern.
+
+        The returned list must not be modified.
+        """
+        searches = self._searches
+        fields = searches.get(pattern)
+        if fields is None:
+            search = re.compile(pattern).search
+            fields = searches[pattern] = [
+                field
+                for field in self.fields
+                if field.name and search(field.name)
+            ]
+        return fields
+
+    def with_value(self, value: str) -> List[ControlElement]:
+        """Get the fields that currently have the given value."""
+        return [field for field in self.fields if field.value == value]
+
+
 class ResultWrapper:
     """Deal with request results, and present them in a unified form.
 
     These objects are returned by browser._journey()-wrapped functions.
+
+    The page is only parsed when its tree, forms, links or title are needed
+    for the first time, so checking only the status code or the URL of a
+    result, e.g. of a JSON or image response, stays cheap.
+
+    The timings of all requests that were needed to get the page, including
+    redirects and meta refreshes, are stored in the timings attribute, and
+    the time needed for parsing the page is stored in parse_time.
+
+    Pages in the browser history can be compacted: only the URL, status,
+    headers and the compressed content are kept, and the response is rebuilt
+    and the page parsed again when it is needed again.
     """
 
     def __init__(self, response: Response) -> None:
         """Initialize the result wrapper."""
-        self.response = response
+        self._response: Union[Response, CompactResponse] = response
         self.encoding = response.encoding
+        self.timings: List[RequestTiming] = []
+        self.parse_time: Optional[float] = None
+        self._tree: Optional[HtmlElement] = None
+        self._forms: List[FormElement] = []
+        self._links: Optional[List[Link]] = None
+        self._form_indexes: Dict[FormElement, FormIndex] = {}
+
+    @property
+    def response(self) -> Response:
+        """Get the response, rebuilding it if the result has been compacted."""
+        response = self._response
+        if isinstance(response, CompactResponse):
+            response = self._response = response.response()
+            response.encoding = self.encoding
+        return response
+
+    @property
+    def is_compact(self) -> bool:
+        """Check whether the result has been compacted."""
+        return isinstance(self._response, CompactResponse)
+
+    def compact(self) -> None:
+        """Release the response and the parsed page to save memory.
+
+        Only the URL, status, headers and the compressed content are kept.
+        Changes made to the forms on the page are lost.
+        """
+        response = self._response
+        if isinstance(response, CompactResponse):
+            return
+        self._response = CompactResponse.from_response(response)
+        self._tree = None
+        self._forms = []
+        self._links = None
+        self._form_indexes = {}
+
+    def _parse(self) -> HtmlElement:
+        """Parse the result page and fix its forms for use with twill."""
+        start = time.perf_counter()
         try:
-            self.tree = html_to_tree(self.text)
-        except ValueError:
-            # may happen when there is an XML encoding declaration
-            self.tree = html_to_tree(self.content)
-        self.xpath = self.tree.xpath
-        self._fix_forms()
+            try:
+                try:
+                    tree = html_to_tree(self.text)
+                except ValueError:
+                    # may happen when there is an XML encoding declaration
+                    tree = html_to_tree(self.content)
+            except ParserError:  # the document is empty
+                tree = html_to_tree("<html></html>")
+            self._tree = tree
+            self._fix_forms()
+        finally:
+            self.parse_time = time.perf_counter() - start
+        return tree
+
+    @property
+    def tree(self) -> HtmlElement:
+        """Get the element tree of the result page, parsing it if needed."""
+        tree = self._tree
+        if tree is None:
+            tree = self._parse()
+        return tree
+
+    @property
+    def forms(self) -> List[FormElement]:
+        """Get all forms on the result page.
+
+        This includes the global form at index 0 if present.
+        """
+        if self._tree is None:
+            self._parse()
+        return self._forms
+
+    def form_index(self, form: FormElement) -> FormIndex:
+        """Get the index of the fields of the given form on the page."""
+        indexes = self._form_indexes
+        index = indexes.get(form)
+        if index is None:
+            index = indexes[form] = FormIndex(form)
+        return index
+
+    def xpath(self, path: str, **kwargs: Any) -> List[Any]:
+        """Evaluate an xpath expression on the result page.
+
+        Keyword arguments such as namespaces or variables are passed on
+        to the xpath method of the lxml tree.
+        """
+        return self.tree.xpath(path, **kwargs)
 
     @property
     def url(self) -> str:
         """Get the URL of the result page."""
-        return str(self.response.url)
+        response = self._response
+        if isinstance(response, CompactResponse):
+            return response.url
+        return str(response.url)
 
     @property
     def http_code(self) -> int:
         """Get the HTTP status code of the result page."""
-        return self.response.status_code
+        response = self._response
+        if isinstance(response, CompactResponse):
+            return response.status
+        return response.status_code
 
     @property
     def text(self) -> str:
@@ -140,6 +523,30 @@ class ResultWrapper:
         """Get the headers of the result page."""
         return self.response.headers
 
+    @property
+    def total_time(self) -> float:
+        """Get the total time in seconds of the requests for the page."""
+        return sum(timing.total for timing in self.timings)
+
+    @property
+    def size(self) -> int:
+        """Get the number of bytes received for the page.
+
+        This includes the responses to redirects and meta refreshes.
+        If no timings have been recorded, the size of the content is used.
+        """
+        if self.timings:
+            return sum(timing.response_bytes for timing in self.timings)
+        return len(self.content)
+
+    @property
+    def redirects(self) -> int:
+        """Get the number of redirects and meta refreshes for the page."""
+        return sum(
+            timing.status != HTTPStatus.UNAUTHORIZED
+            for timing in self.timings[:-1]
+        )
+
     @property
     def title(self) -> Optional[str]:
         """Get the title of the result page."""
@@ -151,26 +558,33 @@ class ResultWrapper:
     @property
     def links(self) -> List[Link]:
         """Get all links in the result page."""
-        return [
-            Link(a.text_content(), a.get("href"))
-            for a in self.xpath("//a[@href]")
-        ]
+        return list(self._link_list())
+
+    def _link_list(self) -> List[Link]:
+        """Get the links in the result page, collecting them only once."""
+        links = self._links
+        if links is None:
+            links = self._links = [
+                Link(a.text_content(), a.get("href"))
+                for a in self.xpath("//a[@href]")
+            ]
+        return links
 
     def find_link(self, pattern: str) -> Optional[Link]:
         """Find a link with a given pattern on the result page."""
-        regex = re.compile(pattern)
-        for link in self.links:
-            if regex.search(link.text) or regex.search(link.url):
+        matches = _link_matcher(pattern)
+        for link in self._link_list():
+            if matches(link.text) or matches(link.url):
                 return link
         return None
 
     def find_links(self, pattern: str) -> List[Link]:
         """Find all links with a given pattern on the result page."""
-        regex = re.compile(pattern)
+        matches = _link_matcher(pattern)
         return [
             link
-            for link in self.links
-            if regex.search(link.text) or regex.search(link.url)
+            for link in self._link_list()
+            if matches(link.text) or matches(link.url)
         ]
 
     def form(self, name_or_num: Union[str, int] = 1) -> Optional[FormElement]:
@@ -205,24 +619,29 @@ class ResultWrapper:
             return forms[num]
 
     def _fix_forms(self) -> None:
-        """Fix forms on the page for use with twill."""
-        # put all stray fields into a form
-        orphans = self.xpath("//input[not(ancestor::form)]")
+        """Fix forms on the page for use with twill.
+
+        Submit button elements are converted to input elements, since
+        otherwise lxml will not recognize them as form input fields, and
+        copies of all stray input fields are put into a global form.
+        Both kinds of elements are found with a single pass over the tree.
+        """
+        tree = self.tree
+        orphans: List[InputElement] = []
+        for element in tree.xpath(_fix_forms_xpath):
+            if element.tag == "button":
+                element.tag = "input"
+            else:
+                orphans.append(element)
+        forms = tree.forms
         if orphans:
-            form_parts = (
-                [b"<form>"]
-                + [tree_to_html(orphan) for orphan in orphans]
-                + [b"</form>"]
-            )
-            self.forms = html_to_tree(b"".join(form_parts)).forms
-            self.forms.extend(self.tree.forms)
-        else:
-            self.forms = self.tree.forms
-        # convert all submit button elements to input elements, since
-        # otherwise lxml will not recognize them as form input fields
-        for form in self.forms:
-            for button in form.xpath("//button[@type='submit']"):
-                button.tag = "input"
+            global_form = cast("FormElement", Element("form"))
+            for orphan in orphans:
+                field = deepcopy(orphan)
+                field.tail = None
+                global_form.append(field)
+            forms.insert(0, global_form)
+        self._forms = forms
 
 
 def trunc(s: Optional[str], length: int) -> str:
@@ -310,11 +729,94 @@ def make_int(value: Any) -> int:
     return ival
 
 
+class OptionIndex:
+    """An index of the options of a select element or a checkbox group.
+
+    The options are indexed by their values and, for select elements,
+    also by their labels, so that they can be found without searching.
+    If several options have the same value or label, the first one is used.
+    """
+
+    def __init__(self, control: Union[SelectElement, CheckboxGroup]) -> None:
+        """Build the index for the given control."""
+        # the option elements and their values by value and label
+        self.options: Dict[str, Tuple[HtmlElement, str]] = {}
+        options = self.options
+        if isinstance(control, SelectElement):
+            for option in control.iter("option"):
+                label = (option.text or "").strip()
+                value = option.get("value")
+                value = label if value is None else value.strip()
+                options.setdefault(value, (option, value))
+                options.setdefault(label, (option, value))
+        else:
+            for checkbox in control:
+                value = checkbox.get("value")
+                if value is not None:
+                    options.setdefault(value, (checkbox, value))
+
+    def __len__(self) -> int:
+        """Get the number of values and labels in the index."""
+        return len(self.options)
+
+    def get(self, value_or_label: str) -> Optional[Tuple[HtmlElement, str]]:
+        """Get the option with the given value or label and its value."""
+        return self.options.get(value_or_label)
+
+
+# the option indexes of select elements and (first checkboxes of) groups
+_option_indexes: "WeakKeyDictionary[HtmlElement, OptionIndex]" = (
+    WeakKeyDictionary()
+)
+
+
+def option_index(control: Union[SelectElement, CheckboxGroup]) -> OptionIndex:
+    """Get the index of the options of the given control.
+
+    The index is remembered as long as the control exists.
+    """
+    key = control if isinstance(control, SelectElement) else control[0]
+    index = _option_indexes.get(key)
+    if index is None:
+        index = _option_indexes[key] = OptionIndex(control)
+    return index
+
+
+def _split_sign(value: str) -> Tuple[bool, str]:
+    """Split a value into a flag for adding or removing it and the value."""
+    if value.startswith("-"):
+        return False, value[1:]
+    if value.startswith("+"):
+        value = value[1:]
+    return True, value
+
+
 def set_form_control_value(control: FieldElement, value: str) -> None:
     """Set the given control to the given value.
 
     The controls can be checkboxes, select elements etc.
     """
+    set_form_control_values(control, (value,))
+
+
+def set_form_control_values(
+    control: FieldElement, values: Iterable[str]
+) -> None:
+    """Set the given control to the given values, one after the other.
+
+    For multiple select elements and checkbox groups, the values can be
+    prefixed with "+" or "-" to select or deselect an option. They are set
+    in one go, looking up the options only once.
+    """
+    if isinstance(control, (SelectElement, CheckboxGroup)):
+        _set_options(control, values)
+        return
+    for value in values:
+        _set_value(control, value)
+
+
+def _set_value(control: FieldElement, value: str) -> None:
+    """Set the given control without options to the given value."""
     if isinstance(control, InputElement):
         if control.checkable:
             try:
@@ -331,49 +833,37 @@ def set_form_control_value(control: FieldElement, value: str) -> None:
     elif isinstance(control, (TextareaElement, RadioGroup)):
         control.value = value
 
-    elif isinstance(control, CheckboxGroup):
-        if value.startswith("-"):
-            value = value[1:]
-            with suppress(KeyError):
-                control.value.remove(value)
-        else:
-            if value.startswith("+"):
-                value = value[1:]
-            control.value.add(value)
-
-    elif isinstance(control, SelectElement):
-        # for ListControls we need to find the right *value*,
-        # and figure out if we want to *select* or *deselect*
-        if value.startswith("-"):
-            add = False
-            value = value[1:]
-        else:
-            add = True
-            if value.startswith("+"):
-                value = value[1:]
-
-        # now, select the value.
-        option_values = [val.strip() for val in control.value_options]
-        options = control.getchildren()
-        option_names = [(c.text or "").strip() for c in options]
-        for name, opt in zip(option_names, option_values):
-            if value not in (name, opt):
-                continue
-            if isinstance(control.value, MultipleSelectOptions):
-                if add:
-                    control.value.add(opt)
-                elif opt in control.value:
-                    control.value.remove(opt)
-            else:
-                control.value = opt if add else ""
-            break
-        else:
-            raise TwillException("Attempt to set an invalid value")
-
     else:
         raise TwillException("Attempt to set value on invalid control")
 
 
+def _set_options(
+    control: Union[SelectElement, CheckboxGroup], values: Iterable[str]
+) -> None:
+    """Select or deselect options of a select element or checkbox group."""
+    index = option_index(control)
+    if isinstance(control, CheckboxGroup):
+        attribute, multiple = "checked", True
+    else:
+        attribute, multiple = "selected", control.multiple
+    for signed_value in values:
+        add, value = _split_sign(signed_value)
+        found = index.get(value)
+        if found is None:
+            if attribute == "selected":
+                raise TwillException("Attempt to set an invalid value")
+            if add:
+                raise KeyError(f"No checkbox with the value {value!r}")
+            continue  # nothing to deselect
+        option, option_value = found
+        if not multiple:
+            control.value = option_value if add else ""
+        elif add:
+            option.set(attribute, "")
+        else:
+            option.attrib.pop(attribute, None)
+
+
 def _all_the_same_submit(matches: Sequence[FieldElement]) -> bool:
     """Check if a list of controls all belong to the same control.
 
@@ -449,6 +939,69 @@ def run_tidy(html: str) -> Tuple[Optional[str], Optional[str]]:
     return clean_html, errors
 
 
+def check_time(
+    result: ResultWrapper, max_time: float, *, last: bool = False
+) -> None:
+    """Check that the page was loaded within the given milliseconds.
+
+    If last is set, only the last request is checked, otherwise the total
+    time of all requests including redirects and meta refreshes.
+    """
+    if last:
+        seconds = result.timings[-1].total if result.timings else 0.0
+    else:
+        seconds = result.total_time
+    time = seconds * 1000
+    if time > max_time:
+        which = "last request" if last else "page load"
+        raise TwillAssertionError(
+            f"{which} took {time:.0f} ms > {max_time:g} ms"
+        )
+
+
+def check_size(result: ResultWrapper, max_size: int) -> None:
+    """Check that no more than the given number of bytes was received."""
+    size = result.size
+    if size > max_size:
+        raise TwillAssertionError(f"page size is {size} > {max_size} bytes")
+
+
+def check_redirects(result: ResultWrapper, max_redirects: int) -> None:
+    """Check that the page was not redirected more than the given times.
+
+    A negative maximum means that the number of redirects is not limited.
+    """
+    if max_redirects < 0:
+        return
+    redirects = result.redirects
+    if redirects > max_redirects:
+        raise TwillAssertionError(
+            f"page was redirected {redirects} > {max_redirects} times"
+        )
+
+
+def check_budgets(result: ResultWrapper) -> None:
+    """Check the configured budgets for a page that has been loaded.
+
+    The budgets are given by the options 'max_time' (in milliseconds),
+    'max_size' (in bytes) and 'max_redirects'. A value of zero means
+    that there is no budget for the time or size, while zero redirects
+    are a valid budget, and a negative value means that the number of
+    redirects is not limited.
+    """
+    from .commands import options  # noqa: PLC0415
+
+    max_time = options.get("max_time")
+    if max_time:
+        check_time(result, max_time)
+    max_size = options.get("max_size")
+    if max_size:
+        check_size(result, max_size)
+    max_redirects = options.get("max_redirects")
+    if max_redirects is not None:
+        check_redirects(result, max_redirects)
+
+
 def get_equiv_refresh_interval() -> Optional[int]:
     """Get the longest interval for which the browser should follow redirects.
 
@@ -459,6 +1012,36 @@ def get_equiv_refresh_interval() -> Optional[int]:
     return options.get("equiv_refresh_interval")
 
 
+def get_history_limit() -> int:
+    """Get the maximum number of pages kept in the browser history.
+
+    A limit of 0 means that the history is not limited.
+    """
+    from .commands import options  # noqa: PLC0415
+
+    return options.get("history_limit") or 0
+
+
+def is_asgi_app(app: Callable[..., Any]) -> bool:
+    """Check whether the given application is an ASGI application."""
+    return inspect.iscoroutinefunction(app) or inspect.iscoroutinefunction(
+        type(app).__call__
+    )
+
+
+def load_app(spec: str) -> Callable[..., Any]:
+    """Load a WSGI or ASGI application given as 'module:callable'."""
+    module_name, sep, name = spec.partition(":")
+    if not (module_name and sep and name):
+        raise ValueError(f"expected 'module:callable', got {spec!r}")
+    app = import_module(module_name)
+    for attr in name.split("."):
+        app = getattr(app, attr)
+    if not callable(app):
+        raise TypeError(f"{spec!r} is not callable")
+    return app
+
+
 def is_hidden_filename(filename: str) -> bool:
     """Check if this is a hidden file (starting with a dot)."""
     return filename not in (os.curdir, os.pardir) and Path(
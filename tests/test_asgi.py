@@ -0,0 +1,144 @@
+"""Test the ASGI and Unix domain socket support."""
+
+import asyncio
+import socket
+import sys
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from socketserver import UnixStreamServer
+from threading import Thread
+from typing import Any, Awaitable, Callable, Dict, Iterator
+from urllib.parse import quote
+
+import pytest
+
+from twill import commands, new_context
+from twill.browser import AsyncTwillBrowser, TwillBrowser
+from twill.errors import TwillException
+
+Scope = Dict[str, Any]
+Receive = Callable[[], Awaitable[Dict[str, Any]]]
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+async def asgi_app(scope: Scope, receive: Receive, send: Send) -> None:
+    """Answer with the method and path, and the submitted form data."""
+    assert scope["type"] == "http"
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    if scope["path"] == "/old":
+        headers = [(b"location", b"/form")]
+        await send(
+            {"type": "http.response.start", "status": 302, "headers": headers}
+        )
+        await send({"type": "http.response.body"})
+        return
+    html = (
+        f"<title>{scope['method']} {scope['path']}</title>"
+        f"<p>{body.decode()}</p>"
+        '<form method="post"><input name="q"><input type="submit"></form>'
+    )
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"text/html")],
+        }
+    )
+    await send({"type": "http.response.body", "body": html.encode()})
+
+
+class AsgiApp:
+    """An ASGI app implemented as a class."""
+
+    async def __call__(
+        self, scope: Scope, receive: Receive, send: Send
+    ) -> None:
+        await asgi_app(scope, receive, send)
+
+
+def test_asgi_app():
+    async def run() -> None:
+        async with AsyncTwillBrowser(
+            "http://twill.test", app=asgi_app
+        ) as browser:
+            await browser.go("/old")
+            assert browser.title == "GET /form"
+            with new_context(browser):
+                commands.fv("1", "q", "twill")
+            await browser.submit()
+            assert browser.title == "POST /form"
+            assert "q=twill" in browser.html
+            await browser.reset(app=AsgiApp())
+            await browser.go("http://twill.test/page")
+            assert browser.title == "GET /page"
+
+    asyncio.run(run())
+
+
+def test_app_type_is_checked():
+    with pytest.raises(TwillException, match="ASGI apps can only be used"):
+        TwillBrowser(app=asgi_app)
+    with pytest.raises(TwillException, match="WSGI apps can only be used"):
+        AsyncTwillBrowser(app=lambda _environ, _start_response: [])
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Answer with the requested path."""
+
+    def do_GET(self) -> None:
+        body = f"<title>Socket {self.path}</title>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self) -> str:
+        return "unix"
+
+    def log_message(self, *_args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def socket_path(tmp_path: Path) -> Iterator[str]:
+    """Run an HTTP server on a Unix domain socket."""
+    if not hasattr(socket, "AF_UNIX") or sys.platform == "win32":
+        pytest.skip("Unix domain sockets are not available")
+    path = str(tmp_path / "server.sock")
+    server = UnixStreamServer(path, Handler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def test_unix_domain_socket(socket_path: str):
+    browser = TwillBrowser(uds=socket_path)
+    with new_context(browser):
+        commands.go("http://localhost/page")
+        commands.title("Socket /page")
+        commands.reset_browser(
+            f"http+unix://{quote(socket_path, safe='')}/api"
+        )
+        commands.go("items")
+        commands.title("Socket /api/items")
+        commands.url("http://localhost/api/items")
+    browser.close()
+
+
+def test_unix_domain_socket_async(socket_path: str):
+    async def run() -> None:
+        base_url = f"http+unix://{quote(socket_path, safe='')}"
+        async with AsyncTwillBrowser(base_url) as browser:
+            await browser.go("/async")
+            assert browser.title == "Socket /async"
+
+    asyncio.run(run())
@@ -0,0 +1,73 @@
+"""Test the asynchronous twill browser."""
+
+import asyncio
+from inspect import signature
+from typing import List
+
+import pytest
+from httpx import MockTransport, Request, Response
+
+from twill.browser import AsyncTwillBrowser, TwillBrowser
+from twill.errors import TwillException
+
+
+def test_same_argument_order_as_twill_browser():
+    for method in "__init__", "reset":
+        params = list(signature(getattr(TwillBrowser, method)).parameters)
+        async_params = signature(getattr(AsyncTwillBrowser, method)).parameters
+        assert list(async_params) == [*params, "transport"]
+
+
+async def visit_and_login(url: str) -> List[str]:
+    """Visit the test server, log in and out, and report the visited URLs."""
+    async with AsyncTwillBrowser() as browser:
+        await browser.go(url)
+        assert browser.code == 200
+        assert "These are the twill tests" in browser.html
+        await browser.go("/login")
+        browser.form_field(browser.form(), "username").value = "async"
+        await browser.submit()
+        assert "You are logged in as async" in browser.html
+        await browser.follow_link("logout")
+        assert browser.code == 200
+        urls = [page.url for page in browser.history]
+        await browser.back()
+        assert browser.url == urls[-1]
+        return urls
+
+
+def test_go_submit_follow_back(url: str):
+    urls = asyncio.run(visit_and_login(url))
+    assert urls == [url, url + "login"]
+
+
+def test_many_concurrent_browsers(url: str):
+    async def run_all() -> List[List[str]]:
+        return await asyncio.gather(*(visit_and_login(url) for _ in range(5)))
+
+    for urls in asyncio.run(run_all()):
+        assert urls == [url, url + "login"]
+
+
+def test_meta_refresh_and_mock_transport():
+    def handler(request: Request) -> Response:
+        if request.url.path == "/start":
+            return Response(
+                200, html='<meta http-equiv="refresh" content="0;url=/end">'
+            )
+        return Response(200, html="<title>The End</title>")
+
+    async def run() -> None:
+        browser = AsyncTwillBrowser(transport=MockTransport(handler))
+        await browser.go("http://twill.test/start")
+        assert browser.url == "http://twill.test/end"
+        assert browser.title == "The End"
+        await browser.reload()
+        assert browser.url == "http://twill.test/end"
+        await browser.reset()
+        assert browser.url is None
+        with pytest.raises(TwillException):
+            await browser.go("no.such.host.invalid/")
+        await browser.close()
+
+    asyncio.run(run())
@@ -0,0 +1,133 @@
+"""Test asynchronous execution of twill scripts."""
+
+import asyncio
+from pathlib import Path
+from time import perf_counter
+
+import pytest
+from httpx import MockTransport, Request, Response
+
+from twill import (
+    browser,
+    execute_file_async,
+    execute_string_async,
+    namespaces,
+    new_context,
+)
+from twill.browser import AsyncTwillBrowser, TwillBrowser
+from twill.errors import TwillAssertionError, TwillException
+from twill.parse import command_list, execute_command
+
+from .utils import test_dir
+
+login_script = """
+go /login
+setlocal user user{n}
+fv 1 username $user
+sleep 0.25
+submit
+find "You are logged in as user{n}"
+setglobal user $user
+"""
+
+
+def test_interleaved_scripts(url: str):
+    async def run_all() -> None:
+        await asyncio.gather(
+            *(
+                execute_string_async(login_script.format(n=n), initial_url=url)
+                for n in range(8)
+            )
+        )
+
+    start = perf_counter()
+    asyncio.run(run_all())
+    duration = perf_counter() - start
+    assert duration < 1.5  # the scripts sleep 2 seconds in total
+    # the scripts ran with their own browsers and namespaces
+    assert isinstance(browser, TwillBrowser)
+    assert "user" not in namespaces.get_twill_glocals()[0]
+
+
+def test_script_file_with_own_browser(url: str):
+    async def run() -> AsyncTwillBrowser:
+        async with AsyncTwillBrowser() as own_browser:
+            await execute_file_async(
+                str(Path(test_dir, "test_unit_support.twill")),
+                browser=own_browser,
+                initial_url=url,
+            )
+            assert own_browser.url == url + "multisubmitform"
+            assert "used_sub_a" in own_browser.html
+            return own_browser
+
+    asyncio.run(run())
+
+
+def test_failing_script(url: str):
+    with pytest.raises(TwillAssertionError):
+        asyncio.run(
+            execute_string_async(
+                "go /login\nfind 'You are logged in'", initial_url=url
+            )
+        )
+
+
+def test_command_not_awaiting_browser():
+    def handler(request: Request) -> Response:
+        return Response(200, html=f"<title>{request.url.path}</title>")
+
+    def reload_page() -> None:
+        """Reload the page without awaiting the asynchronous browser."""
+        browser.reload()
+
+    async def run() -> None:
+        transport = MockTransport(handler)
+        async with AsyncTwillBrowser(transport=transport) as own_browser:
+            await execute_string_async(
+                "reload_page",
+                browser=own_browser,
+                initial_url="http://twill.test/",
+            )
+
+    global_dict = namespaces.get_twill_glocals()[0]
+    global_dict["reload_page"] = reload_page
+    command_list.append("reload_page")
+    try:
+        with pytest.raises(
+            TwillException, match="'reload_page' cannot be used"
+        ):
+            asyncio.run(run())
+    finally:
+        command_list.remove("reload_page")
+        del global_dict["reload_page"]
+
+
+def test_async_command_in_sync_script():
+    async def coroutine_command() -> None:
+        """Do nothing asynchronously."""
+
+    global_dict, local_dict = namespaces.get_twill_glocals()
+    global_dict["coroutine_command"] = coroutine_command
+    command_list.append("coroutine_command")
+    try:
+        with pytest.raises(
+            TwillException, match="'coroutine_command' can only be used"
+        ):
+            execute_command(
+                "coroutine_command", (), global_dict, local_dict, "<test>"
+            )
+    finally:
+        command_list.remove("coroutine_command")
+        del global_dict["coroutine_command"]
+
+
+def test_sync_command_with_async_browser():
+    async_browser = AsyncTwillBrowser()
+    with new_context(async_browser):
+        global_dict, local_dict = namespaces.get_twill_glocals()
+        with pytest.raises(
+            TwillException, match="'reload' cannot be used with the async"
+        ):
+            execute_command("reload", (), global_dict, local_dict, "<test>")
+    asyncio.run(async_browser.close())
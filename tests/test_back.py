@@ -1,5 +1,86 @@
+from typing import Any, Callable, List
+
+from twill import commands, new_context
+from twill.browser import TwillBrowser
+
 from .utils import execute_script
 
 
 def test(url: str):
     execute_script("test_back.twill", initial_url=url)
+
+
+def app(environ: Any, start_response: Callable) -> List[bytes]:
+    """Answer with a page showing the path and a form."""
+    path = environ["PATH_INFO"]
+    start_response(
+        "200 OK",
+        [("Content-Type", "text/html"), ("Content-Encoding", "identity")],
+    )
+    return [
+        f'<title>Page {path}</title><form><input name="q" value="{path}">'
+        "</form>".encode()
+    ]
+
+
+def test_back_keeps_form_edits():
+    browser = TwillBrowser(app=app)
+    with new_context(browser):
+        for page in range(1, 4):
+            commands.go(f"http://twill.test/{page}")
+            commands.fv("1", "q", f"changed {page}")
+        commands.go("http://twill.test/4")
+        assert not any(page.is_compact for page in browser.history)
+        for page in range(3, 0, -1):
+            commands.back()
+            commands.title(f"Page /{page}")
+            field = browser.form_field(browser.form(), "q")
+            assert field.value == f"changed {page}"
+    browser.close()
+
+
+def test_compact_and_limited_history():
+    browser = TwillBrowser(app=app)
+    with new_context(browser):
+        commands.config("history_limit", "5")
+        for page in range(1, 5):
+            commands.go(f"http://twill.test/{page}")
+        commands.fv("1", "q", "changed")
+        commands.go("http://twill.test/5")
+        commands.go("http://twill.test/6")
+        history = browser.history
+        assert [page.url for page in history] == [
+            f"http://twill.test/{page}" for page in range(1, 6)
+        ]
+        assert [page.is_compact for page in history] == [
+            True,
+            True,
+            True,
+            True,
+            False,
+        ]
+        assert history[0].http_code == 200
+        assert history[0].is_compact
+        commands.back()
+        commands.back()
+        commands.title("Page /4")
+        result = browser.result
+        assert result is not None
+        assert not result.is_compact
+        assert result.encoding == "utf-8"
+        assert "content-encoding" not in browser.response_headers
+        field = browser.form_field(browser.form(), "q")
+        assert field.value == "/4"  # the changed value has been lost
+        commands.config("history_limit", "2")
+        commands.go("http://twill.test/7")
+        commands.go("http://twill.test/8")
+        assert [page.url for page in browser.history] == [
+            "http://twill.test/4",
+            "http://twill.test/7",
+        ]
+        commands.back()
+        commands.back()
+        commands.title("Page /4")
+        commands.back()
+        commands.title("Page /4")
+    browser.close()
@@ -0,0 +1,62 @@
+import pytest
+
+from twill import commands, new_context
+from twill.errors import TwillAssertionError, TwillException
+
+from .utils import execute_script
+
+
+def test(url: str):
+    with new_context():
+        execute_script("test_budgets.twill", initial_url=url)
+
+
+def test_assertions_fail(url: str):
+    with new_context() as browser:
+        with pytest.raises(TwillAssertionError, match="not viewing any page"):
+            commands.max_time("1000")
+        commands.go(url + "logout")
+        result = browser.result
+        assert result.redirects == 1
+        assert result.size >= len(result.content)
+        assert result.total_time >= result.timings[-1].total > 0
+        with pytest.raises(TwillAssertionError, match=r"page load took \d+"):
+            commands.max_time("0")
+        with pytest.raises(TwillAssertionError, match=r"last request took"):
+            commands.max_time("0", "last")
+        with pytest.raises(TwillException, match="can check 'all' or 'last'"):
+            commands.max_time("1000", "first")
+        with pytest.raises(
+            TwillAssertionError, match=r"page size is \d+ > 10 bytes"
+        ):
+            commands.max_size("10")
+        with pytest.raises(
+            TwillAssertionError, match="page was redirected 1 > 0 times"
+        ):
+            commands.max_redirects("0")
+
+
+def test_budgets_fail(url: str):
+    with new_context() as browser:
+        commands.config("max_size", "10")
+        with pytest.raises(TwillAssertionError, match="page size is"):
+            commands.go(url)
+        # the page is still available for inspection
+        assert browser.url == url
+        commands.config("max_size", "0")
+        commands.config("max_redirects", "1")
+        commands.config("equiv_refresh_interval", "3")
+        commands.go("/test_refresh")
+        assert browser.url == url + "login"
+        commands.max_redirects("1")
+        with pytest.raises(TwillAssertionError, match="redirected 1 > 0"):
+            commands.max_redirects("0")
+        commands.config("max_redirects", "0")
+        with pytest.raises(TwillAssertionError, match="redirected 1 > 0"):
+            commands.go("/logout")
+        commands.max_redirects("-1")
+        commands.config("max_redirects", "-1")
+        commands.go("/logout")
+        commands.config("max_time", "1")
+        with pytest.raises(TwillAssertionError, match="page load took"):
+            commands.go("/sleep")
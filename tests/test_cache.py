@@ -0,0 +1,247 @@
+"""Test the HTTP cache of the browser."""
+
+import asyncio
+import json
+from email.utils import formatdate
+from pathlib import Path
+from time import time
+from typing import Any, Callable, Iterable, List
+
+import pytest
+from httpx import Client, MockTransport, Request, Response
+
+from twill import commands, new_context
+from twill.browser import AsyncTwillBrowser, TwillBrowser
+from twill.cache import (
+    CachedResponse,
+    CacheTransport,
+    HttpCache,
+    cache_status,
+)
+from twill.errors import TwillException
+
+LAST_MODIFIED = formatdate(time() - 3600, usegmt=True)
+
+requests: List[Request] = []  # all requests that reached the server
+
+
+def handler(request: Request) -> Response:  # noqa: PLR0911
+    """Answer requests with various cache headers."""
+    requests.append(request)
+    path = request.url.path
+    if request.method == "POST":
+        return Response(303, headers={"Location": "/fresh"})
+    if path == "/fresh":
+        headers = {"Cache-Control": "max-age=60", "ETag": '"fresh"'}
+        return Response(200, headers=headers, text="fresh")
+    if path == "/etag":
+        headers = {"Cache-Control": "no-cache", "ETag": '"v1"'}
+        if request.headers.get("If-None-Match") == '"v1"':
+            return Response(304, headers={**headers, "X-Checked": "yes"})
+        return Response(200, headers=headers, text="etag")
+    if path == "/modified":
+        headers = {
+            "Cache-Control": "max-age=0",
+            "Last-Modified": LAST_MODIFIED,
+        }
+        if request.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            return Response(304, headers=headers)
+        return Response(200, headers=headers, text="modified")
+    if path == "/heuristic":
+        headers = {"Last-Modified": LAST_MODIFIED}
+        return Response(200, headers=headers, text="heuristic")
+    if path == "/vary":
+        headers = {"Cache-Control": "max-age=60", "Vary": "Accept-Language"}
+        language = request.headers.get("Accept-Language")
+        return Response(200, headers=headers, text=f"vary {language}")
+    if path == "/private":
+        headers = {"Cache-Control": "private, max-age=60"}
+        return Response(200, headers=headers, text="private")
+    if path == "/cookie":
+        headers = {"Cache-Control": "max-age=60", "Set-Cookie": "user=john"}
+        return Response(200, headers=headers, text="cookie")
+    if path == "/redirect":
+        headers = {"Cache-Control": "max-age=60", "Location": "/fresh"}
+        return Response(301, headers=headers)
+    headers = {"Cache-Control": "no-store", "ETag": '"never"'}
+    return Response(200, headers=headers, text="never")
+
+
+@pytest.fixture
+def client() -> Iterable[Client]:
+    """Get a client using an HTTP cache."""
+    requests.clear()
+    transport = CacheTransport(MockTransport(handler), HttpCache())
+    with Client(base_url="http://twill.test", transport=transport) as client:
+        yield client
+
+
+def test_fresh_responses_are_served_from_cache(client: Client):
+    response = client.get("/fresh")
+    assert response.text == "fresh"
+    assert cache_status(response) is None
+    response = client.get("/fresh")
+    assert response.text == "fresh"
+    assert cache_status(response) == "hit"
+    assert response.headers["Age"] == "0"
+    assert len(requests) == 1
+    response = client.get("/fresh", headers={"Cache-Control": "no-cache"})
+    assert cache_status(response) is None
+    assert requests[-1].headers["If-None-Match"] == '"fresh"'
+    assert len(requests) == 2
+
+
+def test_stale_responses_are_revalidated(client: Client):
+    assert client.get("/etag").text == "etag"
+    response = client.get("/etag")
+    assert response.status_code == 200
+    assert response.text == "etag"
+    assert cache_status(response) == "revalidated"
+    assert response.headers["X-Checked"] == "yes"
+    assert requests[-1].headers["If-None-Match"] == '"v1"'
+    assert client.get("/modified").text == "modified"
+    response = client.get("/modified")
+    assert response.text == "modified"
+    assert cache_status(response) == "revalidated"
+    assert requests[-1].headers["If-Modified-Since"] == LAST_MODIFIED
+    assert len(requests) == 4
+
+
+def test_heuristic_freshness_and_no_store(client: Client):
+    client.get("/heuristic")
+    assert cache_status(client.get("/heuristic")) == "hit"
+    client.get("/never")
+    response = client.get("/never")
+    assert cache_status(response) is None
+    assert "If-None-Match" not in requests[-1].headers
+    assert len(requests) == 3
+
+
+def test_private_responses_are_not_stored(client: Client):
+    for path in "/private", "/cookie":
+        client.get(path)
+        assert cache_status(client.get(path)) is None
+    assert len(requests) == 4
+
+
+def test_vary_redirects_and_invalidation(client: Client):
+    german = {"Accept-Language": "de"}
+    assert client.get("/vary", headers=german).text == "vary de"
+    assert cache_status(client.get("/vary", headers=german)) == "hit"
+    assert client.get("/vary").text == "vary None"
+    assert len(requests) == 2
+    response = client.get("/redirect", follow_redirects=True)
+    assert response.text == "fresh"
+    response = client.get("/redirect", follow_redirects=True)
+    assert cache_status(response) == "hit"
+    assert cache_status(response.history[0]) == "hit"
+    assert len(requests) == 4
+    client.post("/fresh")
+    assert cache_status(client.get("/fresh")) is None
+    assert cache_status(client.get("/fresh")) == "hit"
+    client.post("/form")  # redirects to /fresh
+    assert cache_status(client.get("/fresh")) is None
+    assert len(requests) == 8
+
+
+def test_size_limit_and_disk(tmp_path: Path):
+    cache = HttpCache(max_size=8, directory=tmp_path)
+    transport = CacheTransport(MockTransport(handler), cache)
+    with Client(base_url="http://twill.test", transport=transport) as client:
+        client.get("/fresh")
+        client.get("/etag")
+        assert len(cache) == 1  # the first response has been evicted
+        assert cache.size == 4
+        assert len(list(tmp_path.glob("*.cache"))) == 2
+        assert cache_status(client.get("/fresh")) == "hit"
+    cache = HttpCache(directory=tmp_path)
+    transport = CacheTransport(MockTransport(handler), cache)
+    with Client(base_url="http://twill.test", transport=transport) as client:
+        assert cache_status(client.get("/fresh")) == "hit"
+    for path in tmp_path.glob("*.cache"):
+        data = json.loads(path.read_text(encoding="utf-8"))
+        assert data["url"].startswith("http://twill.test/")
+        path.write_bytes(b"garbage")
+    cache = HttpCache(directory=tmp_path)
+    transport = CacheTransport(MockTransport(handler), cache)
+    with Client(base_url="http://twill.test", transport=transport) as client:
+        assert cache_status(client.get("/fresh")) is None  # file ignored
+        assert cache_status(client.get("/fresh")) == "hit"
+    cache.clear()
+    assert not list(tmp_path.glob("*.cache"))
+
+
+def test_serialize_cached_response():
+    cached = CachedResponse(
+        "http://twill.test/",
+        200,
+        [("Content-Encoding", "gzip")],
+        bytes(range(256)),
+        1.5,
+        2.5,
+        (("accept", "text/html"), ("cookie", None)),
+    )
+    assert CachedResponse.from_json(cached.to_json()) == cached
+
+
+def app(environ: Any, start_response: Callable) -> List[bytes]:
+    """Answer with a cacheable page."""
+    requests.append(Request("GET", "http://twill.test" + environ["PATH_INFO"]))
+    start_response(
+        "200 OK",
+        [("Content-Type", "text/html"), ("Cache-Control", "max-age=60")],
+    )
+    return [b"<title>Cached</title>"]
+
+
+def test_browser_cache(caplog: pytest.LogCaptureFixture):
+    requests.clear()
+    browser = TwillBrowser(app=app)
+    with new_context(browser):
+        assert browser.cache is None
+        commands.cache()
+        assert "The HTTP cache is disabled." in caplog.text
+        commands.cache("on")
+        cache = browser.cache
+        assert isinstance(cache, HttpCache)
+        for _ in range(3):
+            commands.go("http://twill.test/page")
+            assert browser.title == "Cached"
+        assert len(requests) == 1
+        timing = browser.timings[0]
+        assert timing.cache == "hit"
+        assert timing.response_bytes == 0
+        assert str(timing).endswith(" (cache hit)")
+        commands.reset_browser()
+        assert browser.cache is cache
+        commands.go("http://twill.test/page")
+        assert len(requests) == 1
+        caplog.clear()
+        commands.cache()
+        assert "holds 1 response(s) with 21 bytes" in caplog.text
+        assert "Hits: 3, revalidated: 0, misses: 1." in caplog.text
+        commands.cache("clear")
+        assert not cache
+        commands.cache("off")
+        assert browser.cache is None
+        with pytest.raises(TwillException, match="Unknown cache action"):
+            commands.cache("maybe")
+    browser.close()
+
+
+def test_async_browser_cache():
+    async def run() -> None:
+        requests.clear()
+        transport = MockTransport(handler)
+        async with AsyncTwillBrowser(transport=transport) as browser:
+            browser.cache = HttpCache()
+            await browser.go("http://twill.test/fresh")
+            await browser.go("http://twill.test/etag")
+            await browser.go("http://twill.test/fresh")
+            assert browser.timings[0].cache == "hit"
+            await browser.go("http://twill.test/etag")
+            assert browser.timings[0].cache == "revalidated"
+            assert browser.html == "etag"
+            assert len(requests) == 3
+
+    asyncio.run(run())
@@ -0,0 +1,173 @@
+"""Test recording and replaying of requests."""
+
+import asyncio
+import gzip
+import sys
+from pathlib import Path
+from typing import Any, Callable, List
+
+import pytest
+from httpx import MockTransport, Request, Response
+
+from twill import browser as global_browser
+from twill import commands, execute_file, fork, new_context
+from twill.browser import AsyncTwillBrowser, TwillBrowser
+from twill.cassette import Cassette, Exchange
+from twill.errors import TwillException
+
+from .utils import test_dir
+
+calls: List[str] = []  # the paths requested from the app
+
+
+def app(environ: Any, start_response: Callable) -> List[bytes]:
+    """Answer with a counter, a form and a binary image."""
+    path = environ["PATH_INFO"]
+    calls.append(path)
+    if path == "/image":
+        start_response("200 OK", [("Content-Type", "image/png")])
+        return [bytes(range(256))]
+    if path == "/old":
+        start_response("302 Found", [("Location", "/")])
+        return [b""]
+    if environ["REQUEST_METHOD"] == "POST":
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(length).decode()
+        start_response("200 OK", [("Content-Type", "text/html")])
+        return [f"<title>Posted {body}</title>".encode()]
+    start_response("200 OK", [("Content-Type", "text/html")])
+    return [
+        f"<title>Visit {len(calls)}</title>"
+        '<form method="post" action="/submit">'
+        '<input name="q"><input type="submit"></form>'.encode()
+    ]
+
+
+def test_record_and_replay(tmp_path: Path):
+    cassette_file = tmp_path / "session.cassette"
+    calls.clear()
+    browser = TwillBrowser(app=app)
+    with new_context(browser):
+        commands.record(str(cassette_file))
+        commands.go("http://twill.test/old")
+        commands.title("Visit 2")
+        commands.go("http://twill.test/")
+        commands.title("Visit 3")
+        commands.fv("1", "q", "twill")
+        commands.submit()
+        commands.title("Posted q=twill")
+        commands.go("http://twill.test/image")
+        assert browser.code == 200
+        commands.record("off")
+        assert browser.cassette is None
+        assert len(calls) == 5
+
+        with gzip.open(cassette_file, "rt") as f:
+            assert len(f.readlines()) == 5
+        exchanges = Cassette.read(cassette_file)
+        statuses = [exchange.status for exchange in exchanges]
+        assert statuses == [302, 200, 200, 200, 200]
+        assert exchanges[-1].content == bytes(range(256))
+
+        commands.replay(str(cassette_file))
+        commands.reset_browser()
+        assert isinstance(browser.cassette, Cassette)
+        for visit in 2, 3, 2:  # the responses are replayed in a cycle
+            commands.go("http://twill.test/")
+            commands.title(f"Visit {visit}")
+        commands.go("http://twill.test/old")
+        commands.url("http://twill.test/")
+        commands.fv("1", "q", "twill")
+        commands.submit()
+        commands.title("Posted q=twill")
+        commands.go("http://twill.test/image")
+        assert browser.response_headers["content-type"] == "image/png"
+        with pytest.raises(TwillException, match="cannot go to"):
+            commands.go("http://twill.test/unknown")
+        assert len(calls) == 5  # nothing has been sent to the app
+        commands.replay("off")
+        with pytest.raises(TwillException, match="Cannot replay cassette"):
+            commands.replay(str(tmp_path / "missing"))
+    browser.close()
+
+
+def test_replay_matches_request_bodies():
+    def handler(request: Request) -> Response:
+        return Response(200, text=request.content.decode())
+
+    cassette = Cassette()
+    transport = MockTransport(handler)
+
+    async def run() -> None:
+        async with AsyncTwillBrowser(transport=transport) as browser:
+            browser.cassette = cassette
+            for body in "a", "b":
+                await browser._client.post(  # noqa: SLF001
+                    "http://twill.test/", content=body
+                )
+            assert len(cassette) == 2
+            cassette.replaying = True
+            for body in "b", "b", "a":
+                response = await browser._client.post(  # noqa: SLF001
+                    "http://twill.test/", content=body
+                )
+                assert response.text == body
+
+    asyncio.run(run())
+
+
+@pytest.mark.skipif(
+    sys.platform == "win32", reason="forking is not possible on Windows"
+)
+def test_fork_with_replay(
+    url: str, tmp_path: Path, capsys: pytest.CaptureFixture
+):
+    cassette_file = tmp_path / "go.cassette"
+    script = str(Path(test_dir, "test_go.twill"))
+    global_browser.cassette = Cassette(cassette_file)
+    try:
+        execute_file(script, initial_url=url)
+    finally:
+        global_browser.cassette = None
+    options = ["-n", "4", "-p", "2", "--replay", str(cassette_file)]
+    with pytest.raises(SystemExit) as exit_info:
+        fork.main([*options, "-u", url, script])
+    assert exit_info.value.code == 0
+    out = capsys.readouterr().out
+    assert "total executed: 4" in out
+    assert "errors: 0" in out
+    with pytest.raises(SystemExit) as exit_info:
+        fork.main(["--replay", str(tmp_path / "missing"), script])
+    assert exit_info.value.code == 2
+    assert "cannot replay cassette: " in capsys.readouterr().err
+
+
+@pytest.mark.skipif(
+    sys.platform == "win32", reason="forking is not possible on Windows"
+)
+def test_fork_with_app_and_replay(
+    tmp_path: Path, capsys: pytest.CaptureFixture
+):
+    cassette_file = tmp_path / "page.cassette"
+    headers = [("content-type", "text/html")]
+    exchange = Exchange(
+        "GET",
+        "http://twill.test/page",
+        "",
+        200,
+        headers,
+        b"<title>Replayed</title>",
+    )
+    Cassette(exchanges=[exchange]).save(cassette_file)
+    script = tmp_path / "page.twill"
+    script.write_text(
+        "go http://twill.test/page\ntitle Replayed\n", encoding="utf-8"
+    )
+    options = ["-n", "2", "-p", "1", "--app", "tests.test_asgi:asgi_app"]
+    options += ["--replay", str(cassette_file)]
+    with pytest.raises(SystemExit) as exit_info:
+        fork.main([*options, str(script)])
+    assert exit_info.value.code == 0
+    out = capsys.readouterr().out
+    assert "total executed: 2" in out
+    assert "errors: 0" in out
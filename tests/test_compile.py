@@ -0,0 +1,160 @@
+"""Test compiling twill scripts and caching the compiled scripts."""
+
+import sys
+from io import StringIO
+from pathlib import Path
+from typing import Iterator, NoReturn, TextIO
+
+import pytest
+
+from twill import execute_file, namespaces, parse
+
+SCRIPT = """\
+# set and echo some variables
+setlocal name world
+echo "hello ${name}" 'line\\nbreak'
+echo __name $name plain
+"""
+
+
+def test_compile_line():
+    compiled = parse.compile_line(3, "echo 'a\\nb' c  # comment")
+    assert compiled.command == "echo"
+    assert compiled.arguments == ("a\\nb", "c")
+    assert compiled.static == ("a\nb", "c")
+    assert compiled.error is None
+    for arg in "${name}", "__name", "$name":
+        compiled = parse.compile_line(1, f"echo x {arg}")
+        assert compiled.arguments == ("x", arg)
+        assert compiled.static is None
+    compiled = parse.compile_line(2, "# just a comment")
+    assert compiled.command is None
+    assert compiled.error is None
+    compiled = parse.compile_line(4, "!echo")
+    assert compiled.command is None
+    assert compiled.error
+
+
+@pytest.fixture
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """Use a temporary user cache directory for the parse cache."""
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    return tmp_path / "cache" / "twill"
+
+
+def test_compile_file(
+    tmp_path: Path, cache_dir: Path, monkeypatch: pytest.MonkeyPatch
+):
+    script = tmp_path / "script.twill"
+    script.write_text(SCRIPT, encoding="utf-8")
+    parse.clear_compiled_files()
+    lines = parse.compile_file(str(script))
+    assert [line.line_no for line in lines] == [1, 2, 3, 4]
+    assert [line.command for line in lines] == [
+        None,
+        "setlocal",
+        "echo",
+        "echo",
+    ]
+    assert parse.compile_file(str(script)) is lines
+    assert parse.get_cache_dir() == cache_dir
+    [cache_file] = cache_dir.iterdir()
+    assert cache_file.name.startswith("script.twill-")
+    assert cache_file.suffix == parse.CACHE_SUFFIX
+    assert sorted(tmp_path.iterdir()) == [tmp_path / "cache", script]
+
+    def fail(_inp: TextIO) -> NoReturn:
+        raise AssertionError("script should not be parsed")
+
+    with monkeypatch.context() as m:
+        m.setattr(parse, "compile_script", fail)
+        parse.clear_compiled_files()
+        assert parse.compile_file(str(script)) == lines  # read from disk
+
+    script.write_text(SCRIPT + "echo more\n", encoding="utf-8")
+    lines = parse.compile_file(str(script))
+    assert len(lines) == 5
+    parse.clear_compiled_files()
+    assert parse.compile_file(str(script)) == lines
+
+    cache_file.write_bytes(b"garbage")
+    parse.clear_compiled_files()
+    assert parse.compile_file(str(script)) == lines
+    assert cache_file.read_bytes() != b"garbage"
+
+    cache_file.unlink()
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+    parse.clear_compiled_files()
+    assert parse.compile_file(str(script)) == lines
+    assert not cache_file.exists()
+
+
+def test_compile_files_with_same_name(tmp_path: Path, cache_dir: Path):
+    scripts = [tmp_path / name / "script.twill" for name in ("a", "b")]
+    for script in scripts:
+        script.parent.mkdir()
+        script.write_text(f"echo {script.parent.name}\n", encoding="utf-8")
+    for _ in range(2):
+        parse.clear_compiled_files()
+        for script in scripts:
+            [line] = parse.compile_file(str(script))
+            assert line.static == (script.parent.name,)
+    assert len(list(cache_dir.iterdir())) == 2
+
+
+def test_compile_file_with_unwritable_cache(
+    tmp_path: Path, cache_dir: Path, caplog: pytest.LogCaptureFixture
+):
+    cache_dir.parent.write_text("not a directory")
+    script = tmp_path / "script.twill"
+    script.write_text(SCRIPT, encoding="utf-8")
+    parse.clear_compiled_files()
+    caplog.set_level("WARNING")
+    assert len(parse.compile_file(str(script))) == 4
+    assert not caplog.records
+
+
+def test_compiled_files_in_memory_are_bounded(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(sys, "dont_write_bytecode", True)
+    monkeypatch.setattr(parse, "MAX_COMPILED_FILES", 2)
+    parse.clear_compiled_files()
+    scripts = [str(tmp_path / f"script{i}.twill") for i in range(3)]
+    for script in scripts:
+        Path(script).write_text(SCRIPT, encoding="utf-8")
+    compiled = [parse.compile_file(script) for script in scripts[:2]]
+    assert parse.compile_file(scripts[0]) is compiled[0]  # recently used
+    parse.compile_file(scripts[2])
+    assert parse.compile_file(scripts[0]) is compiled[0]
+    assert parse.compile_file(scripts[1]) is not compiled[1]  # evicted
+
+
+def test_execute_compiled_file(tmp_path: Path, output: StringIO):
+    script = tmp_path / "script.twill"
+    script.write_text(SCRIPT, encoding="utf-8")
+    namespaces.new_local_dict()
+    for _ in range(2):
+        execute_file(str(script), no_reset=True)
+        out = output.getvalue()
+        output.truncate(0)
+        output.seek(0)
+        assert "hello world line\nbreak" in out
+        assert "__name world plain" in out
+    namespaces.pop_local_dict()
+
+
+def test_execute_stdin_line_by_line(
+    monkeypatch: pytest.MonkeyPatch, output: StringIO, cache_dir: Path
+):
+    def read_lines() -> Iterator[str]:
+        yield "echo first\n"
+        # the first line must have been executed before reading more
+        assert "first" in output.getvalue()
+        yield "echo second\n"
+
+    monkeypatch.setattr(sys, "stdin", read_lines())
+    execute_file("-", no_reset=True)
+    assert "first\nAT LINE: -:2\nsecond\n" in output.getvalue()
+    assert not cache_dir.exists()
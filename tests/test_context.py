@@ -0,0 +1,65 @@
+"""Test running twill scripts in separate contexts."""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+
+from twill import browser, commands, execute_string, namespaces, new_context
+from twill.browser import TwillBrowser, get_browser
+from twill.parse import command_list
+
+login_script = """
+go /login
+setlocal user user{n}
+fv 1 username $user
+config require_tidy {tidy}
+submit
+find "You are logged in as user{n}"
+setglobal user $user
+"""
+
+
+def login(url: str, n: int) -> Tuple[str, bool, str]:
+    """Log in with a separate browser and return the state afterwards."""
+    with new_context() as own_browser:
+        assert get_browser() is own_browser
+        execute_string(login_script.format(n=n, tidy=n % 2), initial_url=url)
+        return (
+            own_browser.html,
+            commands.options["require_tidy"],
+            namespaces.get_twill_glocals()[0]["user"],
+        )
+
+
+def test_scripts_in_threads(url: str):
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(login, [url] * 8, range(8)))
+    for n, (html, require_tidy, user) in enumerate(results):
+        assert f"You are logged in as user{n}" in html
+        assert require_tidy is bool(n % 2)
+        assert user == f"user{n}"
+    # the global browser, options and namespaces have not been touched
+    assert not commands.options["require_tidy"]
+    assert "user" not in namespaces.get_twill_glocals()[0]
+    assert "You are logged in as user" not in (browser.html or "")
+
+
+def test_new_context_restores_state():
+    global_browser = get_browser()
+    own_browser = TwillBrowser()
+    with new_context(own_browser) as current_browser:
+        assert current_browser is own_browser
+        assert isinstance(browser, TwillBrowser)
+        assert get_browser() is own_browser
+        commands.config("require_tidy", "1")
+        commands.setglobal("answer", "42")
+        command_list.append("my_command")
+        assert commands.options["require_tidy"]
+        assert namespaces.get_twill_glocals()[0]["answer"] == "42"
+        assert "my_command" in command_list
+    assert get_browser() is global_browser
+    assert not commands.options["require_tidy"]
+    assert "answer" not in namespaces.get_twill_glocals()[0]
+    assert "my_command" not in command_list
+    # a browser that has been passed explicitly is not closed
+    assert own_browser.agent_string
+    own_browser.close()
@@ -1,5 +1,33 @@
+from httpx import Request, Response
+
+from twill.browser import TwillBrowser
+from twill.utils import ResultWrapper
+
 from .utils import execute_script
 
 
 def test(url: str):
     execute_script("test_equiv_refresh.twill", initial_url=url)
+
+
+def test_pages_without_refresh_are_not_parsed():
+    result = ResultWrapper(Response(200, html="<p>No refresh here.</p>"))
+    assert TwillBrowser._get_meta_refresh(result) == (None, None)  # noqa: SLF001
+    assert result._tree is None  # noqa: SLF001
+
+
+def test_refresh_detection_parses_only_once():
+    result = ResultWrapper(
+        Response(
+            200,
+            html='<meta http-equiv="refresh" content="1; url=/login">',
+            request=Request("GET", "http://localhost/"),
+        )
+    )
+    assert TwillBrowser._get_meta_refresh(result) == (  # noqa: SLF001
+        1,
+        "http://localhost/login",
+    )
+    tree = result.tree
+    assert TwillBrowser._get_meta_refresh(result)[0] == 1  # noqa: SLF001
+    assert result.tree is tree
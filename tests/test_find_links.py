@@ -1,6 +1,11 @@
+import re
+
+import pytest
+from httpx import Response
+
 import twill
 from twill import commands
-from twill.utils import Link
+from twill.utils import Link, ResultWrapper
 
 
 def test(url: str):
@@ -54,3 +59,21 @@ def test(url: str):
     links = browser.find_links(".*")
     assert all(isinstance(link, Link) for link in links)
     assert len(links) == 5
+
+
+def test_link_index():
+    html = "".join(f'<a href="/page/{n}">Page {n}</a>' for n in range(1, 1001))
+    result = ResultWrapper(Response(200, html=html))
+    links = result.links
+    assert len(links) == 1000
+    assert result.links == links
+    assert result.links is not links  # callers get their own copy
+    assert result.find_link("/page/1") == ("Page 1", "/page/1")
+    assert result.find_link("Page 500") == ("Page 500", "/page/500")
+    assert result.find_link(r"Page 5\d\d$") == ("Page 500", "/page/500")
+    assert result.find_link("Page 1001") is None
+    assert len(result.find_links("/page/99")) == 11
+    assert len(result.find_links("Page 99")) == 11
+    assert len(result.find_links("e 99$")) == 1
+    with pytest.raises(re.error):
+        result.find_link("Page (")
@@ -0,0 +1,162 @@
+"""Test the twill-fork script."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+from twill import fork
+
+from .utils import test_dir
+
+pytestmark = pytest.mark.skipif(
+    sys.platform == "win32", reason="forking is not possible on Windows"
+)
+
+
+def test_fork(url: str, capsys: pytest.CaptureFixture):
+    script = str(Path(test_dir, "test_go.twill"))
+    with pytest.raises(SystemExit) as exit_info:
+        fork.main(["-n", "5", "-p", "2", "-u", url, script])
+    assert exit_info.value.code == 0
+    out = capsys.readouterr().out
+    assert "number of processes: 2" in out
+    assert "total executed: 5" in out
+    assert "errors: 0" in out
+    assert "average time:" in out
+    assert " executions/s, " in out
+    assert "execution time: mean " in out
+    assert "request time: mean " in out
+    assert ", p99 " in out
+
+
+def test_fork_with_errors(url: str, capsys: pytest.CaptureFixture):
+    script = str(Path(test_dir, "test_go_fail.twill"))
+    with pytest.raises(SystemExit) as exit_info:
+        fork.main(["-n", "3", "-p", "3", "-u", url, script])
+    assert exit_info.value.code == -1
+    out = capsys.readouterr().out
+    assert "total executed: 3" in out
+    assert "errors: 3" in out
+    assert "first error: no match to 'not here'" in out
+
+
+def test_fork_with_rate(url: str, capsys: pytest.CaptureFixture):
+    script = str(Path(test_dir, "test_go.twill"))
+    options = ["-r", "20", "-d", "0.5", "-p", "2", "-i", "0.25"]
+    with pytest.raises(SystemExit) as exit_info:
+        fork.main([*options, "-u", url, script])
+    assert exit_info.value.code == 0
+    out = capsys.readouterr().out
+    assert "target rate: 20 runs/s (constant profile)" in out
+    assert "total executed: 10" in out
+    assert "[twill-fork: 0.25 s: " in out
+    assert "latency from scheduled start: mean " in out
+
+
+def test_fork_with_duration(url: str, capsys: pytest.CaptureFixture):
+    script = str(Path(test_dir, "test_go.twill"))
+    options = ["-d", "0.3", "--ramp-up", "0.1", "-p", "2"]
+    with pytest.raises(SystemExit) as exit_info:
+        fork.main([*options, "-u", url, script])
+    assert exit_info.value.code == 0
+    out = capsys.readouterr().out
+    assert "total executed: " in out
+    assert "total executed: 0" not in out
+    assert "target rate" not in out
+
+
+def test_fork_profile_needs_rate(capsys: pytest.CaptureFixture):
+    with pytest.raises(SystemExit) as exit_info:
+        fork.main(["--profile", "spike", "script"])
+    assert exit_info.value.code == 2
+    assert "load profiles can only be used with a rate" in (
+        capsys.readouterr().err
+    )
+
+
+def test_fork_with_scenarios(
+    url: str, tmp_path: Path, capsys: pytest.CaptureFixture
+):
+    scenario_file = tmp_path / "scenarios"
+    scenario_file.write_text(
+        f"3 0 {Path(test_dir, 'test_go.twill')} go\n"
+        f"1 0-0.01 {Path(test_dir, 'test_go_fail.twill')} fail\n"
+        f"0 0 {Path(test_dir, 'test_back.twill')} back\n"
+    )
+    options = ["-n", "20", "-p", "2", "-s", str(scenario_file)]
+    with pytest.raises(SystemExit) as exit_info:
+        fork.main([*options, "-u", url])
+    out = capsys.readouterr().out
+    assert "total executed: 20" in out
+    assert "\nscenarios:\n" in out
+    assert "\nback: 0 runs\n" in out
+    lines = out.splitlines()
+    go = next(line for line in lines if line.startswith("go: "))
+    fail = next(line for line in lines if line.startswith("fail: "))
+    go_runs = int(go.split()[1])
+    fail_runs = int(fail.split()[1])
+    assert go_runs + fail_runs == 20
+    assert ", 0 errors, execution time mean " in go
+    assert f", {fail_runs} errors, " in fail
+    assert exit_info.value.code == (-1 if fail_runs else 0)
+
+
+def test_fork_scripts_or_scenarios(capsys: pytest.CaptureFixture):
+    for args in [], ["-s", "scenarios", "script"], ["-s", "missing"]:
+        with pytest.raises(SystemExit) as exit_info:
+            fork.main(args)
+        assert exit_info.value.code == 2
+    err = capsys.readouterr().err
+    assert "no scripts or scenarios have been given" in err
+    assert "scripts cannot be given together with scenarios" in err
+    assert "cannot use scenarios: " in err
+
+
+def test_fork_with_timers(url: str, capsys: pytest.CaptureFixture):
+    script = str(Path(test_dir, "test_timers.twill"))
+    with pytest.raises(SystemExit) as exit_info:
+        fork.main(["-n", "3", "-p", "2", "-u", url, script])
+    assert exit_info.value.code == 0
+    out = capsys.readouterr().out
+    assert "total executed: 3" in out
+    assert "\ntransaction timers:\necho: 6 measured, mean " in out
+    assert "\nlogin: 3 measured, mean " in out
+
+
+def test_fork_with_wsgi_app(capsys: pytest.CaptureFixture):
+    script = str(Path(test_dir, "test_go.twill"))
+    options = ["-n", "4", "-p", "2", "--app", "tests.server:app"]
+    with pytest.raises(SystemExit) as exit_info:
+        fork.main([*options, "-u", "http://twill.test/", script])
+    assert exit_info.value.code == 0
+    out = capsys.readouterr().out
+    assert "total executed: 4" in out
+    assert "errors: 0" in out
+    assert "request time: mean " in out
+
+
+def test_fork_with_asgi_app(tmp_path: Path, capsys: pytest.CaptureFixture):
+    script = tmp_path / "asgi.twill"
+    script.write_text(
+        "timer_start page\ngo /page\ntitle 'GET /page'\ntimer_stop page\n"
+    )
+    options = ["-n", "3", "-p", "1", "--app", "tests.test_asgi:asgi_app"]
+    with pytest.raises(SystemExit) as exit_info:
+        fork.main([*options, "-u", "http://twill.test/", str(script)])
+    assert exit_info.value.code == 0
+    out = capsys.readouterr().out
+    assert "total executed: 3" in out
+    assert "errors: 0" in out
+    assert "\ntransaction timers:\npage: 3 measured, mean " in out
+
+
+def test_fork_app_errors(capsys: pytest.CaptureFixture):
+    for app in "tests.server", "tests.missing:app", "tests.server:missing":
+        with pytest.raises(SystemExit) as exit_info:
+            fork.main(["--app", app, "script"])
+        assert exit_info.value.code == 2
+    err = capsys.readouterr().err
+    assert "cannot load app: expected 'module:callable'" in err
+    assert "cannot load app: No module named 'tests.missing'" in err
+    assert "cannot load app: module 'tests.server' has no attribute" in err
@@ -1,8 +1,19 @@
 import pytest
+from httpx import Request, Response
 
 import twill
 from twill import commands, namespaces
+from twill.browser import TwillBrowser
 from twill.errors import TwillAssertionError, TwillException
+from twill.utils import (
+    CheckboxGroup,
+    RadioGroup,
+    ResultWrapper,
+    SelectElement,
+    option_index,
+    set_form_control_value,
+    set_form_control_values,
+)
 
 from .utils import execute_script
 
@@ -48,3 +59,88 @@ def test(url: str):
 
     # test the twill script.
     execute_script("test_form.twill", initial_url=url)
+
+
+def test_form_index():
+    fields = "".join(
+        f'<input name="field-{n}" id="id-{n}">' for n in range(1, 301)
+    )
+    html = (
+        f'<form>{fields}<input type="checkbox" name="box" value="a">'
+        '<input type="checkbox" name="box" value="b">'
+        '<input type="radio" name="choice" value="x">'
+        '<input type="radio" name="choice" value="y">'
+        '<input type="submit" name="go" value="Go"></form>'
+    )
+    request = Request("GET", "http://twill.test/")
+    result = ResultWrapper(Response(200, html=html, request=request))
+    form = result.form()
+    assert form is not None
+    index = result.form_index(form)
+    assert result.form_index(form) is index
+    assert len(index) == 305
+    assert index.by_name["field-2"] == index.by_id["id-2"]
+    assert index.fields[1] is index.by_name["field-2"][0]
+    boxes = index.group("box")
+    assert isinstance(boxes, CheckboxGroup)
+    assert index.group("box") is boxes
+    assert isinstance(index.group("choice"), RadioGroup)
+    assert index.group("field-1") is None
+    assert len(index.search(r"field-\d$")) == 9
+    assert index.search(r"field-\d$") is index.search(r"field-\d$")
+    assert index.with_value("Go") == index.by_name["go"]
+
+    browser = TwillBrowser()
+    browser.result = result
+    assert browser.form_index(form) is index
+    assert browser.form_field(form, "box") is boxes
+    assert browser.form_field(form, "id-7") is index.fields[6]
+    assert browser.form_field(form, "field-300") is index.fields[299]
+    assert browser.form_field(form, 3) is index.fields[2]
+    assert browser.form_field(form, "ld-299$") is index.fields[298]
+    assert browser.form_field(form, "Go") is index.by_name["go"][0]
+    with pytest.raises(TwillException, match="multiple matches"):
+        browser.form_field(form, r"field-1\d$")
+    with pytest.raises(TwillException, match="no field matches"):
+        browser.form_field(form, "missing")
+    result.compact()
+    form = result.form()
+    assert form is not None
+    assert result.form_index(form) is not index
+    browser.close()
+
+
+def test_option_index():
+    options = "".join(
+        f'<option value="c{n}">Country {n}</option>' for n in range(2000)
+    )
+    html = (
+        f'<form><select name="many" multiple>{options}</select>'
+        '<select name="one"><option>a</option><option>b</option></select>'
+        '<input type="checkbox" name="box" value="x">'
+        '<input type="checkbox" name="box" value="y"></form>'
+    )
+    result = ResultWrapper(Response(200, html=html))
+    form = result.form()
+    assert form is not None
+    index = result.form_index(form)
+    many = index.by_name["many"][0]
+    assert isinstance(many, SelectElement)
+    options_index = option_index(many)
+    assert option_index(many) is options_index
+    assert len(options_index) == 4000
+    set_form_control_values(many, ["c1", "Country 2", "+c3", "c4", "-c1"])
+    assert set(many.value) == {"c2", "c3", "c4"}
+    set_form_control_value(many, "-Country 3")
+    assert set(many.value) == {"c2", "c4"}
+    with pytest.raises(TwillException, match="invalid value"):
+        set_form_control_value(many, "c2000")
+    one = index.by_name["one"][0]
+    set_form_control_values(one, ["a", "b"])
+    assert one.value == "b"
+    boxes = index.group("box")
+    assert isinstance(boxes, CheckboxGroup)
+    set_form_control_values(boxes, ["x", "y", "-x", "-z"])
+    assert set(boxes.value) == {"y"}
+    with pytest.raises(KeyError):
+        set_form_control_value(boxes, "z")
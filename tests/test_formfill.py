@@ -1,6 +1,38 @@
+import pytest
+from httpx import Request, Response
+
+from twill import commands, new_context
+from twill.browser import TwillBrowser
+from twill.errors import TwillException
+from twill.extensions.formfill import fv_values
+from twill.utils import ResultWrapper
+
 from .utils import execute_script
 
 
 def test(url: str):
     """Test the 'formfill' extension stuff."""
     execute_script("test_formfill.twill", initial_url=url)
+
+
+def test_fv_values_like_fv():
+    """Test that 'fv_values' treats special fields like 'fv'."""
+    html = (
+        '<form><select name="ro" multiple readonly>'
+        "<option>a</option><option>b</option></select>"
+        '<input type="file" name="upload"></form>'
+    )
+    request = Request("GET", "http://twill.test/")
+    browser = TwillBrowser()
+    browser.result = ResultWrapper(Response(200, html=html, request=request))
+    with new_context(browser):
+        form = browser.form()
+        field = browser.form_field(form, "ro")
+        fv_values("1", "ro", "a", "b")
+        assert not field.value  # read-only fields are not changed
+        commands.config("readonly_controls_writeable", "1")
+        fv_values("1", "ro", "a", "b")
+        assert set(field.value) == {"a", "b"}
+        with pytest.raises(TwillException, match='use "form_file"'):
+            fv_values("1", "upload", "file.txt")
+    browser.close()
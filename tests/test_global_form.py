@@ -1,5 +1,9 @@
 from io import StringIO
 
+from httpx import Response
+
+from twill.utils import ResultWrapper
+
 from .utils import execute_script
 
 
@@ -9,3 +13,31 @@ def test(url: str, output: StringIO):
     assert "Form #1" in out
     assert "Form name=login (#2)" in out
     assert "Form name=login (#3)" in out
+
+
+def test_fix_forms():
+    html = (
+        '<input name="a" value="1">text<form name="f">'
+        '<button type="submit" name="b">B</button></form>'
+        '<p><input name="c" value="3"></p>'
+        '<button type="submit" name="d">D</button>'
+        '<form name="g"><input name="e"></form>'
+    )
+    result = ResultWrapper(Response(200, html=html))
+    forms = result.forms
+    assert [form.get("name") for form in forms] == [None, "f", "g"]
+    global_form = forms[0]
+    assert [field.name for field in global_form.inputs] == ["a", "c"]
+    assert global_form.form_values() == [("a", "1"), ("c", "3")]
+    assert [field.tag for field in forms[1].inputs] == ["input"]
+    tree = result.tree
+    assert tree is not None
+    # the stray fields have been copied, submit buttons have been converted
+    assert [field.get("name") for field in tree.iter("input")] == [
+        "a",
+        "b",
+        "c",
+        "d",
+        "e",
+    ]
+    assert global_form.getroottree().getroot() is global_form
@@ -0,0 +1,108 @@
+"""Test the load profiles and scenarios."""
+
+from pathlib import Path
+
+import pytest
+
+from twill.load import (
+    LoadProfile,
+    Scenario,
+    ScenarioMix,
+    Stage,
+    read_scenarios,
+)
+
+
+def test_constant_profile_with_ramp_up():
+    profile = LoadProfile.create("constant", 10, 2, ramp_up=1)
+    assert profile.stages == [Stage(1, 0, 10), Stage(2, 10, 10)]
+    assert profile.duration == 3
+    assert profile.total == 25
+    assert profile.rate_at(0.5) == 5
+    assert profile.rate_at(2) == 10
+    assert profile.rate_at(3) == 0
+    arrivals = list(profile.arrivals())
+    assert len(arrivals) == 25
+    assert arrivals[:2] == [0, pytest.approx(0.2**0.5)]
+    assert arrivals[4] == pytest.approx(0.894, abs=0.001)
+    assert arrivals[5] == pytest.approx(1)
+    assert arrivals[-1] == pytest.approx(2.9)
+    assert arrivals == sorted(arrivals)
+
+
+def test_step_and_spike_profiles():
+    step = LoadProfile.create("step", 8, 4)
+    assert [stage.start_rate for stage in step.stages] == [2, 4, 6, 8]
+    assert len(list(step.arrivals())) == step.total == 20
+    spike = LoadProfile.create("spike", 10, 10)
+    assert [stage.start_rate for stage in spike.stages] == [2, 10, 2]
+    assert spike.rate_at(5) == 10
+    assert spike.rate_at(1) == 2
+    assert len(list(spike.arrivals())) == spike.total == 28
+    soak = LoadProfile.create("soak", 1, 3)
+    assert list(soak.arrivals()) == [0, 1, 2]
+    with pytest.raises(ValueError, match="Unknown load profile"):
+        LoadProfile.create("random", 1, 1)
+    with pytest.raises(ValueError, match="must not be negative"):
+        LoadProfile([Stage(1, -1, 1)])
+
+
+def test_shared_arrivals():
+    profile = LoadProfile.create("spike", 20, 10, ramp_up=2)
+    arrivals = list(profile.arrivals())
+    shared = sorted(
+        arrival
+        for index in range(3)
+        for arrival in profile.arrivals(1 / 3, index / 3)
+    )
+    assert shared == pytest.approx(arrivals)
+
+
+def test_read_scenarios(tmp_path: Path):
+    scenario_file = tmp_path / "mix.txt"
+    scenario_file.write_text(
+        "# weight think time script\n"
+        "70 1-3 browse.twill\n"
+        "\n"
+        "  25 0.5 search.twill\n"
+        "5 0 sub/checkout.twill buy\n"
+    )
+    scenarios = read_scenarios(str(scenario_file))
+    assert scenarios == [
+        Scenario("browse", (str(tmp_path / "browse.twill"),), 70, (1, 3)),
+        Scenario("search", (str(tmp_path / "search.twill"),), 25, (0.5, 0.5)),
+        Scenario("buy", (str(tmp_path / "sub/checkout.twill"),), 5, (0, 0)),
+    ]
+    for text, message in (
+        ("70 browse.twill\n", "expected weight"),
+        ("x 1 browse.twill\n", "could not convert"),
+        ("1 3-1 browse.twill\n", "invalid think time"),
+        (
+            "1 0 browse.twill\n2 0 sub/browse.twill\n",
+            "mix.txt:2: duplicate scenario name 'browse'",
+        ),
+    ):
+        scenario_file.write_text(text)
+        with pytest.raises(ValueError, match=message):
+            read_scenarios(str(scenario_file))
+
+
+def test_scenario_mix():
+    scenarios = [
+        Scenario("browse", ("browse.twill",), 7, (1, 3)),
+        Scenario("search", ("search.twill",), 3),
+        Scenario("never", ("never.twill",), 0),
+    ]
+    mix = ScenarioMix(scenarios, seed=42)
+    chosen = [mix.choose().name for _ in range(1000)]
+    assert "never" not in chosen
+    assert 650 < chosen.count("browse") < 750
+    think_times = [mix.think_time(scenarios[0]) for _ in range(100)]
+    assert all(1 <= think_time <= 3 for think_time in think_times)
+    assert mix.think_time(scenarios[1]) == 0
+    with pytest.raises(ValueError, match="No scenarios"):
+        ScenarioMix([])
+    with pytest.raises(ValueError, match="must be positive"):
+        ScenarioMix([scenarios[2]])
+    with pytest.raises(ValueError, match="Duplicate scenario name: 'search'"):
+        ScenarioMix([*scenarios, Scenario("search", ("other.twill",), 1)])
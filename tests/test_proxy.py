@@ -0,0 +1,82 @@
+"""Test sending requests through proxies set in the environment."""
+
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Generator, List
+
+import pytest
+
+from twill.browser import AsyncTwillBrowser, TwillBrowser
+from twill.cache import HttpCache
+
+proxied: List[str] = []  # the URLs of all requests received by the proxy
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    """Request handler acting as a proxy that answers all requests."""
+
+    def do_GET(self) -> None:
+        """Answer a GET request and record its URL."""
+        proxied.append(self.path)
+        body = b"<title>Proxied</title>"
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "max-age=60")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args: object) -> None:
+        """Do not log requests."""
+
+
+@pytest.fixture
+def proxy_url(
+    monkeypatch: pytest.MonkeyPatch,
+) -> Generator[str, None, None]:
+    """Run a proxy and set it as HTTP proxy in the environment."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ProxyHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    proxied.clear()
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    for name in "http_proxy", "https_proxy", "all_proxy", "no_proxy":
+        monkeypatch.delenv(name, raising=False)
+        monkeypatch.delenv(name.upper(), raising=False)
+    monkeypatch.setenv("HTTP_PROXY", url)
+    yield url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.usefixtures("proxy_url")
+def test_http_proxy():
+    browser = TwillBrowser()
+    browser.go("http://twill.test/page")
+    assert browser.title == "Proxied"
+    browser.cache = HttpCache()
+    browser.go("http://twill.test/cached")
+    browser.go("http://twill.test/cached")
+    assert proxied == ["http://twill.test/page", "http://twill.test/cached"]
+    browser.close()
+
+
+def test_no_proxy(proxy_url: str, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+    browser = TwillBrowser()
+    browser.go(proxy_url + "/direct")  # sent to the proxy directly
+    assert browser.title == "Proxied"
+    assert proxied == ["/direct"]
+    browser.close()
+
+
+@pytest.mark.usefixtures("proxy_url")
+def test_async_http_proxy():
+    async def run() -> None:
+        async with AsyncTwillBrowser() as browser:
+            await browser.go("http://twill.test/async")
+            assert browser.title == "Proxied"
+
+    asyncio.run(run())
+    assert proxied == ["http://twill.test/async"]
@@ -0,0 +1,170 @@
+"""Test resetting the browser while keeping its connections."""
+
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from typing import Callable, Generator, List, Set
+
+import pytest
+from httpx import MockTransport, Request, Response
+
+from twill import commands, execute_string, new_context
+from twill.browser import AsyncTwillBrowser, TwillBrowser
+
+connections: Set[int] = set()  # client ports of all connections
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Request handler that keeps connections alive."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        """Answer a GET request and record the connection."""
+        connections.add(self.client_address[1])
+        body = f"<title>{self.path}</title>".encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args: object) -> None:
+        """Do not log requests."""
+
+
+@pytest.fixture
+def keep_alive_url() -> Generator[str, None, None]:
+    """Run a server that keeps connections alive and return its URL."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    server.daemon_threads = True
+    Thread(target=server.serve_forever, daemon=True).start()
+    connections.clear()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_soft_reset(url: str):
+    browser = TwillBrowser()
+    browser.go(url + "login")
+    browser.form_field(browser.form(), "username").value = "john"
+    browser.submit()
+    assert "You are logged in as john" in browser.html
+    browser.headers["X-Test"] = "yes"
+    browser.timeout = 2
+    client = browser._client  # noqa: SLF001
+
+    browser.soft_reset()
+    assert browser._client is client  # noqa: SLF001
+    assert browser.result is None
+    assert not browser.history
+    assert not browser.cookies()
+    assert "X-Test" not in browser.headers
+    assert browser.timeout == 10
+
+    browser.go(url)
+    assert "You are logged in as guest" in browser.html
+
+    browser.close()
+    browser.soft_reset(url)
+    assert browser._client is not client  # noqa: SLF001
+    assert browser._client.base_url == url  # noqa: SLF001
+    browser.go(url)
+    assert browser.code == 200
+    browser.close()
+
+
+def test_soft_reset_keeps_settings(url: str):
+    browser = TwillBrowser(follow_redirects=False, timeout=5)
+    client = browser._client  # noqa: SLF001
+    client.follow_redirects = True
+    browser.timeout = 2
+    browser.soft_reset(url)
+    assert browser._client is client  # noqa: SLF001
+    assert not client.follow_redirects
+    assert browser.timeout == 5
+    browser.soft_reset("http+unix://%2Ftmp%2Ftwill.sock")
+    assert browser._client is not client  # noqa: SLF001
+    assert browser.timeout == 5
+    client = browser._client  # noqa: SLF001
+    browser.soft_reset("http+unix://%2Ftmp%2Ftwill.sock/other")
+    assert browser._client is client  # noqa: SLF001
+    assert str(client.base_url) == "http://localhost/other/"
+    browser.soft_reset(url)
+    assert browser._client is not client  # noqa: SLF001
+    browser.close()
+
+
+def test_soft_reset_recreates_app_client():
+    def app(_environ: dict, start_response: Callable) -> List[bytes]:
+        start_response("200 OK", [("Content-Type", "text/html")])
+        return [b"<title>app</title>"]
+
+    browser = TwillBrowser(app=app)
+    client = browser._client  # noqa: SLF001
+    browser.soft_reset("http://twill.test")
+    assert browser._client is not client  # noqa: SLF001
+    browser.go("/")
+    assert browser.title == "app"
+    browser.reset()
+    assert browser._settings.app is None  # noqa: SLF001
+    browser.close()
+
+
+def test_scripts_keep_connections(keep_alive_url: str):
+    browser = TwillBrowser(timeout=5)
+    with new_context(browser):
+        for _ in range(3):
+            execute_string(
+                "go page\ntitle /page",
+                no_reset=False,
+                keep_connections=True,
+                initial_url=keep_alive_url,
+            )
+        assert browser.title == "/page"
+        assert browser.timeout == 5
+        assert len(connections) == 1
+        commands.reset_browser()
+        commands.go(keep_alive_url)
+        assert len(connections) == 2
+    browser.close()
+
+
+def test_scripts_reset_browser(keep_alive_url: str):
+    browser = TwillBrowser(timeout=5)
+    with new_context(browser):
+        for _ in range(3):
+            execute_string(
+                "go page\ntitle /page",
+                no_reset=False,
+                initial_url=keep_alive_url,
+            )
+        assert browser.title == "/page"
+        assert browser.timeout == 10
+        assert len(connections) == 3
+    browser.close()
+
+
+def test_async_soft_reset():
+    def handler(request: Request) -> Response:
+        return Response(200, html=f"<title>{request.url.path}</title>")
+
+    async def run() -> None:
+        transport = MockTransport(handler)
+        async with AsyncTwillBrowser(transport=transport) as browser:
+            await browser.go("http://twill.test/page")
+            assert browser.title == "/page"
+            await browser.soft_reset("http://twill.test")
+            assert browser.result is None
+            await browser.go("http://twill.test/other")
+            assert browser.title == "/other"
+            cache_transport = browser._cache_transport  # noqa: SLF001
+            assert browser._client._transport is cache_transport  # noqa: SLF001
+            cassette_transport = browser._cassette_transport  # noqa: SLF001
+            assert cache_transport.transport is cassette_transport
+            stub_transport = browser._stub_transport  # noqa: SLF001
+            assert cassette_transport.transport is stub_transport
+            assert stub_transport.transport is transport
+
+    asyncio.run(run())
@@ -0,0 +1,200 @@
+"""Test running multiple twill scripts, optionally in parallel."""
+
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from twill import set_output, shell
+from twill.runner import RunHistory, ScriptResult, parse_shard, run_files
+
+from .utils import test_dir
+
+scripts = [
+    str(Path(test_dir, f"test_{name}.twill"))
+    for name in ("go", "go_fail", "back", "find")
+]
+
+
+def test_run_files_in_parallel(url: str):
+    results = run_files(scripts, jobs=3, initial_url=url)
+    assert [result.filename for result in results] == scripts
+    assert [result.success for result in results] == [
+        True,
+        False,
+        True,
+        True,
+    ]
+    failed = results[1]
+    assert failed.error == "no match to 'not here'"
+    assert failed.traceback
+    assert failed.dump is None
+    for result in results:
+        assert result.duration > 0
+        assert result.output is not None
+
+
+def test_run_files_with_crashing_worker(tmp_path: Path):
+    script = tmp_path / "crash.twill"
+    script.write_text('run "import os; os._exit(1)"\n', encoding="utf-8")
+    reported: List[ScriptResult] = []
+    results = run_files([str(script)] * 2, jobs=2, on_result=reported.append)
+    assert reported == results
+    assert len(results) == 2
+    for result in results:
+        assert result.filename == str(script)
+        assert not result.success
+        assert "terminated abruptly" in (result.error or "")
+        assert result.traceback
+
+
+def test_run_files_sequentially_with_fail_fast(url: str):
+    reported: List[ScriptResult] = []
+    results = run_files(
+        scripts,
+        initial_url=url,
+        fail_fast=True,
+        dump=True,
+        on_result=reported.append,
+    )
+    assert reported == results
+    assert [result.success for result in results] == [True, False]
+    failed = results[1]
+    assert failed.dump
+    assert b"These are the twill tests" in failed.dump
+    assert failed.output is None
+
+
+def test_shell_with_jobs(url: str, tmp_path: Path):
+    output = tmp_path / "output.log"
+    history_file = str(tmp_path / "history")
+    options = ["-j", "2", "-u", url, "-o", str(output)]
+    options += ["--history", history_file]
+    try:
+        with pytest.raises(SystemExit) as exit_info:
+            shell.main(["twill", *options, *scripts])
+    finally:
+        set_output()
+    assert exit_info.value.code == 1
+    text = output.read_text()
+    assert "3 of 4 files SUCCEEDED." in text
+    assert "*** ERROR: no match to 'not here'" in text
+    assert "test_go_fail.twill" in text.rsplit("Failed:", 1)[-1]
+    history = RunHistory(history_file)
+    assert [history.failed(script) for script in scripts] == [
+        False,
+        True,
+        False,
+        False,
+    ]
+    assert all(history.duration(script) for script in scripts)
+
+
+def test_shell_with_shards(
+    url: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.chdir(tmp_path)
+    output = tmp_path / "output.log"
+    options = ["-u", url, "-o", str(output)]
+    try:
+        for shard in "1/2", "2/2":
+            with pytest.raises(SystemExit) as exit_info:
+                shell.main(["twill", *options, "--shard", shard, *scripts])
+            assert exit_info.value.code == (shard == "2/2")
+    finally:
+        set_output()
+    text = output.read_text()
+    assert "1 of 2 files SUCCEEDED." in text
+    assert "test_go_fail.twill" in text.rsplit("Failed:", 1)[-1]
+    assert list(tmp_path.iterdir()) == [output]  # no history file
+    with pytest.raises(SystemExit, match="--history"):
+        shell.main(["twill", "--shard", "1/2", "--balance-shards", *scripts])
+
+
+def test_history_schedule_and_shard(tmp_path: Path):
+    history = RunHistory(str(tmp_path / "history"))
+    names = ["a", "b", "c", "d", "e"]
+    assert history.schedule(names, longest_first=True) == names
+    assert history.shard(names, 1, 2) == ["a", "c", "e"]
+    assert history.shard(names, 2, 2) == ["b", "d"]
+    assert history.shard(names[::-1], 1, 2) == ["e", "c", "a"]
+    history.update(
+        [
+            ScriptResult("a", duration=1),
+            ScriptResult("b", duration=8),
+            ScriptResult("c", error="failed", duration=2),
+            ScriptResult("d", duration=3),
+        ]
+    )
+    history.save()
+    history = RunHistory(history.path)
+    assert history.duration("b") == 8
+    assert history.duration("e") is None
+    assert history.failed("c")
+    assert not history.failed("e")
+    assert history.schedule(names, failed_first=True) == [
+        "c",
+        "a",
+        "b",
+        "d",
+        "e",
+    ]
+    assert history.schedule(names, longest_first=True) == [
+        "b",
+        "e",
+        "d",
+        "c",
+        "a",
+    ]
+    # the unknown script e is assumed to take 3.5 seconds
+    assert history.shard(names, 1, 2) == ["a", "b"]
+    assert history.shard(names, 2, 2) == ["c", "d", "e"]
+    with pytest.raises(ValueError, match="invalid shard"):
+        history.shard(names, 3, 2)
+    assert parse_shard("2/3") == (2, 3)
+    with pytest.raises(ValueError, match="invalid shard"):
+        parse_shard("0/1")
+
+
+def test_shard_with_different_histories(tmp_path: Path):
+    names = [str(tmp_path / f"{name}.twill") for name in "abcde"]
+    for name in names:
+        Path(name).write_text("echo done\n")
+    histories = [RunHistory(), RunHistory()]
+    histories[0].update([ScriptResult(names[0], duration=9)])
+    histories[1].update([ScriptResult(names[4], duration=9)])
+    shards = [
+        [
+            result.filename
+            for result in run_files(names, history=history, shard=(i, 2))
+        ]
+        for i, history in enumerate(histories, 1)
+    ]
+    assert sorted(shards[0] + shards[1]) == names
+    assert set(shards[0]).isdisjoint(shards[1])
+    # balancing with different histories gives inconsistent shards
+    balanced = [
+        history.shard(names, i, 2) for i, history in enumerate(histories, 1)
+    ]
+    assert sorted(balanced[0] + balanced[1]) != names
+
+
+def test_run_files_with_timers(url: str, tmp_path: Path):
+    script = str(Path(test_dir, "test_timers.twill"))
+    results = run_files([script, script], jobs=2, initial_url=url)
+    for result in results:
+        assert result.success
+        assert result.timers
+        assert len(result.timers.histograms["echo"]) == 2
+    output = tmp_path / "output.log"
+    options = ["-u", url, "-o", str(output)]
+    try:
+        with pytest.raises(SystemExit) as exit_info:
+            shell.main(["twill", *options, script, script])
+    finally:
+        set_output()
+    assert exit_info.value.code == 0
+    text = output.read_text()
+    assert "2 of 2 files SUCCEEDED." in text
+    assert "Transaction timers:\n\techo: 4 measured, mean " in text
+    assert "\tlogin: 2 measured, mean " in text
@@ -0,0 +1,89 @@
+"""Test the statistics module."""
+
+import pickle
+import random
+
+import pytest
+
+from twill.errors import TwillException
+from twill.stats import Histogram, Timers
+
+
+def test_empty_histogram():
+    histogram = Histogram()
+    assert len(histogram) == 0
+    assert histogram.mean == 0
+    assert histogram.percentile(50) == 0
+    assert histogram.maximum == 0
+
+
+def test_percentiles():
+    random.seed(42)
+    values = [random.expovariate(10) for _ in range(10000)]
+    histogram = Histogram(values)
+    assert len(histogram) == len(values)
+    values.sort()
+    for percentile in 50, 90, 99, 99.9:
+        exact = values[int(len(values) * percentile / 100) - 1]
+        assert abs(histogram.percentile(percentile) - exact) < 0.01 * exact
+    assert abs(histogram.mean - sum(values) / len(values)) < 1e-6
+    assert abs(histogram.minimum - values[0]) < 1e-6
+    assert abs(histogram.maximum - values[-1]) < 1e-6
+    assert histogram.percentile(100) == histogram.maximum
+    assert len(histogram.counts) < len(values) // 5
+
+
+def test_small_values_are_exact():
+    histogram = Histogram([0.000_001 * n for n in range(1, 101)])
+    assert histogram.percentile(50) == pytest.approx(0.000_050)
+    assert histogram.percentile(99) == pytest.approx(0.000_099)
+    assert histogram.summary() == (
+        "mean 0.05, p50 0.05, p90 0.09, p99 0.10, max 0.10 ms"
+    )
+
+
+def test_merge_and_pickle():
+    values = [0.001 * n for n in range(1, 1001)]
+    first, second = Histogram(values[::2]), Histogram(values[1::2])
+    first.merge(pickle.loads(pickle.dumps(second)))  # noqa: S301
+    merged = Histogram(values)
+    assert first.counts == merged.counts
+    assert len(first) == len(merged)
+    assert first.mean == merged.mean
+    assert first.minimum == merged.minimum
+    assert first.maximum == merged.maximum
+    empty = Histogram()
+    empty.merge(merged)
+    assert empty.percentile(90) == merged.percentile(90)
+
+
+def test_timers():
+    timers = Timers()
+    assert not timers
+    assert timers.summary() == []
+    timers.start("login")
+    assert timers.stop("login") >= 0
+    with pytest.raises(TwillException, match="'login' has not been started"):
+        timers.stop("login")
+    timers.record("login", 0.002)
+    timers.record("checkout", 0.005)
+    assert len(timers) == 2
+    other = pickle.loads(pickle.dumps(timers))  # noqa: S301
+    other.record("search", 0.001)
+    timers.merge(other)
+    assert len(timers.histograms["login"]) == 4
+    assert len(timers.histograms["search"]) == 1
+    summary = timers.summary()
+    assert [line.split(":")[0] for line in summary] == [
+        "checkout",
+        "login",
+        "search",
+    ]
+    assert summary[0] == (
+        "checkout: 2 measured,"
+        " mean 5.00, p50 5.00, p90 5.00, p99 5.00, max 5.00 ms"
+    )
+    timers.start("running")
+    timers.clear()
+    assert not timers
+    assert not timers.started
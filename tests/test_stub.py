@@ -0,0 +1,107 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from httpx import Client, MockTransport, Request, Response
+
+from twill import browser, commands, new_context
+from twill.browser import AsyncTwillBrowser
+from twill.errors import TwillException
+from twill.stub import Stubs, StubTransport
+from twill.unit import run_stubbed_test
+
+from .utils import execute_script, test_dir
+
+
+def test(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.chdir(test_dir)
+    with new_context():
+        execute_script("test_stub.twill")
+
+
+def test_run_stubbed_test(tmp_path: Path):
+    script = tmp_path / "script.twill"
+    script.write_text("title 'Stubbed home'\nfollow Items\nfind lxml\n")
+    with new_context():
+        run_stubbed_test(str(script), str(Path(test_dir, "test_stub.stubs")))
+        assert browser.stubs is None
+
+
+def test_stubs_file():
+    stubs = Stubs()
+    stubs.load(Path(test_dir, "test_stub.stubs"))
+    assert len(stubs) == 4
+    route = stubs.routes[1]
+    assert route.headers == (("Content-Type", "application/json"),)
+    assert route.body.startswith(b'{"items": ')
+    stubs.add("get", "/items", 204)
+    assert len(stubs) == 4
+    assert stubs.routes[1].status == 204
+
+
+def test_stubs_file_errors(tmp_path: Path):
+    for content, error in (
+        ("  Location: /\n", "header without route"),
+        ("GET /\n", "expected method, pattern, status and body"),
+        ("GET / 200\n  Location\n", "invalid header 'Location'"),
+        ("GET / ok\n", "invalid literal for int"),
+        ("GET / 2000\n", "invalid status 2000"),
+        ("GET ( 200\n", "invalid pattern '\\('"),
+        ("GET / 200 @missing\n", ".*No such file"),
+    ):
+        stubs_file = tmp_path / "stubs"
+        stubs_file.write_text("# stubs\n" + content)
+        with pytest.raises(ValueError, match=f"stubs:[23]: {error}"):
+            Stubs().load(stubs_file)
+
+
+def test_unmatched_requests_are_passed_on():
+    def handler(request: Request) -> Response:
+        return Response(200, text=f"real {request.url.path}")
+
+    stubs = Stubs()
+    stubs.add("GET", "/stubbed", body="stubbed")
+    stubs.add("*", "https://other.test/.*", body="other")
+    transport = StubTransport(MockTransport(handler), stubs)
+    with Client(base_url="http://twill.test", transport=transport) as client:
+        response = client.get("/stubbed")
+        assert response.text == "stubbed"
+        assert response.headers["Content-Type"].startswith("text/html")
+        assert client.get("/real").text == "real /real"
+        assert client.post("/stubbed").text == "real /stubbed"
+        assert client.delete("https://other.test/item").text == "other"
+    assert stubs.hits == 2
+
+
+def test_stub_commands():
+    with new_context():
+        commands.stub("GET", "/", "200", "<title>Stub</title>")
+        stubs = browser.stubs
+        assert isinstance(stubs, Stubs)
+        commands.go("http://twill.test/")
+        commands.title("Stub")
+        commands.reset_browser()
+        assert browser.stubs is stubs
+        with pytest.raises(TwillException, match="Cannot add stub"):
+            commands.stub("GET", "/", "ok")
+        with pytest.raises(TwillException, match="Cannot load stubs"):
+            commands.stub_file("missing.stubs")
+        commands.clear_stubs()
+        assert browser.stubs is None
+
+
+def test_async_stubs():
+    def handler(_request: Request) -> Response:
+        return Response(500)
+
+    async def run() -> None:
+        transport = MockTransport(handler)
+        async with AsyncTwillBrowser(transport=transport) as browser:
+            browser.stubs = Stubs()
+            browser.stubs.add("GET", "/", body="<title>Async</title>")
+            await browser.go("http://twill.test/")
+            assert browser.title == "Async"
+            await browser.go("http://twill.test/other")
+            assert browser.code == 500
+
+    asyncio.run(run())
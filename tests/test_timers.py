@@ -0,0 +1,30 @@
+import pytest
+
+from twill import commands, namespaces, new_context
+from twill.errors import TwillException
+from twill.stats import get_timers
+
+from .utils import execute_script
+
+
+def test(url: str, caplog: pytest.LogCaptureFixture):
+    with new_context():
+        commands.show("timers")
+        assert "No transactions have been timed." in caplog.text
+        execute_script("test_timers.twill", initial_url=url)
+        timers = get_timers()
+        assert sorted(timers.histograms) == ["echo", "login"]
+        assert len(timers.histograms["echo"]) == 2
+        assert len(timers.histograms["login"]) == 1
+        assert not timers.started
+        assert "Transaction timers:" in caplog.text
+        assert "echo: 2 measured, mean " in caplog.text
+        with pytest.raises(TwillException, match="has not been started"):
+            commands.timer_stop("login")
+        commands.timer_start("nothing")
+        caplog.clear()
+        commands.timer_stop("nothing")
+        assert "Transaction 'nothing' took " in caplog.text
+        assert namespaces.get_twill_glocals()[0]["__timer__"] >= 0
+        assert len(timers.histograms["nothing"]) == 1
+    assert "nothing" not in get_timers().histograms
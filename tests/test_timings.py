@@ -0,0 +1,88 @@
+"""Test the timings of the requests sent by the browser."""
+
+import asyncio
+
+import pytest
+from httpx import MockTransport, Request, Response
+
+from twill import commands, new_context
+from twill.browser import AsyncTwillBrowser
+
+
+def test_timings_with_redirects(url: str, caplog: pytest.LogCaptureFixture):
+    with new_context() as browser:
+        assert browser.timings == []
+        commands.show("timings")
+        assert "There are no timings for the current page." in caplog.text
+
+        commands.go(url + "login")
+        timings = browser.timings
+        assert len(timings) == 1
+        timing = timings[0]
+        assert timing.method == "GET"
+        assert timing.url == url + "login"
+        assert timing.status == 200
+        assert timing.connect > 0  # the test server closes connections
+        assert timing.tls == 0
+        assert 0 < timing.ttfb <= timing.total
+        assert timing.download >= 0
+        assert timing.request_bytes == 0
+        assert timing.response_bytes == len(browser.result.content)
+        assert browser.result.timings is timings
+
+        commands.form_value("1", "username", "john")
+        commands.submit()
+        timings = browser.timings
+        assert [timing.status for timing in timings] == [302, 200]
+        assert [timing.method for timing in timings] == ["POST", "GET"]
+        assert timings[0].request_bytes > 0
+        assert timings[1].url == url
+
+        # meta refresh hops are part of the same page
+        commands.config("equiv_refresh_interval", 3)
+        commands.go("/test_refresh")
+        assert browser.url == url + "login"
+        timings = browser.timings
+        assert [timing.url for timing in timings] == [
+            url + "test_refresh",
+            url + "login",
+        ]
+
+        assert browser.result.parse_time is None  # not parsed yet
+        assert browser.forms
+        assert browser.result.parse_time is not None
+        commands.back()
+        assert browser.timings[0].method == "POST"
+        assert browser.timings[0].status == 302
+
+        assert browser.result.tree.tag == "html"
+        caplog.clear()
+        commands.show("timings")
+        assert "Timings of the request(s) for the current page:" in (
+            caplog.text
+        )
+        assert f"1. POST {url}login (302): connect " in caplog.text
+        assert f"2. GET {url} (200): connect " in caplog.text
+        assert " ms, sent " in caplog.text
+        assert "Parsing the page: " in caplog.text
+
+
+def test_async_timings():
+    def handler(request: Request) -> Response:
+        if request.url.path == "/old":
+            return Response(301, headers={"Location": "/new"})
+        return Response(200, html="<title>New</title>")
+
+    async def run() -> None:
+        transport = MockTransport(handler)
+        async with AsyncTwillBrowser(transport=transport) as browser:
+            await browser.go("http://twill.test/old")
+            assert browser.title == "New"
+            timings = browser.timings
+            assert [timing.status for timing in timings] == [301, 200]
+            for timing in timings:
+                assert timing.connect == timing.tls == 0
+                assert 0 <= timing.ttfb <= timing.total
+            assert timings[1].response_bytes == len(browser.html)
+
+    asyncio.run(run())
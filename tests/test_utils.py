@@ -1,6 +1,7 @@
 from pathlib import Path
 
 import pytest
+from httpx import Response
 
 from twill import utils
 from twill.errors import TwillException
@@ -53,3 +54,43 @@ def test_trunc():
     trunc = utils.trunc
     assert trunc("hello, world!", 12) == "hello, w ..."
     assert trunc("hello, world!", 13) == "hello, world!"
+
+
+def test_result_wrapper_parses_lazily():
+    response = Response(
+        200,
+        html="<html><title>Lazy</title><body><form></form></body></html>",
+    )
+    result = utils.ResultWrapper(response)
+    assert result.http_code == 200
+    assert result._tree is None  # noqa: SLF001
+    assert result.title == "Lazy"
+    assert result._tree is not None  # noqa: SLF001
+    assert len(result.forms) == 1
+    assert result.xpath("//*[name()=$tag]/text()", tag="title") == ["Lazy"]
+
+
+def test_result_wrapper_parses_any_content_when_needed():
+    response = Response(200, json={"title": "JSON"})
+    result = utils.ResultWrapper(response)
+    assert "JSON" in result.text
+    assert result._tree is None  # noqa: SLF001
+    response = Response(
+        200,
+        text="<title>Plain</title>",
+        headers={"Content-Type": "text/plain"},
+    )
+    result = utils.ResultWrapper(response)
+    assert result.title == "Plain"
+    assert result.tree.xpath("//title/text()") == ["Plain"]
+    response = Response(200, content=b"<a href='/x'>Untyped</a>")
+    result = utils.ResultWrapper(response)
+    assert result.links == [utils.Link("Untyped", "/x")]
+
+
+def test_result_wrapper_with_empty_page():
+    result = utils.ResultWrapper(Response(304))
+    assert result.tree.tag == "html"
+    assert result.xpath("//title") == []
+    assert result.title is None
+    assert result.forms == []